@@ -0,0 +1,199 @@
+"""
+Measures the cost a generated sdk method adds on top of httpx: every method
+of the sdk generated from tests/schema_sample1.json is called against an
+httpx.MockTransport, next to the same request made by hand with httpx, and
+the time, the peak memory and the memory blocks allocated per call are
+reported for both.
+
+    python benchmarks/call_overhead.py --calls 2000
+    python benchmarks/call_overhead.py --json-backend orjson --typed-responses
+"""
+
+import argparse
+import ast
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+import httpx
+from sdkops.openapi import parse
+from sdkops.generator import to_ast
+from sdkops.options import GeneratorOptions
+
+SCHEMA_FILE = os.path.join(
+    os.path.dirname(__file__), "..", "tests", "schema_sample1.json"
+)
+
+BASE_URL = "http://localhost"
+
+RESPONSES = {
+    "/otp/email": {"success": True},
+    "/otp/email/verify": {"token": "token"},
+    "/user/status": {"email": "user@example.com", "authenticated": True},
+    "/project/list": {
+        "projects": [
+            {
+                "rid": f"rid{i}",
+                "name": f"project {i}",
+                "git_repo_url": "https://example.com/repo.git",
+                "created_at": "2024-01-01T00:00:00",
+                "updated_at": "2024-01-01T00:00:00",
+                "removed_at": "",
+            }
+            for i in range(10)
+        ]
+    },
+    "/project/name": {"project": None},
+}
+
+# responses are encoded once, the transport only looks them up
+CONTENTS = {path: json.dumps(body).encode() for path, body in RESPONSES.items()}
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == "/":
+        return httpx.Response(200, text="ok")
+    return httpx.Response(
+        200,
+        content=CONTENTS[request.url.path],
+        headers={"content-type": "application/json"},
+    )
+
+
+def load_sdk(options: GeneratorOptions):
+    with open(SCHEMA_FILE) as f:
+        _, spec = parse(json.load(f))
+    module = to_ast(spec, "bench_sdk", BASE_URL, options=options)
+    namespace: dict[str, Any] = {}
+    exec(compile(ast.unparse(module), "bench_sdk.py", "exec"), namespace)
+    return namespace["BenchSdk"](transport=httpx.MockTransport(handler))
+
+
+def calls(sdk) -> dict[str, tuple[Callable, Callable]]:
+    """
+    The sdk method and the hand written httpx call of every operation, made
+    with a client like the client of the sdk.
+    """
+    client = httpx.Client(
+        base_url=BASE_URL,
+        headers={"user-agent": "bench_sdk", "accept": "application/json"},
+        transport=httpx.MockTransport(handler),
+    )
+    body = {"email": "user@example.com"}
+
+    def raw(method: str, url: str, **kwargs):
+        return client.send(client.build_request(method, url, **kwargs))
+
+    return {
+        "otp_email": (
+            lambda: sdk.otp_email(body),
+            lambda: raw("POST", "/otp/email", json=body).json(),
+        ),
+        "user_status": (
+            lambda: sdk.user_status(),
+            lambda: raw("GET", "/user/status").json(),
+        ),
+        "project_list": (
+            lambda: sdk.project_list("hash"),
+            lambda: raw("GET", "/project/list", params={"cwd_hash": "hash"}).json(),
+        ),
+        "project_get": (
+            lambda: sdk.project_get("name"),
+            lambda: raw("GET", "/project/name").json(),
+        ),
+        "home": (
+            lambda: sdk.home(),
+            lambda: raw("GET", "/", headers={"accept": "text/plain"}).text,
+        ),
+    }
+
+
+def time_per_call(functions: list[Callable], count: int, repeat: int) -> list[float]:
+    """
+    Best cpu time of a call of each function, in nanoseconds. The runs of
+    the functions take turns, so that a slow period of the machine doesn't
+    fall on one of them only, and the garbage collector is off like in timeit.
+    """
+    timings = [float("inf")] * len(functions)
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            for i, function in enumerate(functions):
+                start = time.process_time_ns()
+                for _ in range(count):
+                    function()
+                timings[i] = min(timings[i], (time.process_time_ns() - start) / count)
+    finally:
+        gc.enable()
+    return timings
+
+
+def memory_per_call(function: Callable, count: int = 100) -> tuple[float, float]:
+    """
+    Bytes allocated at the peak of a call, and memory blocks allocated by a
+    call that are alive after it, averaged over `count` calls. The results of
+    the calls are kept while the blocks are counted, so that the objects a
+    call returns are counted too.
+    """
+    peaks = 0
+    tracemalloc.start()
+    for _ in range(count):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        function()
+        peaks += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+
+    results = [None] * count
+    gc.collect()
+    gc.disable()
+    try:
+        before = sys.getallocatedblocks()
+        for i in range(count):
+            results[i] = function()
+        blocks = sys.getallocatedblocks() - before
+    finally:
+        gc.enable()
+    return peaks / count, blocks / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--json-backend", choices=GeneratorOptions.json_backends, default="httpx"
+    )
+    parser.add_argument(
+        "--model-style", choices=GeneratorOptions.model_styles, default="dict"
+    )
+    parser.add_argument("--typed-responses", action="store_true")
+    args = parser.parse_args()
+
+    sdk = load_sdk(
+        GeneratorOptions(
+            json_backend=args.json_backend,
+            model_style=args.model_style,
+            typed_responses=args.typed_responses,
+        )
+    )
+    print(f"{args.calls} calls, best of {args.repeat}, cpu time per call")
+    print(
+        f"{'operation':>14} {'sdk ns':>9} {'httpx ns':>9} {'overhead':>9} {'sdk peak bytes':>14} {'httpx peak bytes':>16} {'sdk blocks':>10} {'httpx blocks':>12}"
+    )
+    for name, (sdk_call, raw_call) in calls(sdk).items():
+        # warm up, and check both calls get the same response
+        assert sdk_call() == raw_call() or args.typed_responses, name
+        sdk_ns, raw_ns = time_per_call([sdk_call, raw_call], args.calls, args.repeat)
+        sdk_peak, sdk_blocks = memory_per_call(sdk_call)
+        raw_peak, raw_blocks = memory_per_call(raw_call)
+        print(
+            f"{name:>14} {sdk_ns:9.0f} {raw_ns:9.0f} {sdk_ns - raw_ns:+9.0f} {sdk_peak:14.0f} {raw_peak:16.0f} {sdk_blocks:10.1f} {raw_blocks:12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
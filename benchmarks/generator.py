@@ -0,0 +1,251 @@
+"""
+Measures the generator on synthetic schemas of different shapes, phase by
+phase: openapi.parse, generator.to_ast, ast.unparse into the chunks the cli
+formats, and the black formatting of those chunks, and compares the results with the baselines in
+baselines/generator.json. It exits with status 1 when a phase peaks at more
+memory than its baseline by more than the tolerance, which is the same on
+every machine.
+
+    python benchmarks/generator.py
+    python benchmarks/generator.py --scenario deep --scenario wide
+    python benchmarks/generator.py --check-times
+    python benchmarks/generator.py --save
+
+Times depend on the machine, so they are compared as multiples of the time of
+a calibration workload, which only uses the standard library and runs in
+turns with the phases. They are still too noisy on a shared machine to fail
+on, slower phases are only reported unless --check-times is given. --save
+stores the results as the baselines.
+"""
+
+import argparse
+import ast
+import copy
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+from synthetic import (
+    make_schema,
+    make_deep_schema,
+    make_wide_schema,
+    make_any_of_schema,
+)
+from sdkops.openapi import parse
+from sdkops.generator import to_ast
+from sdkops.formatter import split_chunks, format_chunk
+
+SDK_NAME = "bench_sdk"
+
+BASELINES_FILE = os.path.join(os.path.dirname(__file__), "baselines", "generator.json")
+
+SCENARIOS: dict[str, Callable[[], dict[str, Any]]] = {
+    # many paths, a few components per tag
+    "paths": lambda: make_schema(tags=10, operations=20, components=2),
+    # many components, a few paths
+    "components": lambda: make_schema(tags=10, operations=2, components=20),
+    # every operation refers to the same two components
+    "shared_refs": lambda: make_schema(tags=1, operations=200, components=2),
+    "deep": lambda: make_deep_schema(depth=100, operations=2),
+    "wide": lambda: make_wide_schema(properties=1000, operations=10),
+    "any_of": lambda: make_any_of_schema(members=50, operations=20),
+}
+
+PHASES = ("parse", "to_ast", "unparse", "black")
+
+# differences below these are noise, whatever the tolerance
+MIN_TIME_DIFFERENCE = 0.005
+MIN_PEAK_DIFFERENCE = 256 * 1024
+
+# a module of many small functions with dict literals, calls and f-strings
+CALIBRATION_SOURCE = "\n".join(
+    f"""
+def function_{i}(value, items=None):
+    data = {{"key_{i}": value, "items": [x * {i} for x in items or []]}}
+    if value is not None and data["items"]:
+        return f"{{value}}_{i}", data
+    return None, data
+"""
+    for i in range(50)
+)
+
+
+def calibrate():
+    """
+    The calibration workload: parsing and unparsing python, and copying and
+    dumping json, the same kinds of work as the phases but without sdkops.
+    """
+    module = ast.parse(CALIBRATION_SOURCE)
+    ast.unparse(module)
+    data = ast.literal_eval(
+        repr([{"name": f"n{i}", "values": list(range(20))} for i in range(50)])
+    )
+    json.dumps(copy.deepcopy(data))
+
+
+def run_phases(schema: dict[str, Any]) -> dict[str, Callable[[], Any]]:
+    """
+    The phases of the generation of a schema, each a function that runs the
+    phase on the output of the previous one.
+    """
+    state: dict[str, Any] = {}
+
+    def parse_phase():
+        # parse keeps references to the dict, every run gets its own copy
+        success, state["spec"] = parse(copy.deepcopy(schema))
+        assert success, state["spec"]
+
+    def to_ast_phase():
+        state["module"] = to_ast(state["spec"], SDK_NAME, "http://localhost")
+
+    # the module is unparsed into the chunks the cli formats, so that black
+    # is timed on its own
+    def unparse_phase():
+        state["chunks"] = split_chunks(state["module"])
+
+    def black_phase():
+        for _, chunk in state["chunks"]:
+            format_chunk(chunk)
+
+    return {
+        "parse": parse_phase,
+        "to_ast": to_ast_phase,
+        "unparse": unparse_phase,
+        "black": black_phase,
+    }
+
+
+def elapsed(function: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def measure(schema: dict[str, Any], repeat: int) -> dict[str, dict[str, float]]:
+    """
+    Best time of `repeat` runs of every phase, relative to the best time of the
+    calibration runs made in between, and the peak memory of a run traced with
+    tracemalloc, which is a separate run since tracing slows it down.
+
+    :return: Seconds, relative time and peak bytes by phase
+    """
+    results = {phase: {"seconds": float("inf"), "peak_bytes": 0} for phase in PHASES}
+    calibration = float("inf")
+    for _ in range(repeat):
+        calibration = min(calibration, elapsed(calibrate))
+        for phase, function in run_phases(schema).items():
+            seconds = elapsed(function)
+            results[phase]["seconds"] = min(results[phase]["seconds"], seconds)
+    for result in results.values():
+        result["relative"] = result["seconds"] / calibration
+    for phase, function in run_phases(schema).items():
+        tracemalloc.start()
+        function()
+        results[phase]["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return results
+
+
+def compare(
+    scenario: str,
+    results: dict[str, dict[str, float]],
+    baselines: dict[str, Any],
+    tolerance: float,
+) -> tuple[list[str], list[str]]:
+    """
+    :return: Descriptions of the phases that peaked at more memory, and of the
+        phases that were slower
+    """
+    memory, times = [], []
+    for phase, result in results.items():
+        baseline = baselines.get(scenario, {}).get(phase)
+        if baseline is None:
+            continue
+        # the baseline time on this machine, as the multiple of the calibration
+        relative, baseline_relative = result["relative"], baseline["relative"]
+        seconds = result["seconds"]
+        baseline_seconds = seconds / relative * baseline_relative
+        if (
+            relative > baseline_relative * (1 + tolerance)
+            and seconds - baseline_seconds > MIN_TIME_DIFFERENCE
+        ):
+            times.append(
+                f"{scenario} {phase}: {relative:.2f}x calibration, baseline {baseline_relative:.2f}x"
+            )
+        peak, baseline_peak = result["peak_bytes"], baseline["peak_bytes"]
+        if (
+            peak > baseline_peak * (1 + tolerance)
+            and peak - baseline_peak > MIN_PEAK_DIFFERENCE
+        ):
+            memory.append(
+                f"{scenario} {phase}: {peak / 1024 / 1024:.1f}MB peak, baseline {baseline_peak / 1024 / 1024:.1f}MB"
+            )
+    return memory, times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=SCENARIOS,
+        help="scenarios to run, all of them by default.",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.3,
+        help="allowed slowdown and memory growth, as a fraction of the baselines.",
+    )
+    parser.add_argument(
+        "--check-times",
+        action="store_true",
+        help="fail on slower phases too, for a machine quiet enough to time on.",
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="store the results as the baselines."
+    )
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.isfile(BASELINES_FILE):
+        with open(BASELINES_FILE) as f:
+            baselines = json.load(f)
+
+    memory_regressions, time_regressions = [], []
+    for scenario in args.scenario or SCENARIOS:
+        results = measure(SCENARIOS[scenario](), args.repeat)
+        print(scenario)
+        for phase, result in results.items():
+            print(
+                f"{phase:>10}: {result['seconds'] * 1000:8.1f}ms {result['relative']:7.2f}x {result['peak_bytes'] / 1024 / 1024:8.1f}MB peak"
+            )
+        memory, times = compare(scenario, results, baselines, args.tolerance)
+        memory_regressions.extend(memory)
+        time_regressions.extend(times)
+        baselines[scenario] = results
+
+    if args.save:
+        os.makedirs(os.path.dirname(BASELINES_FILE), exist_ok=True)
+        with open(BASELINES_FILE, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baselines saved into {BASELINES_FILE}")
+        return
+    if time_regressions:
+        print("slower than the baselines:")
+        for regression in time_regressions:
+            print(f"    {regression}")
+    if memory_regressions:
+        print("more memory than the baselines:")
+        for regression in memory_regressions:
+            print(f"    {regression}")
+    if memory_regressions or (args.check_times and time_regressions):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compares the time it takes to import a generated sdk and access one of its
+methods, for the single module and the package layouts.
+
+    python benchmarks/import_time.py --tags 50 --operations 40
+"""
+
+import argparse
+import ast
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from synthetic import make_schema
+from sdkops.openapi import parse
+from sdkops.generator import to_ast
+from sdkops.package import to_package_ast
+
+SDK_NAME = "bench_sdk"
+
+MEASURE = f"""
+import time
+start = time.perf_counter()
+import {SDK_NAME}
+{SDK_NAME}.{SDK_NAME}.tag0_op0
+print(time.perf_counter() - start)
+"""
+
+
+def measure(path: str, repeat: int) -> list[float]:
+    # the first run compiles the bytecode, it's left out of the results
+    results = []
+    for _ in range(repeat + 1):
+        output = subprocess.run(
+            [sys.executable, "-c", MEASURE],
+            cwd=path,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        results.append(float(output.stdout))
+    return results[1:]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--operations", type=int, default=40)
+    parser.add_argument("--components", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    _, spec = parse(make_schema(args.tags, args.operations, args.components))
+    with tempfile.TemporaryDirectory() as module_dir, tempfile.TemporaryDirectory() as package_dir:
+        with open(os.path.join(module_dir, f"{SDK_NAME}.py"), "w") as f:
+            f.write(ast.unparse(to_ast(spec, SDK_NAME, "http://localhost")))
+        os.makedirs(os.path.join(package_dir, SDK_NAME))
+        for module_name, module in to_package_ast(
+            spec, SDK_NAME, "http://localhost"
+        ).items():
+            with open(
+                os.path.join(package_dir, SDK_NAME, f"{module_name}.py"), "w"
+            ) as f:
+                f.write(ast.unparse(module))
+
+        operation_count = args.tags * args.operations
+        print(f"{operation_count} operations in {args.tags} tags, {args.repeat} runs")
+        for layout, path in (("module", module_dir), ("package", package_dir)):
+            results = measure(path, args.repeat)
+            print(
+                f"{layout:>8}: median {statistics.median(results) * 1000:.1f}ms, min {min(results) * 1000:.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Compares the json backends of the generated sdk on a large payload: the time
+a method takes to decode a response of many items, and the time it takes to
+encode the same payload as a request body.
+
+    python benchmarks/json_backend.py --items 50000
+"""
+
+import argparse
+import ast
+import importlib.util
+import json
+import time
+import httpx
+from synthetic import make_schema
+from sdkops.openapi import parse
+from sdkops.generator import to_ast
+from sdkops.options import GeneratorOptions
+
+
+def load_sdk(json_backend: str, properties: int):
+    _, spec = parse(
+        make_schema(tags=1, operations=1, components=1, properties=properties)
+    )
+    module = to_ast(
+        spec,
+        "bench_sdk",
+        "http://localhost",
+        options=GeneratorOptions(json_backend=json_backend),
+    )
+    namespace = {}
+    exec(compile(ast.unparse(module), "bench_sdk.py", "exec"), namespace)
+    return namespace["BenchSdk"]()
+
+
+def best_of(repeat: int, function) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=50_000)
+    parser.add_argument("--properties", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    payload = {
+        "items": [
+            {
+                f"field_{i}": i if i % 2 else f"value {n} {i}"
+                for i in range(args.properties)
+            }
+            for n in range(args.items)
+        ],
+        "total": args.items,
+    }
+    content = json.dumps(payload).encode()
+    print(f"{args.items} items, {len(content) / 1024 / 1024:.1f}MB")
+
+    for json_backend in GeneratorOptions.json_backends:
+        if json_backend in ("orjson", "msgspec") and not importlib.util.find_spec(
+            json_backend
+        ):
+            print(f"{json_backend:>8}: not installed")
+            continue
+        sdk = load_sdk(json_backend, args.properties)
+        sdk.client = httpx.Client(
+            base_url="http://localhost",
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, content=content)
+            ),
+        )
+        assert sdk.tag0_op0("x") == payload
+        decode = best_of(args.repeat, lambda: sdk.tag0_op0("x"))
+        if json_backend == "httpx":
+            encode = best_of(
+                args.repeat,
+                lambda: httpx.Request("POST", "http://localhost", json=payload),
+            )
+        else:
+            encode = best_of(args.repeat, lambda: sdk.json_dumps(payload))
+        print(
+            f"{json_backend:>8}: decode {decode * 1000:.1f}ms, encode {encode * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compares the memory used by the instances of generated models, for the dict
+subclass and the slotted model styles.
+
+    python benchmarks/model_memory.py --count 100000
+"""
+
+import argparse
+import ast
+import tracemalloc
+from synthetic import make_schema
+from sdkops.openapi import parse
+from sdkops.generator import to_ast
+from sdkops.options import GeneratorOptions
+
+
+def measure(model_style: str, count: int, properties: int) -> int:
+    _, spec = parse(
+        make_schema(tags=1, operations=1, components=1, properties=properties)
+    )
+    module = to_ast(
+        spec,
+        "bench_sdk",
+        "http://localhost",
+        options=GeneratorOptions(model_style=model_style),
+    )
+    namespace = {}
+    exec(compile(ast.unparse(module), "bench_sdk.py", "exec"), namespace)
+    model_class = namespace["BenchSdkTag0Model0"]
+    data = {f"field_{i}": i if i % 2 else str(i) for i in range(properties)}
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = [model_class(**data) for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del instances
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--properties", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.count} instances with {args.properties} properties")
+    for model_style in GeneratorOptions.model_styles:
+        size = measure(model_style, args.count, args.properties)
+        print(
+            f"{model_style:>6}: {size / 1024 / 1024:.1f}MB, {size / args.count:.0f} bytes per instance"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Builds synthetic openapi schemas of a given size for the benchmarks.
+"""
+
+from typing import Any
+
+
+def make_schema(
+    tags: int = 10, operations: int = 20, components: int = 10, properties: int = 10
+) -> dict[str, Any]:
+    """
+    Every tag gets its own components and operations. Each operation responds
+    with an object that refers to one of the components of its tag, half of the
+    components also refer to a component shared by all tags.
+
+    :param tags: Number of tags
+    :param operations: Number of operations per tag
+    :param components: Number of components per tag
+    :param properties: Number of properties per component
+    :return: Schema dict
+    """
+    schemas: dict[str, Any] = {
+        "Shared": {
+            "type": "object",
+            "properties": {f"field_{i}": {"type": "string"} for i in range(properties)},
+            "required": ["field_0"],
+        }
+    }
+    paths: dict[str, Any] = {}
+    for t in range(tags):
+        for c in range(components):
+            component: dict[str, Any] = {
+                "type": "object",
+                "properties": {
+                    f"field_{i}": {"type": "integer" if i % 2 else "string"}
+                    for i in range(properties)
+                },
+                "required": ["field_0"],
+            }
+            if c % 2:
+                component["properties"]["shared"] = {
+                    "$ref": "#/components/schemas/Shared"
+                }
+            schemas[f"Tag{t}Model{c}"] = component
+        for o in range(operations):
+            model = f"#/components/schemas/Tag{t}Model{o % components}"
+            paths[f"/tag{t}/op{o}/{{item_id}}"] = {
+                "get": {
+                    "operationId": f"tag{t}_op{o}",
+                    "tags": [f"tag{t}"],
+                    "parameters": [
+                        {
+                            "name": "item_id",
+                            "in": "path",
+                            "required": True,
+                            "schema": {"type": "string"},
+                        }
+                    ],
+                    "responses": {
+                        "200": {
+                            "description": "",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "object",
+                                        "properties": {
+                                            "items": {
+                                                "type": "array",
+                                                "items": {"$ref": model},
+                                            },
+                                            "total": {"type": "integer"},
+                                        },
+                                        "required": ["items", "total"],
+                                    }
+                                }
+                            },
+                        }
+                    },
+                }
+            }
+    return make_document(paths, schemas)
+
+
+def make_document(paths: dict[str, Any], schemas: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "openapi": "3.1.0",
+        "info": {"title": "synthetic", "version": "1.0.0"},
+        "paths": paths,
+        "components": {"schemas": schemas},
+    }
+
+
+def make_operation(operation_id: str, schema: dict[str, Any]) -> dict[str, Any]:
+    """
+    A get operation that responds with the given schema.
+    """
+    return {
+        "get": {
+            "operationId": operation_id,
+            "responses": {
+                "200": {
+                    "description": "",
+                    "content": {"application/json": {"schema": schema}},
+                }
+            },
+        }
+    }
+
+
+def make_deep_schema(depth: int = 100, operations: int = 10) -> dict[str, Any]:
+    """
+    Operations that respond with objects nested `depth` levels deep inline,
+    every level has a scalar property and the next level.
+
+    :param depth: Number of nested objects
+    :param operations: Number of operations
+    :return: Schema dict
+    """
+    paths: dict[str, Any] = {}
+    for o in range(operations):
+        schema: dict[str, Any] = {"type": "string"}
+        for d in range(depth):
+            schema = {
+                "type": "object",
+                "properties": {f"value_{d}": {"type": "integer"}, f"level_{d}": schema},
+                "required": [f"value_{d}"],
+            }
+        paths[f"/deep{o}"] = make_operation(f"deep{o}", schema)
+    return make_document(paths, {})
+
+
+def make_wide_schema(properties: int = 1000, operations: int = 10) -> dict[str, Any]:
+    """
+    A component with `properties` properties of mixed types, optional ones
+    with defaults, that every operation responds with.
+
+    :param properties: Number of properties of the component
+    :param operations: Number of operations
+    :return: Schema dict
+    """
+    types = ["string", "integer", "boolean"]
+    component = {
+        "type": "object",
+        "properties": {f"field_{i}": {"type": types[i % 3]} for i in range(properties)},
+        "required": [f"field_{i}" for i in range(0, properties, 2)],
+    }
+    ref = {"$ref": "#/components/schemas/Wide"}
+    paths = {f"/wide{o}": make_operation(f"wide{o}", ref) for o in range(operations)}
+    return make_document(paths, {"Wide": component})
+
+
+def make_any_of_schema(members: int = 50, operations: int = 20) -> dict[str, Any]:
+    """
+    Operations that respond with an anyOf of `members` components, each told
+    apart from the others by a required property of its own.
+
+    :param members: Number of members of the anyOf
+    :param operations: Number of operations
+    :return: Schema dict
+    """
+    schemas = {
+        f"Member{m}": {
+            "type": "object",
+            "properties": {
+                f"kind_{m}": {"type": "string"},
+                "shared": {"type": "integer"},
+                "children": {
+                    "type": "array",
+                    "items": {
+                        "$ref": f"#/components/schemas/Member{(m + 1) % members}"
+                    },
+                },
+            },
+            "required": [f"kind_{m}"],
+        }
+        for m in range(members)
+    }
+    schema = {
+        "anyOf": [{"$ref": f"#/components/schemas/Member{m}"} for m in range(members)]
+        + [{"type": "null"}]
+    }
+    paths = {f"/any{o}": make_operation(f"any{o}", schema) for o in range(operations)}
+    return make_document(paths, schemas)
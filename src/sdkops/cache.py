@@ -0,0 +1,148 @@
+import os
+import json
+import hashlib
+import functools
+import tempfile
+from importlib import metadata
+from typing import Any
+from sdkops.openapi import APISpecPathOperation
+from sdkops.json_schema import schema_collect_refs, schema_union_required
+from sdkops.components import ComponentRegistry
+from sdkops.options import GeneratorOptions
+
+# bump this whenever the shape of the cached entries or the generated code changes
+CACHE_VERSION = 9
+
+
+@functools.cache
+def _package_version() -> str:
+    try:
+        return metadata.version("sdkops")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+class GenerationCache:
+    """
+    On-disk cache of generated source code keyed by content hashes.
+
+    Every entry is a small json file stored under the cache directory. Entries
+    are never invalidated explicitly, a change in the input produces a new key.
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self.hits: int = 0
+        self.misses: int = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, *parts: Any) -> str:
+        payload = json.dumps(
+            [CACHE_VERSION, _package_version(), *parts],
+            sort_keys=True,
+            default=vars,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def operation_key(
+        self,
+        pattern: str,
+        operation: APISpecPathOperation,
+        registry: ComponentRegistry,
+        options: GeneratorOptions,
+        derived: Any = None,
+    ) -> str:
+        """
+        Hashes the operation together with every schema its refs reach.
+
+        Components in the registry are only referred to by their names, so
+        their schemas are left out of the hash. Whatever the generator reads
+        from them for the operation goes into derived instead, and so do the
+        required properties of the components that are members of a union.
+
+        :param pattern: URL path of the operation
+        :param operation: APISpecPathOperation object
+        :param registry: ComponentRegistry object, its resolver resolves the refs
+        :param options: GeneratorOptions object
+        :param derived: Json serializable values derived from the components
+        :return: Hex digest to use as a cache key
+        """
+        refs = schema_collect_refs(
+            registry.resolver, *operation.schemas(), skip=registry.names
+        )
+        names = {x: registry.names[x] for x in refs if x in registry.names}
+        union_required = schema_union_required(
+            registry.resolver,
+            *operation.schemas(),
+            *(x for x in refs.values() if x is not None),
+            refs=registry.names,
+        )
+        return self.key(
+            "operation",
+            registry.sdk_name,
+            pattern,
+            operation,
+            refs,
+            names,
+            union_required,
+            options,
+            derived,
+        )
+
+    def component_key(
+        self, ref: str, registry: ComponentRegistry, options: GeneratorOptions
+    ) -> str:
+        """
+        Hashes the component schema together with every schema its refs reach,
+        and the required properties of the components that are members of a
+        union in them.
+
+        :param ref: Ref of the component in the registry
+        :param registry: ComponentRegistry object, its resolver resolves the refs
+        :param options: GeneratorOptions object
+        :return: Hex digest to use as a cache key
+        """
+        refs = schema_collect_refs(
+            registry.resolver, registry.schemas[ref], skip=registry.names
+        )
+        # a forward reference is generated differently than a backward one
+        ref_names = registry.ref_names_for(ref)
+        names = {x: ref_names[x] for x in refs if x in ref_names}
+        union_required = schema_union_required(
+            registry.resolver,
+            registry.schemas[ref],
+            *(x for x in refs.values() if x is not None),
+            refs=registry.names,
+        )
+        return self.key(
+            "component",
+            registry.sdk_name,
+            ref,
+            registry.schemas[ref],
+            refs,
+            names,
+            union_required,
+            options,
+        )
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        try:
+            with open(self.path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def set(self, key: str, entry: dict[str, Any]):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first so that readers never see partial entries
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(temp_path, path)
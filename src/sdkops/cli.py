@@ -1,17 +1,21 @@
 #!/usr/bin/env python3
 
-import httpx
 import click
 import rich
 import rich.tree
-import tempfile
 import os
 import sys
 import json
-import ast
-import black
-from sdkops.openapi import parse
+import hashlib
+from sdkops.openapi import parse, parse_file
 from sdkops.generator import to_ast
+from sdkops.package import to_package_ast
+from sdkops.cache import GenerationCache
+from sdkops.components import ComponentRegistry
+from sdkops.options import GeneratorOptions
+from sdkops.formatter import format_modules, FORMATTERS
+from sdkops.profiler import Profiler, phase
+from sdkops.fetch import fetch_schema
 
 
 @click.command("generate", short_help="generates a python sdk from an openapi schema.")
@@ -24,7 +28,137 @@ from sdkops.generator import to_ast
     required=False,
     help="base url for the sdk endpoints. chosen from servers section of the schema by default.",
 )
-def generate(file: str, name: str, dest: str, url: str = None):
+@click.option(
+    "--cache-dir",
+    required=False,
+    help="directory to cache generated code, and schemas fetched from urls, in. unchanged operations are reused from it, and an unchanged remote schema skips generation.",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    default=False,
+    help="parse the schema file incrementally instead of loading it at once. keeps memory low for very large schemas.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="number of processes to generate the operations and components with.",
+)
+@click.option(
+    "--layout",
+    type=click.Choice(["module", "package"]),
+    default="module",
+    show_default=True,
+    help="write the sdk as a single module, or as a package with a lazily imported module per tag.",
+)
+@click.option(
+    "--client",
+    type=click.Choice(GeneratorOptions.clients),
+    default="sync",
+    show_default=True,
+    help="generate an sdk class on httpx.Client, on httpx.AsyncClient or both.",
+)
+@click.option(
+    "--model-style",
+    type=click.Choice(GeneratorOptions.model_styles),
+    default="dict",
+    show_default=True,
+    help="generate models as dict subclasses, or as slotted classes with to_dict and from_dict.",
+)
+@click.option(
+    "--typed-responses",
+    is_flag=True,
+    default=False,
+    help="generate from_json and to_json for every model and return models from the sdk methods instead of dicts.",
+)
+@click.option(
+    "--json-backend",
+    type=click.Choice(GeneratorOptions.json_backends),
+    default="httpx",
+    show_default=True,
+    help="json library the sdk encodes request bodies and decodes responses with. auto picks orjson or msgspec when they are installed, and falls back to json.",
+)
+@click.option(
+    "--hedging",
+    is_flag=True,
+    default=False,
+    help="let get and head methods send their request again when the response is late, the first response wins.",
+)
+@click.option(
+    "--response-cache",
+    is_flag=True,
+    default=False,
+    help="cache get responses in memory, by their etag and cache-control headers.",
+)
+@click.option(
+    "--coalesce",
+    multiple=True,
+    metavar="OPERATION_ID",
+    help="merge identical concurrent requests of a get method into one. can be given more than once, all for every get method.",
+)
+@click.option(
+    "--batch",
+    is_flag=True,
+    default=False,
+    help="add batch and a map_ method per operation to the async sdk class, to call a method for many arguments with bounded concurrency.",
+)
+@click.option(
+    "--instrumentation",
+    is_flag=True,
+    default=False,
+    help="let the sdk classes take before_send, after_response and on_error hooks, and keep latency histograms per operation.",
+)
+@click.option(
+    "--format",
+    type=click.Choice(FORMATTERS),
+    default="black",
+    show_default=True,
+    help="formatter of the generated code. none skips formatting.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="report the wall time, cpu time and peak memory of every phase, and the slowest operations and schemas.",
+)
+@click.option(
+    "--profile-top",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="number of the slowest operations and schemas to report.",
+)
+@click.option(
+    "--profile-output",
+    required=False,
+    help="file to write the profile into, as json when it ends with .json, as cProfile stats to read with pstats otherwise. implies --profile.",
+)
+def generate(
+    file: str,
+    name: str,
+    dest: str,
+    url: str | None = None,
+    cache_dir: str | None = None,
+    stream: bool = False,
+    jobs: int = 1,
+    layout: str = "module",
+    client: str = "sync",
+    format: str = "black",
+    model_style: str = "dict",
+    typed_responses: bool = False,
+    json_backend: str = "httpx",
+    hedging: bool = False,
+    response_cache: bool = False,
+    coalesce: tuple[str, ...] = (),
+    batch: bool = False,
+    instrumentation: bool = False,
+    profile: bool = False,
+    profile_top: int = 10,
+    profile_output: str | None = None,
+):
     """
     FILE is an open api schema file path or a url endpoint to fetch the schema.
     """
@@ -43,56 +177,100 @@ def generate(file: str, name: str, dest: str, url: str = None):
     click.echo("verifying openapi schema file...")
     if not file.startswith("http") and not os.path.isfile(file):
         raise Exception(f"file {file} does not exist.")
-    temp_file = None
+    profiler = None
+    if profile or profile_output:
+        profiler = Profiler(
+            top=profile_top,
+            cprofile=profile_output is not None
+            and os.path.splitext(profile_output)[1] != ".json",
+        )
+    options = GeneratorOptions(
+        client=client,
+        model_style=model_style,
+        typed_responses=typed_responses,
+        json_backend=json_backend,
+        hedging=hedging,
+        response_cache=response_cache,
+        coalesce=coalesce,
+        batch=batch,
+        instrumentation=instrumentation,
+    )
+    schema_cache = (
+        GenerationCache(os.path.join(cache_dir, "schemas")) if cache_dir else None
+    )
+    remote = None
+    generation_key = None
+    schema_dict = None
     if file.startswith("http"):
         click.echo("    preparing to fetch it from an http endpoint.")
-        r = httpx.get(file)
-        if r.status_code < 200 or r.status_code >= 300:
-            raise Exception(
-                f'couldn\'t fetch the schema from "{file}". http request failed with status code {r.status_code}.'
+        with phase(profiler, "fetch"):
+            remote = fetch_schema(file, schema_cache, stream)
+        # the fetched file is left out of the cache when generation fails
+        click.get_current_context().call_on_close(remote.discard)
+        if remote.not_modified:
+            click.echo("    the schema hasn't changed since it was cached.")
+        else:
+            click.echo("    the schema has been fetched.")
+        schema_dict = remote.schema_dict
+        if remote.file is not None:
+            file = remote.file
+        if schema_cache:
+            generation_key = schema_cache.key(
+                "generation",
+                remote.sha256,
+                name,
+                os.path.abspath(dest),
+                url,
+                layout,
+                format,
+                options,
             )
-        try:
-            json.loads(r.text)
-        except:
-            raise Exception(f'the schema fetched from "{file}" is not a json.')
-        with tempfile.NamedTemporaryFile(
-            mode="w", delete=False, delete_on_close=False
-        ) as fp:
-            fp.write(r.text)
-            temp_file = fp.name
-            file = fp.name
-            click.echo(f'    the schema has been fetched and saved into "{file}".')
-    schema_dict = None
-    with open(file) as f:
-        data = f.read()
-        schema_dict = json.loads(data)
+            generation = schema_cache.get(generation_key)
+            if generation is not None and files_unchanged(generation["files"]):
+                click.echo(
+                    f'    the sdk in "{dest}" has been generated from the same schema and options, skipping generation.'
+                )
+                remote.commit()
+                click.echo("verifying openapi schema file... done.")
+                echo_profile(profiler, profile_output)
+                return
+    if not stream and schema_dict is None:
+        with phase(profiler, "parse"), open(file) as f:
+            data = f.read()
+            schema_dict = json.loads(data)
     click.echo("verifying openapi schema file... done.")
 
     click.echo("parsing schema...")
-    success, spec = parse(schema_dict)
+    with phase(profiler, "parse"):
+        # the schema is only loaded into a dict when it isn't streamed
+        if schema_dict is not None:
+            success, spec = parse(schema_dict)
+        else:
+            success, spec = parse_file(file)
     if not success:
         click.echo(f"parsing schema... failed. {spec}")
         sys.exit(1)
     click.echo("parsing schema... done.")
 
-    tree = rich.tree.Tree("spec")
-    for _path in spec.paths:
-        _path_tree = tree.add(_path.pattern)
-        for _op in _path.operations:
-            _op_tree = _path_tree.add(_op.operation_id)
-            _request_tree = _op_tree.add("request")
-            if _op.request_body:
-                _request_tree.add("body").add(_op.request_body.contents[0].get_id())
-            if _op.parameters:
-                _params_tree = _request_tree.add("parameters")
-                for _param in _op.parameters:
-                    _params_tree.add(f"{_param.name}: {_param.kind}")
-            _resp_tree = _op_tree.add("responses")
-            for _resp in _op.responses:
-                _resp_tree.add(
-                    f"{_resp.status_code}: {', '.join([x.get_id() for x in _resp.contents])}"
-                )
-    rich.print(tree)
+    with phase(profiler, "tree"):
+        tree = rich.tree.Tree("spec")
+        for _path in spec.paths:
+            _path_tree = tree.add(_path.pattern)
+            for _op in _path.operations:
+                _op_tree = _path_tree.add(_op.operation_id)
+                _request_tree = _op_tree.add("request")
+                if _op.request_body:
+                    _request_tree.add("body").add(_op.request_body.contents[0].get_id())
+                if _op.parameters:
+                    _params_tree = _request_tree.add("parameters")
+                    for _param in _op.parameters:
+                        _params_tree.add(f"{_param.name}: {_param.kind}")
+                _resp_tree = _op_tree.add("responses")
+                for _resp in _op.responses:
+                    _resp_tree.add(
+                        f"{_resp.status_code}: {', '.join([x.get_id() for x in _resp.contents])}"
+                    )
+        rich.print(tree)
 
     click.echo("finding out the base url...")
     success, message, verified_base_url = spec.find_base_url(
@@ -104,21 +282,99 @@ def generate(file: str, name: str, dest: str, url: str = None):
     click.echo("finding out the base url... done.")
 
     click.echo("generating ast...")
-    root = to_ast(spec, name, base_url=verified_base_url)
+    cache = GenerationCache(cache_dir) if cache_dir else None
+    registry = ComponentRegistry(spec, name)
+    click.echo(
+        f"    {len(registry.names)} component models for {registry.reference_count} references, dedup ratio {registry.dedup_ratio:.1f}x."
+    )
+    generate_ast = to_package_ast if layout == "package" else to_ast
+    with phase(profiler, "to_ast"):
+        root = generate_ast(
+            spec,
+            name,
+            base_url=verified_base_url,
+            cache=cache,
+            registry=registry,
+            jobs=jobs,
+            options=options,
+            profiler=profiler,
+        )
+    if cache:
+        click.echo(
+            f"    {cache.hits} classes and methods reused from the cache, {cache.misses} generated."
+        )
     click.echo("generating ast... done.")
 
+    click.echo("formatting code...")
+    format_cache = (
+        GenerationCache(os.path.join(cache_dir, "format")) if cache_dir else None
+    )
+    # the package layout generates a module per tag, the single layout one module
+    modules = root if isinstance(root, dict) else {name: root}
+    codes = format_modules(
+        modules,
+        formatter=format,
+        cache=format_cache,
+        jobs=jobs,
+        profiler=profiler,
+    )
+    if format_cache:
+        click.echo(
+            f"    {format_cache.hits} chunks reused from the cache, {format_cache.misses} formatted."
+        )
+    click.echo("formatting code... done.")
+
     click.echo("saving ast output...")
-    code = ast.unparse(root)
-    code_formatted = black.format_str(code, mode=black.FileMode())
-    with open(os.path.join(dest, f"{name}.py"), "w") as f:
-        f.write(code_formatted)
+    output_dir = dest
+    if layout == "package":
+        output_dir = os.path.join(dest, name)
+        os.makedirs(output_dir, exist_ok=True)
+    files = {}
+    with phase(profiler, "write"):
+        for module_name, code in codes.items():
+            path = os.path.join(output_dir, f"{module_name}.py")
+            with open(path, "w") as f:
+                f.write(code)
+            files[os.path.abspath(path)] = hashlib.sha256(code.encode()).hexdigest()
+    if remote is not None:
+        remote.commit()
+    if schema_cache is not None and generation_key:
+        schema_cache.set(generation_key, {"files": files})
     click.echo("saving ast output... done.")
 
     click.echo("cleaning up...")
-    if temp_file is not None:
-        os.remove(temp_file)
+    if remote is not None:
+        remote.discard()
     click.echo("cleaning up... done.")
 
+    echo_profile(profiler, profile_output)
+
+
+def files_unchanged(files: dict[str, str]) -> bool:
+    """
+    :param files: Sha256 hex digests of the files by their paths
+    :return: Whether every file still exists with the same content
+    """
+    for path, sha256 in files.items():
+        try:
+            with open(path, "rb") as f:
+                if hashlib.sha256(f.read()).hexdigest() != sha256:
+                    return False
+        except OSError:
+            return False
+    return True
+
+
+def echo_profile(profiler: Profiler | None, profile_output: str | None):
+    if profiler is None:
+        return
+    click.echo("profile:")
+    for line in profiler.report():
+        click.echo(f"    {line}")
+    if profile_output:
+        profiler.dump(profile_output)
+        click.echo(f'    the profile has been saved into "{profile_output}".')
+
 
 if __name__ == "__main__":
     generate()
@@ -0,0 +1,141 @@
+from collections.abc import Mapping
+from typing import Any
+from sdkops.openapi import APISpec, APISpecPathOperationContent
+from sdkops.json_schema import case_snake_to_pascal, RefResolver
+
+
+class ComponentRegistry:
+    """
+    Object schemas under components/schemas that are generated exactly once.
+
+    Every operation refers to these classes by their names instead of expanding
+    the component schema again. Components are ordered so that a class is
+    defined before the classes that refer to it, refs that can't be satisfied
+    that way (recursive schemas) are emitted as forward references.
+    """
+
+    prefix = "#/components/schemas/"
+
+    def __init__(
+        self, spec: APISpec, sdk_name: str, resolver: RefResolver | None = None
+    ):
+        self.sdk_name = sdk_name
+        self.resolver = resolver or RefResolver(spec.schema_dict)
+        self.schemas: dict[str, dict[str, Any]] = {}
+        self.names: dict[str, str] = {}
+        self.order: list[str] = []
+        self.reference_count: int = 0
+
+        components = spec.schema_dict.get("components", {}).get("schemas", {})
+        for component_name, schema in components.items():
+            if schema.get("type") == "object" and "properties" in schema:
+                ref = f"{self.prefix}{component_name}"
+                self.schemas[ref] = schema
+                self.names[ref] = case_snake_to_pascal(f"{sdk_name}_{component_name}")
+
+        # refs to other schemas are expanded in place, so are their dependencies
+        self.dependencies: dict[str, list[str]] = {}
+        for ref, schema in self.schemas.items():
+            dependencies = []
+            visited = set()
+            stack = [schema]
+            while stack:
+                for x in iter_refs(stack.pop()):
+                    if x in self.names:
+                        dependencies.append(x)
+                    elif x not in visited:
+                        visited.add(x)
+                        stack.append(self.resolver.resolve(x))
+            self.dependencies[ref] = dependencies
+        self.order = self._sort()
+        self.position = {ref: i for i, ref in enumerate(self.order)}
+
+        # each reference used to be a separate expansion of the component
+        for ref_list in self.dependencies.values():
+            self.reference_count += len(ref_list)
+        for path_item in spec.paths:
+            for operation in path_item.operations:
+                self.reference_count += len(
+                    [x for x in iter_refs(operation.schemas()) if x in self.names]
+                )
+
+    def _sort(self) -> list[str]:
+        # iterative depth-first search, dependencies come before dependents
+        order: list[str] = []
+        visited: set[str] = set()
+        for root in self.schemas:
+            if root in visited:
+                continue
+            visited.add(root)
+            stack = [(root, iter(self.dependencies[root]))]
+            while stack:
+                ref, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    order.append(ref)
+                    stack.pop()
+                elif child not in visited:
+                    visited.add(child)
+                    stack.append((child, iter(self.dependencies[child])))
+        return order
+
+    def ref_names_for(self, ref: str | None = None) -> Mapping[str, str]:
+        """
+        Class names to use while generating the given component.
+
+        :param ref: Ref of the component being generated, None for operations
+        :return: Class names by refs, quoted when they are forward references
+        """
+        if ref is None:
+            return self.names
+        return ForwardRefNames(self, self.position[ref])
+
+    def content_class_name(self, content: APISpecPathOperationContent) -> str:
+        if content.schema and content.schema.get("$ref") in self.names:
+            return self.names[content.schema["$ref"]]
+        return case_snake_to_pascal(f"{self.sdk_name}_{content.get_id()}")
+
+    @property
+    def dedup_ratio(self) -> float:
+        if not self.names:
+            return 1.0
+        return self.reference_count / len(self.names)
+
+
+class ForwardRefNames(Mapping):
+    """
+    Class names of the components, quoted if they are defined at or after the
+    given position.
+    """
+
+    def __init__(self, registry: ComponentRegistry, position: int):
+        self.registry = registry
+        self.position = position
+
+    def __getitem__(self, ref: str) -> str:
+        name = self.registry.names[ref]
+        if self.registry.position[ref] >= self.position:
+            return f'"{name}"'
+        return name
+
+    def __iter__(self):
+        return iter(self.registry.names)
+
+    def __len__(self):
+        return len(self.registry.names)
+
+
+def iter_refs(schema: Any):
+    """
+    Yields every ref in the schema, including the ones in nested schemas.
+    """
+    stack = [schema]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            ref = node.get("$ref")
+            if isinstance(ref, str):
+                yield ref
+            stack.extend(reversed(list(node.values())))
@@ -0,0 +1,883 @@
+import ast
+import textwrap
+from sdkops.options import GeneratorOptions
+
+# optional features of the generated sdk classes, each is a set of arguments
+# and statements for __init__, members of the class and module level support code
+
+
+def ast_sdk_class_extend(
+    class_def: ast.ClassDef, init: str = "", members: str = "", cleanup: str = ""
+):
+    """
+    Adds a feature to an sdk class generated by ast_generate_sdk_class.
+
+    :param class_def: Ast node of the sdk class
+    :param init: Source of an __init__ function, its arguments other than self
+        and its body are appended to the __init__ of the class. Its arguments
+        must have default values.
+    :param members: Source of the class members, a member with the name of an
+        existing method replaces it
+    :param cleanup: Source of the statements to append to _cleanup
+    """
+    methods = {
+        x.name: x
+        for x in class_def.body
+        if isinstance(x, (ast.FunctionDef, ast.AsyncFunctionDef))
+    }
+    if init:
+        init_def = next(
+            x
+            for x in ast.parse(textwrap.dedent(init)).body
+            if isinstance(x, ast.FunctionDef)
+        )
+        methods["__init__"].args.args.extend(init_def.args.args[1:])
+        methods["__init__"].args.defaults.extend(init_def.args.defaults)
+        methods["__init__"].body.extend(init_def.body)
+    if cleanup:
+        methods["_cleanup"].body.extend(ast.parse(textwrap.dedent(cleanup)).body)
+    for member in ast.parse(textwrap.dedent(members)).body:
+        name = getattr(member, "name", None)
+        if name in methods:
+            class_def.body[class_def.body.index(methods[name])] = member
+        else:
+            class_def.body.append(member)
+
+
+def ast_sdk_class_rename(class_def: ast.ClassDef, name: str, new_name: str):
+    """
+    Renames a method of an sdk class, so that a feature can wrap it with a
+    method of the same name that calls it by its new name.
+
+    :param class_def: Ast node of the sdk class
+    :param name: Name of the method
+    :param new_name: New name of the method
+    """
+    for member in class_def.body:
+        if isinstance(member, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if member.name == name:
+                member.name = new_name
+
+
+def ast_generate_features(
+    options: GeneratorOptions, has_paginations: bool = False
+) -> list[ast.stmt]:
+    """
+    Generates the module level support code of the enabled features: the
+    modules they import, each imported once with an underscore alias, and
+    their classes.
+
+    :param options: GeneratorOptions object
+    :param has_paginations: Whether any operation has a paginate_ method
+    :return: List of statements to add to the module of the sdk classes
+    """
+    imports, classes = [], []
+    if has_paginations:
+        imports.append("typing")
+    if options.hedging:
+        imports.extend(["collections", "time"])
+        if options.has_sync_client:
+            imports.extend(["threading", "concurrent.futures"])
+        if options.has_async_client:
+            imports.append("asyncio")
+        classes.append(HEDGE_POLICY)
+    if options.coalesce:
+        if options.has_sync_client:
+            imports.extend(["threading", "concurrent.futures"])
+        if options.has_async_client:
+            imports.append("asyncio")
+    if options.response_cache:
+        imports.extend(["collections", "threading", "time"])
+        classes.append(RESPONSE_CACHE)
+    if options.batch and options.has_async_client:
+        imports.extend(["asyncio", "typing"])
+        classes.append(BATCH_RESULT)
+    if options.instrumentation:
+        imports.extend(["bisect", "contextlib", "threading", "time"])
+        classes.append(INSTRUMENTATION)
+    statements = [f"import {x} as _{x.split('.')[-1]}" for x in dict.fromkeys(imports)]
+    return ast.parse("\n".join(statements + classes)).body
+
+
+def ast_add_features(
+    class_def: ast.ClassDef, options: GeneratorOptions, is_async: bool = False
+):
+    """
+    Adds the enabled features to an sdk class generated by
+    ast_generate_sdk_class.
+
+    :param class_def: Ast node of the sdk class
+    :param options: GeneratorOptions object
+    :param is_async: Whether it's the async sdk class
+    """
+    # hedging replaces _send_request, coalescing, the response cache and the
+    # instrumentation wrap it, so that the cache answers before requests are
+    # merged and every call is observed
+    if options.hedging:
+        ast_add_hedging(class_def, is_async)
+    if options.coalesce:
+        ast_add_coalescing(class_def, is_async)
+    if options.response_cache:
+        ast_add_response_cache(class_def, is_async)
+    if options.batch and is_async:
+        ast_add_batch(class_def)
+    if options.instrumentation:
+        ast_add_instrumentation(class_def, is_async)
+
+
+# the delay is either fixed, or a percentile of the latencies observed so far,
+# recomputed every 20 requests out of the last 1000
+HEDGE_POLICY = """
+class _HedgePolicy:
+    def __init__(self, delay: float | None, percentile: float | None):
+        self.delay = delay
+        self.percentile = percentile
+        self._latencies = _collections.deque(maxlen=1000)
+        self._observed = 0
+        self._percentile_delay = None
+
+    def observe(self, seconds: float):
+        self._latencies.append(seconds)
+        self._observed += 1
+        if self.percentile is not None and self._observed % 20 == 0:
+            latencies = sorted(self._latencies)
+            index = int(len(latencies) * self.percentile / 100)
+            self._percentile_delay = latencies[min(index, len(latencies) - 1)]
+
+    def hedge_delay(self) -> float | None:
+        if self.delay is not None:
+            return self.delay
+        return self._percentile_delay
+"""
+
+
+def ast_add_hedging(class_def: ast.ClassDef, is_async: bool = False):
+    """
+    Lets the sdk class hedge its requests: when the response of a request
+    doesn't arrive within the hedge delay, the same request is sent again and
+    the response that arrives first is returned. The other request is
+    cancelled, in the sync class only if it hasn't started yet since a
+    blocking request can't be interrupted, its response is then discarded.
+
+    The sync class sends both requests from a thread pool of twice as many
+    threads as the connections of the client, so that concurrent calls don't
+    queue for the threads before they would for the connections. The hedge
+    delay is counted from the moment the first request starts.
+
+    :param class_def: Ast node of the sdk class
+    :param is_async: Whether it's the async sdk class
+    """
+    if is_async:
+        init = """
+        def __init__(self, hedge_delay: float | None = None, hedge_percentile: float | None = 95):
+            self._hedge_policy = _HedgePolicy(hedge_delay, hedge_percentile)
+        """
+        members = """
+        async def _send_request(self, request: httpx.Request, hedge: bool = False) -> httpx.Response:
+            try:
+                if hedge:
+                    return await self._send_hedged(request)
+                return await self.client.send(request)
+            except httpx.HTTPError as e:
+                message = f"An unexpected error occurred while handling request to {e.request.url}. {e}"
+                return httpx.Response(status_code=500, json={'error': {'code': 'unexpected', 'message': message}})
+
+        async def _send_timed(self, request: httpx.Request) -> httpx.Response:
+            start = _time.perf_counter()
+            response = await self.client.send(request)
+            self._hedge_policy.observe(_time.perf_counter() - start)
+            return response
+
+        async def _send_hedged(self, request: httpx.Request) -> httpx.Response:
+            delay = self._hedge_policy.hedge_delay()
+            if delay is None:
+                return await self._send_timed(request)
+            tasks = [_asyncio.ensure_future(self._send_timed(request))]
+            try:
+                done, _ = await _asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    tasks.append(_asyncio.ensure_future(self._send_timed(request)))
+                error = None
+                pending = set(tasks)
+                while pending:
+                    done, pending = await _asyncio.wait(pending, return_when=_asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            return task.result()
+                        error = error or task.exception()
+                raise error
+            finally:
+                for task in tasks:
+                    task.cancel()
+        """
+        return ast_sdk_class_extend(class_def, init, members)
+
+    init = """
+    def __init__(self, hedge_delay: float | None = None, hedge_percentile: float | None = 95):
+        self._hedge_policy = _HedgePolicy(hedge_delay, hedge_percentile)
+        self._hedge_executor = _futures.ThreadPoolExecutor(
+            2 * (self.max_connections or 100), thread_name_prefix="hedge"
+        )
+    """
+    members = """
+    def _send_request(self, request: httpx.Request, hedge: bool = False) -> httpx.Response:
+        try:
+            if hedge:
+                return self._send_hedged(request)
+            return self.client.send(request)
+        except httpx.HTTPError as e:
+            message = f"An unexpected error occurred while handling request to {e.request.url}. {e}"
+            return httpx.Response(status_code=500, json={'error': {'code': 'unexpected', 'message': message}})
+
+    def _send_timed(self, request: httpx.Request) -> httpx.Response:
+        start = _time.perf_counter()
+        response = self.client.send(request)
+        self._hedge_policy.observe(_time.perf_counter() - start)
+        return response
+
+    def _send_hedged(self, request: httpx.Request) -> httpx.Response:
+        delay = self._hedge_policy.hedge_delay()
+        if delay is None:
+            return self._send_timed(request)
+        started = _threading.Event()
+
+        def send_first():
+            started.set()
+            return self._send_timed(request)
+
+        futures = [self._hedge_executor.submit(send_first)]
+        try:
+            # time spent waiting for a thread of the pool isn't the server being slow
+            started.wait()
+            done, _ = _futures.wait(futures, timeout=delay)
+            if not done:
+                futures.append(self._hedge_executor.submit(self._send_timed, request))
+            error = None
+            for future in _futures.as_completed(futures):
+                if future.exception() is None:
+                    return future.result()
+                error = error or future.exception()
+            raise error
+        finally:
+            for future in futures:
+                future.cancel()
+    """
+    cleanup = """
+    self._hedge_executor.shutdown(wait=False, cancel_futures=True)
+    """
+    return ast_sdk_class_extend(class_def, init, members, cleanup)
+
+
+# responses are kept by url and request headers, fresh ones are served
+# without a request and stale ones with an etag are revalidated
+RESPONSE_CACHE = """
+class _CachedResponse:
+    __slots__ = ("expires", "etag", "headers", "content")
+
+    def __init__(self, expires: float, etag: str | None, headers: list, content: bytes):
+        self.expires = expires
+        self.etag = etag
+        self.headers = headers
+        self.content = content
+
+    def is_fresh(self) -> bool:
+        return _time.monotonic() < self.expires
+
+    def to_response(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, headers=self.headers, content=self.content, request=request)
+
+
+class _ResponseCache:
+    def __init__(self, maxsize: int = 256, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = _collections.OrderedDict()
+        self._lock = _threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def lookup(self, key: tuple) -> _CachedResponse | None:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            self._entries.move_to_end(key)
+            if cached.is_fresh():
+                self.hits += 1
+            return cached
+
+    def update(self, key: tuple, cached: _CachedResponse | None, request: httpx.Request, response: httpx.Response) -> httpx.Response:
+        if response.status_code == 304 and cached is not None:
+            expires = _time.monotonic() + (self.lifetime(response) or 0)
+            with self._lock:
+                cached.expires = expires
+                cached.etag = response.headers.get("etag", cached.etag)
+                self.hits += 1
+            return cached.to_response(request)
+        with self._lock:
+            self.misses += 1
+        if response.status_code != 200:
+            return response
+        lifetime = self.lifetime(response)
+        etag = response.headers.get("etag")
+        if lifetime is None or (lifetime == 0 and etag is None):
+            return response
+        # the content is decoded already
+        headers = [
+            (k, v)
+            for k, v in response.headers.multi_items()
+            if k not in ("content-encoding", "content-length", "transfer-encoding")
+        ]
+        cached = _CachedResponse(_time.monotonic() + lifetime, etag, headers, response.content)
+        with self._lock:
+            self._entries[key] = cached
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return response
+
+    def lifetime(self, response: httpx.Response) -> float | None:
+        directives = {}
+        for directive in response.headers.get("cache-control", "").split(","):
+            name, _, value = directive.strip().partition("=")
+            directives[name.lower()] = value.strip('"')
+        # a response that varies by more than the request headers can't be reused
+        if "no-store" in directives or response.headers.get("vary", "").strip() == "*":
+            return None
+        lifetime = 0
+        if "max-age" in directives and "no-cache" not in directives:
+            try:
+                lifetime = max(int(directives["max-age"]), 0)
+            except ValueError:
+                pass
+        if self.ttl is not None:
+            lifetime = min(lifetime, self.ttl)
+        return lifetime
+"""
+
+
+def ast_add_response_cache(class_def: ast.ClassDef, is_async: bool = False):
+    """
+    Lets the sdk class cache the responses of get requests in memory, by
+    their url and request headers. A response is fresh for the max-age of its Cache-Control header, capped by
+    response_cache_ttl, and served without a request while it's fresh. A
+    response with an ETag is revalidated with If-None-Match after that, and a
+    304 response is answered from the cache. The least recently used
+    responses are dropped beyond response_cache_size, a size of 0 disables
+    the cache.
+
+    :param class_def: Ast node of the sdk class
+    :param is_async: Whether it's the async sdk class
+    """
+    async_, await_ = ("async ", "await ") if is_async else ("", "")
+    # the existing _send_request sends the requests the cache can't answer
+    ast_sdk_class_rename(class_def, "_send_request", "_send_uncached")
+    init = """
+    def __init__(self, response_cache_size: int = 256, response_cache_ttl: float | None = None):
+        self.response_cache = _ResponseCache(response_cache_size, response_cache_ttl) if response_cache_size else None
+    """
+    members = f"""
+    {async_}def _send_request(self, request: httpx.Request, **kwargs) -> httpx.Response:
+        cache = self.response_cache
+        if cache is None or request.method != "GET":
+            return {await_}self._send_uncached(request, **kwargs)
+        # every header of the request, so that whatever a response varies by is in the key
+        key = (str(request.url), tuple(request.headers.multi_items()))
+        cached = cache.lookup(key)
+        if cached is not None and cached.is_fresh():
+            return cached.to_response(request)
+        if cached is not None and cached.etag is not None:
+            request.headers["if-none-match"] = cached.etag
+        response = {await_}self._send_uncached(request, **kwargs)
+        return cache.update(key, cached, request, response)
+    """
+    return ast_sdk_class_extend(class_def, init, members)
+
+
+def ast_add_coalescing(class_def: ast.ClassDef, is_async: bool = False):
+    """
+    Lets the sdk class merge identical requests that are in flight at the
+    same time: the methods that send coalesce=True share the response of the
+    first request with the same method, url and headers, instead of sending
+    their own. The async class sends the request in a task of its own, so
+    that cancelling the first caller doesn't cancel the others.
+
+    :param class_def: Ast node of the sdk class
+    :param is_async: Whether it's the async sdk class
+    """
+    ast_sdk_class_rename(class_def, "_send_request", "_send_uncoalesced")
+    if is_async:
+        init = """
+        def __init__(self):
+            self._in_flight = {}
+        """
+        members = """
+        async def _send_request(self, request: httpx.Request, coalesce: bool = False, **kwargs) -> httpx.Response:
+            if not coalesce:
+                return await self._send_uncoalesced(request, **kwargs)
+            key = (request.method, str(request.url), tuple(request.headers.multi_items()))
+            task = self._in_flight.get(key)
+            if task is None:
+                task = _asyncio.ensure_future(self._send_uncoalesced(request, **kwargs))
+                self._in_flight[key] = task
+                task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+            return await _asyncio.shield(task)
+        """
+        return ast_sdk_class_extend(class_def, init, members)
+
+    init = """
+    def __init__(self):
+        self._in_flight = {}
+        self._in_flight_lock = _threading.Lock()
+    """
+    members = """
+    def _send_request(self, request: httpx.Request, coalesce: bool = False, **kwargs) -> httpx.Response:
+        if not coalesce:
+            return self._send_uncoalesced(request, **kwargs)
+        key = (request.method, str(request.url), tuple(request.headers.multi_items()))
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = _futures.Future()
+        if not leader:
+            return future.result()
+        try:
+            response = self._send_uncoalesced(request, **kwargs)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+    """
+    return ast_sdk_class_extend(class_def, init, members)
+
+
+BATCH_RESULT = """
+class _BatchResult:
+    __slots__ = ("index", "item", "value", "error")
+
+    def __init__(self, index: int, item, value, error: Exception | None):
+        self.index = index
+        self.item = item
+        self.value = value
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"_BatchResult(index={self.index!r}, value={self.value!r}, error={self.error!r})"
+"""
+
+
+def ast_add_batch(class_def: ast.ClassDef):
+    """
+    Adds batch to the async sdk class, which calls a method once for every
+    item of an iterable with at most `concurrency` calls in flight. Items are
+    consumed lazily, and the results are yielded as they complete or in the
+    order of the items, the exception of a failed call is kept in its result
+    instead of stopping the batch. In order, the results that wait for an
+    earlier call take up the places of calls, so that a slow call doesn't let
+    them pile up.
+
+    :param class_def: Ast node of the async sdk class
+    """
+    members = """
+    async def batch(
+        self,
+        method: _typing.Callable[..., _typing.Awaitable],
+        items: _typing.Iterable,
+        concurrency: int = 10,
+        ordered: bool = True,
+    ) -> _typing.AsyncIterator[_BatchResult]:
+        async def call(index: int, item) -> _BatchResult:
+            # a tuple is positional arguments, a dict keyword arguments
+            if isinstance(item, tuple):
+                args, kwargs = item, {}
+            elif isinstance(item, dict):
+                args, kwargs = (), item
+            else:
+                args, kwargs = (item,), {}
+            try:
+                return _BatchResult(index, item, await method(*args, **kwargs), None)
+            except Exception as e:
+                return _BatchResult(index, item, None, e)
+
+        items = enumerate(items)
+        pending = set()
+        completed = {}
+        next_index = 0
+        exhausted = False
+        try:
+            while True:
+                # results waiting for an earlier one count against the concurrency
+                while not exhausted and len(pending) + len(completed) < concurrency:
+                    try:
+                        index, item = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.add(_asyncio.ensure_future(call(index, item)))
+                if not pending:
+                    break
+                done, pending = await _asyncio.wait(pending, return_when=_asyncio.FIRST_COMPLETED)
+                for result in sorted((x.result() for x in done), key=lambda x: x.index):
+                    if not ordered:
+                        yield result
+                    else:
+                        completed[result.index] = result
+                while next_index in completed:
+                    yield completed.pop(next_index)
+                    next_index += 1
+        finally:
+            for task in pending:
+                task.cancel()
+    """
+    return ast_sdk_class_extend(class_def, members=members)
+
+
+def ast_generate_map_method(operation_id: str) -> ast.AsyncFunctionDef:
+    """
+    Generates the map_ method of an operation, batch bound to its method.
+
+    :param operation_id: Operation id, the name of the method
+    :return: Ast node of the method of the async sdk class
+    """
+    # the annotations are strings, the tag modules of a package don't import
+    # the names of its __init__
+    body = ast.parse(
+        f"""
+async def map_{operation_id}(
+    self, items: "_typing.Iterable", concurrency: int = 10, ordered: bool = True
+) -> "_typing.AsyncIterator[_BatchResult]":
+    async for result in self.batch(self.{operation_id}, items, concurrency, ordered):
+        yield result
+"""
+    ).body
+    return next(x for x in body if isinstance(x, ast.AsyncFunctionDef))
+
+
+def ast_add_pagination(class_def: ast.ClassDef, is_async: bool = False):
+    """
+    Adds _paginate to the sdk class, the generator behind the paginate_
+    methods. It calls a method with the arguments of the next page as soon as
+    a page arrives, and yields the page meanwhile, so the next page is
+    fetched while the caller handles the current one: in a thread in the
+    sync class, in a task in the async class. Pagination stops at a page
+    without items, which isn't yielded unless it's the first page, a page
+    shorter than the limit, or a page without a next cursor.
+
+    :param class_def: Ast node of the sdk class
+    :param is_async: Whether it's the async sdk class
+    """
+    if is_async:
+        loop = """
+        page = await method(**kwargs)
+        task = None
+        try:
+            while True:
+                kwargs = next_kwargs(kwargs, page)
+                if kwargs is None:
+                    yield page
+                    return
+                task = asyncio.ensure_future(method(**kwargs))
+                yield page
+                page = await task
+                if items_of(page) == []:
+                    return
+        finally:
+            if task is not None:
+                task.cancel()
+        """
+    else:
+        loop = """
+        executor = ThreadPoolExecutor(1, thread_name_prefix="paginate")
+        try:
+            page = method(**kwargs)
+            while True:
+                kwargs = next_kwargs(kwargs, page)
+                if kwargs is None:
+                    yield page
+                    return
+                future = executor.submit(method, **kwargs)
+                yield page
+                page = future.result()
+                if items_of(page) == []:
+                    return
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        """
+    async_ = "async " if is_async else ""
+    import_ = (
+        "import asyncio"
+        if is_async
+        else "from concurrent.futures import ThreadPoolExecutor"
+    )
+    members = f"""
+    {async_}def _paginate(
+        self,
+        method,
+        kwargs: dict,
+        style: str,
+        param: str,
+        start: int = 0,
+        items_field: str | None = None,
+        next_field: str | None = None,
+        limit: str | None = None,
+        limit_default: int | None = None,
+    ):
+        {import_}
+
+        def field(page, name: str):
+            if isinstance(page, dict):
+                return page.get(name)
+            return getattr(page, name, None)
+
+        def items_of(page):
+            return page if items_field is None else field(page, items_field)
+
+        def next_kwargs(kwargs: dict, page) -> dict | None:
+            # arguments of the page after this one, None when it's the last page
+            items = items_of(page)
+            if not isinstance(items, list) or not items:
+                return None
+            if style == "cursor":
+                cursor = field(page, next_field)
+                return {{**kwargs, param: cursor}} if cursor else None
+            page_size = kwargs.get(limit, limit_default) if limit else None
+            if page_size is not None and len(items) < page_size:
+                return None
+            if style == "offset":
+                return {{**kwargs, param: kwargs.get(param, start) + len(items)}}
+            return {{**kwargs, param: kwargs.get(param, start) + 1}}
+{textwrap.indent(textwrap.dedent(loop), " " * 8)}
+    """
+    return ast_sdk_class_extend(class_def, members=members)
+
+
+def ast_generate_paginate_method(
+    operation_id: str,
+    pagination: dict,
+    returns: ast.expr | None,
+    is_async: bool = False,
+) -> ast.FunctionDef | ast.AsyncFunctionDef:
+    """
+    Generates the paginate_ method of an operation, it takes the arguments of
+    the method of the operation and yields its pages.
+
+    :param operation_id: Operation id, the name of the method
+    :param pagination: Keyword arguments of _paginate, see operation_pagination
+    :param returns: Return annotation of the method of the operation
+    :param is_async: Generates an async generator for the async sdk class
+    :return: Ast node of the method
+    """
+    page = ast.unparse(returns) if returns is not None else "dict"
+    arguments = ", ".join(f"{k}={v!r}" for k, v in pagination.items())
+    call = f"self._paginate(self.{operation_id}, kwargs, {arguments})"
+    # the annotations are strings, the tag modules of a package don't import
+    # the names of its __init__
+    if is_async:
+        source = f"""
+async def paginate_{operation_id}(self, **kwargs) -> "_typing.AsyncIterator[{page}]":
+    async for page in {call}:
+        yield page
+"""
+    else:
+        source = f"""
+def paginate_{operation_id}(self, **kwargs) -> "_typing.Iterator[{page}]":
+    return {call}
+"""
+    return next(
+        x
+        for x in ast.parse(source).body
+        if isinstance(x, (ast.FunctionDef, ast.AsyncFunctionDef))
+    )
+
+
+# an event is created for every call, it's passed to the hooks and it times
+# the phases of the call from the trace events of httpcore, which aren't sent
+# by custom transports, their calls are all wait
+INSTRUMENTATION = """
+class _CallEvent:
+    __slots__ = (
+        "operation_id",
+        "request",
+        "response",
+        "error",
+        "connect",
+        "send",
+        "wait",
+        "receive",
+        "decode",
+        "total",
+        "request_bytes",
+        "response_bytes",
+        "_finished",
+        "_marks",
+        "_start",
+        "_received",
+    )
+
+    def __init__(self, operation_id: str, request: httpx.Request, finished):
+        self.operation_id = operation_id
+        self.request = request
+        self.response = None
+        self.error = None
+        self.connect = self.send = self.wait = self.receive = self.decode = self.total = 0.0
+        self.request_bytes = int(request.headers.get("content-length", 0))
+        self.response_bytes = 0
+        self._finished = finished
+        self._marks = {}
+        self._start = _time.perf_counter()
+        self._received = self._start
+
+    def trace(self, name: str, info: dict):
+        # http11.send_request_headers.started and http2.send_request_headers.started alike
+        if name.startswith("http"):
+            name = name.split(".", 1)[1]
+        self._marks[name] = _time.perf_counter()
+
+    async def atrace(self, name: str, info: dict):
+        self.trace(name, info)
+
+    def received(self, response: httpx.Response | None, error: Exception | None = None):
+        self._received = _time.perf_counter()
+        self.response = response
+        self.error = error
+        if response is not None:
+            # responses of custom transports aren't downloaded
+            self.response_bytes = response.num_bytes_downloaded or len(response.content)
+
+        def span(start: str, end: str) -> float:
+            if start in self._marks and end in self._marks:
+                return self._marks[end] - self._marks[start]
+            return 0.0
+
+        connected = "connection.start_tls.complete"
+        if connected not in self._marks:
+            connected = "connection.connect_tcp.complete"
+        self.connect = span("connection.connect_tcp.started", connected)
+        self.send = span("send_request_headers.started", "send_request_body.complete")
+        self.wait = span("send_request_body.complete", "receive_response_headers.complete")
+        self.receive = span("receive_response_headers.complete", "receive_response_body.complete")
+        if not self._marks:
+            self.wait = self._received - self._start
+
+    def finish(self, error: BaseException | None = None):
+        now = _time.perf_counter()
+        self.decode = now - self._received
+        self.total = now - self._start
+        if isinstance(error, Exception):
+            self.error = error
+        self._finished(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        self.finish(error)
+        return False
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None or self.response is None or self.response.status_code >= 400
+
+
+class _LatencyHistogram:
+    # upper bounds of the buckets in seconds, the last bucket has no bound
+    bounds = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self._lock = _threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.sum += seconds
+            self.buckets[_bisect.bisect_left(self.bounds, seconds)] += 1
+
+    def to_dict(self) -> dict:
+        bounds = [str(x) for x in self.bounds] + ["inf"]
+        return {"count": self.count, "sum": self.sum, "buckets": dict(zip(bounds, self.buckets))}
+
+
+_no_event = _contextlib.nullcontext()
+"""
+
+
+def ast_add_instrumentation(class_def: ast.ClassDef, is_async: bool = False):
+    """
+    Lets the sdk class report its calls: before_send is called with the
+    _CallEvent of a call before its request is sent, after_response once its
+    response is decoded, and on_error as well when it fails, with an error
+    status code or an exception. With histograms=True, the total time of the
+    calls is counted in a _LatencyHistogram per operation. Without hooks and
+    histograms, a call costs an attribute check and a null context.
+
+    :param class_def: Ast node of the sdk class
+    :param is_async: Whether it's the async sdk class
+    """
+    async_, await_ = ("async ", "await ") if is_async else ("", "")
+    ast_sdk_class_rename(class_def, "_send_request", "_send_uninstrumented")
+    init = """
+    def __init__(self, before_send=None, after_response=None, on_error=None, histograms: bool = False):
+        self.before_send = before_send
+        self.after_response = after_response
+        self.on_error = on_error
+        self.histograms = {} if histograms else None
+    """
+    members = f"""
+    {async_}def _send_request(self, request: httpx.Request, operation_id: str = "", **kwargs) -> httpx.Response:
+        if (
+            self.before_send is None
+            and self.after_response is None
+            and self.on_error is None
+            and self.histograms is None
+        ):
+            return {await_}self._send_uninstrumented(request, **kwargs)
+        event = _CallEvent(operation_id, request, self._call_finished)
+        request.extensions["trace"] = event.{"atrace" if is_async else "trace"}
+        if self.before_send is not None:
+            self.before_send(event)
+        try:
+            response = {await_}self._send_uninstrumented(request, **kwargs)
+        except Exception as e:
+            event.received(None, e)
+            event.finish()
+            raise
+        event.received(response)
+        response.extensions["sdk_event"] = event
+        return response
+
+    def _observe(self, response: httpx.Response):
+        return response.extensions.get("sdk_event", _no_event)
+
+    def _call_finished(self, event: _CallEvent):
+        if self.histograms is not None:
+            histogram = self.histograms.get(event.operation_id)
+            if histogram is None:
+                histogram = self.histograms.setdefault(event.operation_id, _LatencyHistogram())
+            histogram.observe(event.total)
+        if self.after_response is not None and event.response is not None:
+            self.after_response(event)
+        if self.on_error is not None and event.failed:
+            self.on_error(event)
+
+    def histograms_json(self) -> str:
+        import json
+
+        histograms = self.histograms or {{}}
+        return json.dumps({{k: v.to_dict() for k, v in histograms.items()}})
+    """
+    return ast_sdk_class_extend(class_def, init, members)
@@ -0,0 +1,147 @@
+import os
+import json
+import contextlib
+import hashlib
+import tempfile
+from typing import Any
+import httpx
+from sdkops.cache import GenerationCache
+
+
+class RemoteSchema:
+    """
+    Schema fetched from a url. Either the decoded schema or the file it's
+    saved into is set, or both, depending on how it was fetched.
+
+    A fetched schema goes into the cache only once it's committed, after it's
+    parsed, so that a response that isn't a schema is never revalidated.
+    """
+
+    def __init__(self):
+        self.url: str = ""
+        self.schema_dict: dict[str, Any] | None = None
+        self.file: str | None = None
+        # whether file is a temporary file to remove once the schema is parsed
+        self.temporary: bool = False
+        self.sha256: str = ""
+        self.not_modified: bool = False
+        # cache, key, path and entry to store the file into on commit
+        self._pending: tuple[GenerationCache, str, str, dict[str, Any]] | None = None
+
+    def commit(self):
+        """
+        Moves the fetched file into the cache and stores its validators.
+        """
+        if self._pending is None:
+            return
+        cache, key, body_path, entry = self._pending
+        os.replace(self.file, body_path)
+        cache.set(key, entry)
+        self.file = body_path
+        self.temporary = False
+        self._pending = None
+
+    def discard(self):
+        """
+        Removes the temporary file of the schema, leaving the cache as it was.
+        """
+        if self.temporary:
+            os.remove(self.file)
+        self.temporary = False
+        self._pending = None
+
+
+def fetch_schema(
+    url: str, cache: GenerationCache | None = None, stream: bool = False
+) -> RemoteSchema:
+    """
+    Fetches a json schema, reading the response body in chunks.
+
+    With a cache, the body is saved into it together with the etag and
+    last-modified headers of the response once the result is committed, and
+    the next fetch of the url is a conditional request. When the server
+    answers 304 not modified, nothing is downloaded or decoded, the cached
+    file is returned instead.
+
+    Without stream the chunks are kept in memory and decoded once the body is
+    complete, so the schema is parsed once and never read back from a file.
+    With stream they are written into a temporary file for `parse_file` to
+    read incrementally, which is moved into the cache on commit.
+
+    :param url: Url of the schema
+    :param cache: GenerationCache object to keep the schema in
+    :param stream: Whether the schema will be parsed from a file
+    :return: RemoteSchema object
+    """
+    result = RemoteSchema()
+    result.url = url
+    entry = None
+    headers = {}
+    if cache is not None:
+        key = cache.key("schema", url)
+        body_path = schema_body_path(cache, key)
+        entry = cache.get(key)
+        if entry is not None and os.path.isfile(body_path):
+            if entry["etag"]:
+                headers["if-none-match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["if-modified-since"] = entry["last_modified"]
+
+    with httpx.stream("GET", url, headers=headers) as r:
+        if r.status_code == 304 and headers and entry is not None:
+            result.file = body_path
+            result.sha256 = entry["sha256"]
+            result.not_modified = True
+            return result
+        if r.status_code < 200 or r.status_code >= 300:
+            raise Exception(
+                f'couldn\'t fetch the schema from "{url}". http request failed with status code {r.status_code}.'
+            )
+
+        hasher = hashlib.sha256()
+        chunks: list[bytes] = []
+        f = None
+        if cache is not None or stream:
+            # next to the cached body, so that it can be moved over it
+            fd, result.file = tempfile.mkstemp(
+                dir=os.path.dirname(body_path) if cache is not None else None,
+                suffix=".tmp",
+            )
+            result.temporary = True
+            f = os.fdopen(fd, "wb")
+        try:
+            with f if f is not None else contextlib.nullcontext():
+                for chunk in r.iter_bytes():
+                    hasher.update(chunk)
+                    if f is not None:
+                        f.write(chunk)
+                    if not stream:
+                        chunks.append(chunk)
+            if not stream:
+                try:
+                    result.schema_dict = json.loads(b"".join(chunks))
+                except ValueError:
+                    raise Exception(f'the schema fetched from "{url}" is not a json.')
+        except BaseException:
+            result.discard()
+            raise
+
+    result.sha256 = hasher.hexdigest()
+    if cache is not None:
+        result._pending = (
+            cache,
+            key,
+            body_path,
+            {
+                "etag": r.headers.get("etag"),
+                "last_modified": r.headers.get("last-modified"),
+                "sha256": result.sha256,
+            },
+        )
+    return result
+
+
+def schema_body_path(cache: GenerationCache, key: str) -> str:
+    path = cache.path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path[: -len(".json")] + ".schema.json"
@@ -0,0 +1,142 @@
+import ast
+import black
+from concurrent.futures import ProcessPoolExecutor
+from sdkops.cache import GenerationCache
+from sdkops.profiler import Profiler, phase
+
+FORMATTERS = ("black", "none")
+
+_functions = (ast.FunctionDef, ast.AsyncFunctionDef)
+_definitions = (ast.ClassDef, *_functions)
+_imports = (ast.Import, ast.ImportFrom)
+
+
+def format_modules(
+    modules: dict[str, ast.Module],
+    formatter: str = "black",
+    cache: GenerationCache | None = None,
+    jobs: int = 1,
+    profiler: Profiler | None = None,
+) -> dict[str, str]:
+    """
+    Turns the modules into source code, formatting them chunk by chunk.
+
+    Every top level statement is a chunk, classes that only have methods (like
+    the sdk classes) are split further into a chunk per method. Chunks are
+    formatted on their own, and the blank lines black would put between them
+    are added while they are put together, so the result is the same as
+    formatting the whole module at once. That way chunks can be formatted in
+    parallel, and the unchanged ones reused from the cache.
+
+    :param modules: Ast modules by their names
+    :param formatter: "black", or "none" to leave the code as it's unparsed
+    :param cache: GenerationCache object to keep the formatted chunks in
+    :param jobs: Number of processes to format the chunks with
+    :param profiler: Profiler object to measure unparsing and formatting with
+    :return: Source code of the modules by their names
+    """
+    if formatter not in FORMATTERS:
+        raise ValueError(f"formatter must be one of {', '.join(FORMATTERS)}.")
+    if formatter == "none":
+        with phase(profiler, "unparse"):
+            return {
+                name: ast.unparse(module) + "\n" for name, module in modules.items()
+            }
+
+    with phase(profiler, "unparse"):
+        module_chunks = {name: split_chunks(module) for name, module in modules.items()}
+    with phase(profiler, "black"):
+        chunks = [chunk for x in module_chunks.values() for _, chunk in x]
+        keys = [
+            cache.key("format", black.__version__, *x) if cache else None
+            for x in chunks
+        ]
+        results = [cache.get(key) if cache and key else None for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if jobs > 1 and len(missing) > 1:
+            with ProcessPoolExecutor(jobs) as executor:
+                formatted = list(
+                    executor.map(
+                        format_chunk,
+                        [chunks[i] for i in missing],
+                        chunksize=max(1, len(missing) // (jobs * 4)),
+                    )
+                )
+        else:
+            formatted = [format_chunk(chunks[i]) for i in missing]
+        for i, code in zip(missing, formatted):
+            results[i] = result = {"code": code}
+            key = keys[i]
+            if cache and key:
+                cache.set(key, result)
+
+    codes = iter(x["code"] for x in results if x is not None)
+    return {
+        name: "".join(separator + next(codes) for separator, _ in x)
+        for name, x in module_chunks.items()
+    }
+
+
+def split_chunks(module: ast.Module) -> list[tuple[str, tuple[str, str]]]:
+    """
+    Splits the module into chunks that can be formatted independently.
+
+    :param module: Ast module
+    :return: Blank lines to put before each chunk and the chunk, which is a
+        kind and the unformatted source of it
+    """
+    chunks = []
+    previous = None
+    for node in module.body:
+        separator = "" if previous is None else chunk_separator(previous, node)
+        previous = node
+        if not (
+            isinstance(node, ast.ClassDef)
+            and not node.decorator_list
+            and node.body
+            and all(isinstance(x, _functions) for x in node.body)
+        ):
+            chunks.append((separator, ("statement", ast.unparse(node))))
+            continue
+        header = ast.ClassDef(
+            name=node.name,
+            bases=node.bases,
+            keywords=node.keywords,
+            body=[ast.Pass()],
+            decorator_list=[],
+            type_params=[],
+        )
+        chunks.append((separator, ("header", ast.unparse(header))))
+        for member in node.body:
+            # methods are formatted in a placeholder class to keep their indentation
+            member_class = ast.ClassDef(
+                name="_",
+                bases=[],
+                keywords=[],
+                body=[member],
+                decorator_list=[],
+                type_params=[],
+            )
+            chunks.append(("", ("member", ast.unparse(member_class))))
+    return chunks
+
+
+def chunk_separator(previous: ast.stmt, node: ast.stmt) -> str:
+    # two blank lines around definitions, one after the imports
+    if isinstance(previous, _definitions) or isinstance(node, _definitions):
+        return "\n\n"
+    if isinstance(previous, _imports) and not isinstance(node, _imports):
+        return "\n"
+    return ""
+
+
+def format_chunk(chunk: tuple[str, str]) -> str:
+    kind, source = chunk
+    code = black.format_str(source, mode=black.FileMode())
+    if kind == "header":
+        # drop the pass statement in the body
+        return code[: code.rindex("\n", 0, -1) + 1]
+    if kind == "member":
+        # drop the placeholder class
+        return code[code.index("\n") + 1 :]
+    return code
@@ -1,85 +1,679 @@
 import ast
 import re
-from typing import Any
-from sdkops.openapi import APISpec, APISpecPathOperation
+import time
+import itertools
+import textwrap
+import contextlib
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Iterable
+from sdkops.openapi import APISpec, APISpecPathOperation, APISpecPathOperationContent
+from sdkops.cache import GenerationCache
+from sdkops.components import ComponentRegistry
+from sdkops.options import GeneratorOptions
+from sdkops.profiler import Profiler
+from sdkops.features import (
+    ast_add_features,
+    ast_add_pagination,
+    ast_generate_features,
+    ast_generate_map_method,
+    ast_generate_paginate_method,
+)
 from sdkops.json_schema import (
     case_snake_to_pascal,
     to_ast as schema_to_ast,
     schema_type_to_py_type,
     ast_create_annotation,
-    schema_resolve_ref,
     find_default_value_from_types,
+    RefResolver,
 )
 
 
-def to_ast(spec: APISpec, sdk_name: str, base_url: str | None):
+def to_ast(
+    spec: APISpec,
+    sdk_name: str,
+    base_url: str | None,
+    cache: GenerationCache | None = None,
+    registry: ComponentRegistry | None = None,
+    resolver: RefResolver | None = None,
+    jobs: int = 1,
+    options: GeneratorOptions | None = None,
+    profiler: Profiler | None = None,
+):
     # import statements
     import_stmt = ast.Import(names=[ast.alias("httpx")])
 
-    # json schemas to python classes
-    schema_class_defs: list[ast.ClassDef] = []
-    for path_item in spec.paths:
-        for operation in path_item.operations:
-            if operation.request_body is not None:
-                for content in operation.request_body.contents:
-                    if content.schema:
-                        combined_schema = {
-                            **content.schema,
-                            **{"components": spec.schema_dict["components"]},
-                        }
-                        class_defs = schema_to_ast(
-                            f"{sdk_name}_{content.get_id()}", combined_schema
-                        )
-                        if isinstance(class_defs, list):
-                            schema_class_defs.extend(class_defs)
-                        if isinstance(class_defs, ast.AnnAssign):
-                            schema_class_defs.append(class_defs)
+    # refs are resolved against the whole document through a single index
+    if resolver is None:
+        resolver = registry.resolver if registry else RefResolver(spec.schema_dict)
+    if registry is None:
+        registry = ComponentRegistry(spec, sdk_name, resolver)
+    if options is None:
+        options = GeneratorOptions()
 
-            for response in operation.responses:
-                for content in response.contents:
-                    if content.schema:
-                        combined_schema = {
-                            **content.schema,
-                            **{"components": spec.schema_dict["components"]},
-                        }
-                        class_defs = schema_to_ast(
-                            f"{sdk_name}_{content.get_id()}", combined_schema
-                        )
-                        if isinstance(class_defs, list):
-                            schema_class_defs.extend(class_defs)
-                        if isinstance(class_defs, ast.AnnAssign):
-                            schema_class_defs.append(class_defs)
-
-    # path operations as sdk class methods
-    sdk_class_def = ast_generate_sdk_class(sdk_name=sdk_name, base_url=base_url)
-    for path_item in spec.paths:
-        for operation in path_item.operations:
-            method_def = ast_generate_class_method(
-                path_item.pattern, operation, sdk_name, spec
-            )
-            sdk_class_def.body[0].body.append(method_def)
+    component_class_defs: list[ast.ClassDef | ast.AnnAssign] = []
+    schema_class_defs: list[ast.ClassDef | ast.AnnAssign] = []
+    method_defs: list[ast.FunctionDef | ast.AsyncFunctionDef] = []
+    has_streams = False
+    has_paginations = False
+    with create_executor(registry, options, jobs) as executor:
+        # component schemas to python classes, generated once and shared by operations
+        for _ref, class_defs in generate_components(
+            registry, options, cache, executor, jobs, profiler
+        ):
+            component_class_defs.extend(class_defs)
 
-    # sdk assignment
-    sdk_assign = ast.parse(f"{sdk_name} = {case_snake_to_pascal(sdk_name)}()")
+        # json schemas to python classes and path operations to sdk class methods
+        for (_pattern, operation), (
+            class_defs,
+            operation_method_defs,
+        ) in generate_operations(
+            spec, registry, options, cache, executor, jobs, profiler
+        ):
+            schema_class_defs.extend(class_defs)
+            method_defs.extend(operation_method_defs)
+            if array_response_content(operation, registry) is not None:
+                has_streams = True
+            if operation_pagination(operation, registry) is not None:
+                has_paginations = True
 
-    body = [import_stmt]
+    body: list[ast.stmt] = [import_stmt]
+    if options.json_backend != "httpx":
+        body.extend(ast_generate_json_backend(options.json_backend).body)
+    if has_streams:
+        body.extend(ast_generate_json_array_parser().body)
+    body.extend(ast_generate_features(options, has_paginations))
+    if options.model_style == "slots":
+        body.extend(ast_generate_model_base(sdk_name).body)
+    body.extend(component_class_defs)
     body.extend(schema_class_defs)
-    body.append(sdk_class_def)
-    body.append(sdk_assign)
+    # sdk classes and their instances
+    sdk_assigns = []
+    for is_async in (False, True):
+        if not (options.has_async_client if is_async else options.has_sync_client):
+            continue
+        sdk_class_def = ast_generate_sdk_class(
+            sdk_name, base_url, is_async, options, has_streams, has_paginations
+        )
+        sdk_class_def.body[0].body.extend(
+            x for x in method_defs if isinstance(x, ast.AsyncFunctionDef) == is_async
+        )
+        body.extend(sdk_class_def.body)
+        sdk_assigns.append(
+            ast.parse(
+                f"{sdk_instance_name(sdk_name, is_async)} = {sdk_class_name(sdk_name, is_async)}()"
+            ).body[0]
+        )
+    body.extend(sdk_assigns)
     root = ast.Module(body=body, type_ignores=[])
 
     return root
 
 
-def ast_generate_sdk_class(sdk_name: str, base_url: str):
+def create_executor(
+    registry: ComponentRegistry, options: GeneratorOptions, jobs: int = 1
+):
+    """
+    Creates the process pool to generate code in, or a context without one when
+    jobs is 1.
+
+    :param registry: ComponentRegistry object, sent once to every worker
+    :param options: GeneratorOptions object, sent once to every worker
+    :param jobs: Number of worker processes
+    :return: Context manager of the executor or None
+    """
+    if jobs > 1:
+        return ProcessPoolExecutor(
+            jobs, initializer=_worker_init, initargs=(registry, options)
+        )
+    return contextlib.nullcontext()
+
+
+def generate_components(
+    registry: ComponentRegistry,
+    options: GeneratorOptions,
+    cache: GenerationCache | None = None,
+    executor: Executor | None = None,
+    jobs: int = 1,
+    profiler: Profiler | None = None,
+):
+    """
+    Generates the classes of each component in the order of the registry.
+
+    :return: Generator of refs and the class definitions of each component
+    """
+    components = (
+        (cache.component_key(ref, registry, options) if cache else None, ref)
+        for ref in registry.order
+    )
+    return generate_cached(
+        components,
+        _generate_component,
+        component_to_entry,
+        entry_to_component,
+        registry,
+        options,
+        cache,
+        executor,
+        jobs,
+        (
+            (lambda ref, seconds: profiler.add_task("schemas", ref, seconds))
+            if profiler
+            else None
+        ),
+    )
+
+
+def generate_operations(
+    spec: APISpec,
+    registry: ComponentRegistry,
+    options: GeneratorOptions,
+    cache: GenerationCache | None = None,
+    executor: Executor | None = None,
+    jobs: int = 1,
+    profiler: Profiler | None = None,
+):
+    """
+    Generates the classes and the sdk method of each operation in the order of
+    the spec.
+
+    :return: Generator of (pattern, operation) tuples and their class
+        definitions and sdk methods
+    """
+    operations = (
+        (
+            (
+                cache.operation_key(
+                    path_item.pattern,
+                    operation,
+                    registry,
+                    options,
+                    operation_derived(operation, registry),
+                )
+                if cache
+                else None
+            ),
+            (path_item.pattern, operation),
+        )
+        for path_item in spec.paths
+        for operation in path_item.operations
+    )
+    return generate_cached(
+        operations,
+        _generate_operation,
+        operation_to_entry,
+        entry_to_operation,
+        registry,
+        options,
+        cache,
+        executor,
+        jobs,
+        (
+            (
+                lambda task, seconds: profiler.add_task(
+                    "operations", task[1].operation_id, seconds
+                )
+            )
+            if profiler
+            else None
+        ),
+    )
+
+
+# tasks read from the iterator at once per worker, the results of a window
+# are kept until they're consumed
+WINDOW_TASKS_PER_JOB = 64
+
+
+def generate_cached(
+    tasks: Iterable[tuple[str | None, Any]],
+    generate: Callable[[Any, ComponentRegistry, GeneratorOptions], Any],
+    to_entry: Callable[[Any], dict[str, str]],
+    from_entry: Callable[[dict[str, str]], Any],
+    registry: ComponentRegistry,
+    options: GeneratorOptions,
+    cache: GenerationCache | None = None,
+    executor: Executor | None = None,
+    jobs: int = 1,
+    timed: Callable[[Any, float], None] | None = None,
+):
+    """
+    Generates the ast nodes of each task, reusing the cached ones.
+
+    Without an executor tasks are generated one by one as they are consumed.
+    With an executor every task that isn't cached is generated in the worker
+    processes, they send the nodes back as source code in the same shape as
+    the cache entries. The tasks are read and submitted in windows of
+    WINDOW_TASKS_PER_JOB tasks per worker, so a lazy iterator of tasks isn't
+    read into memory all at once. Results are yielded in the order of the
+    tasks either way.
+
+    :param tasks: Cache keys and tasks, keys are None when there is no cache
+    :param generate: Function that generates the ast nodes of a task
+    :param to_entry: Function that turns the ast nodes into a cache entry
+    :param from_entry: Function that turns a cache entry back into ast nodes
+    :param registry: ComponentRegistry object, passed to generate
+    :param options: GeneratorOptions object, passed to generate
+    :param cache: GenerationCache object
+    :param executor: Executor whose workers are initialized with `_worker_init`
+    :param jobs: Number of workers in the executor
+    :param timed: Called with every generated task and the seconds it took
+    :return: Generator of tasks and their ast nodes
+    """
+    if executor is None:
+        for key, task in tasks:
+            entry = cache.get(key) if cache and key else None
+            if entry is not None:
+                yield task, from_entry(entry)
+                continue
+            start = time.perf_counter()
+            nodes = generate(task, registry, options)
+            if timed:
+                timed(task, time.perf_counter() - start)
+            if cache and key:
+                cache.set(key, to_entry(nodes))
+            yield task, nodes
+        return
+
+    def submit(window: list[tuple[str | None, Any]]):
+        entries = [cache.get(key) if cache and key else None for key, _ in window]
+        missing = [i for i, entry in enumerate(entries) if entry is None]
+        generated = executor.map(
+            partial(_worker_generate, generate, to_entry),
+            [window[i][1] for i in missing],
+            chunksize=max(1, len(missing) // (jobs * 4)),
+        )
+        return window, entries, missing, generated
+
+    # the tasks are read a window at a time, the next window is generated
+    # while the results of the current one are consumed
+    tasks = iter(tasks)
+    window_size = jobs * WINDOW_TASKS_PER_JOB
+    next_window = list(itertools.islice(tasks, window_size))
+    pending = submit(next_window) if next_window else None
+    while pending is not None:
+        window, entries, missing, generated = pending
+        next_window = list(itertools.islice(tasks, window_size))
+        pending = submit(next_window) if next_window else None
+        for i, (entry, seconds) in zip(missing, generated):
+            entries[i] = entry
+            if timed:
+                timed(window[i][1], seconds)
+            key = window[i][0]
+            if cache and key:
+                cache.set(key, entry)
+        for (_key, task), entry in zip(window, entries):
+            yield task, from_entry(entry)
+
+
+# registry and options of the worker process, sent once when the worker starts
+_worker_registry: ComponentRegistry | None = None
+_worker_options: GeneratorOptions | None = None
+
+
+def _worker_init(registry: ComponentRegistry, options: GeneratorOptions):
+    global _worker_registry, _worker_options
+    _worker_registry = registry
+    _worker_options = options
+
+
+def _worker_generate(
+    generate: Callable[..., Any],
+    to_entry: Callable[[Any], dict[str, str]],
+    task: Any,
+) -> tuple[dict[str, str], float]:
+    start = time.perf_counter()
+    nodes = generate(task, _worker_registry, _worker_options)
+    return to_entry(nodes), time.perf_counter() - start
+
+
+def component_to_entry(class_defs: list[ast.stmt]):
+    return {"classes": ast.unparse(ast.Module(body=class_defs, type_ignores=[]))}
+
+
+def entry_to_component(entry: dict[str, str]):
+    return ast.parse(entry["classes"]).body
+
+
+def operation_to_entry(
+    nodes: tuple[list[ast.stmt], list[ast.stmt]],
+):
+    class_defs, method_defs = nodes
+    return {
+        "classes": ast.unparse(ast.Module(body=class_defs, type_ignores=[])),
+        "methods": ast.unparse(ast.Module(body=method_defs, type_ignores=[])),
+    }
+
+
+def entry_to_operation(entry: dict[str, str]):
+    return ast.parse(entry["classes"]).body, ast.parse(entry["methods"]).body
+
+
+def _generate_component(
+    ref: str, registry: ComponentRegistry, options: GeneratorOptions
+):
+    return ast_generate_component(ref, registry, options)
+
+
+def _generate_operation(
+    task: tuple[str, APISpecPathOperation],
+    registry: ComponentRegistry,
+    options: GeneratorOptions,
+):
+    pattern, operation = task
+    return ast_generate_operation(
+        pattern, operation, registry.sdk_name, registry, options
+    )
+
+
+def ast_generate_component(
+    ref: str, registry: ComponentRegistry, options: GeneratorOptions | None = None
+) -> list[ast.ClassDef | ast.AnnAssign]:
+    """
+    Generates the classes of a component schema.
+
+    :param ref: Ref of the component in the registry
+    :param registry: ComponentRegistry object
+    :param options: GeneratorOptions object
+    :return: Ast nodes of the component class and its nested classes
+    """
+    class_defs = schema_to_ast(
+        f"{registry.sdk_name}_{ref.split('/')[-1]}",
+        registry.schemas[ref],
+        registry.ref_names_for(ref),
+        registry.resolver,
+        model_base_name(registry.sdk_name, options),
+        model_codecs(options),
+    )
+    return class_defs if isinstance(class_defs, list) else [class_defs]
+
+
+def ast_generate_operation(
+    pattern: str,
+    operation: APISpecPathOperation,
+    sdk_name: str,
+    registry: ComponentRegistry,
+    options: GeneratorOptions | None = None,
+) -> tuple[
+    list[ast.ClassDef | ast.AnnAssign | ast.Assign],
+    list[ast.FunctionDef | ast.AsyncFunctionDef],
+]:
+    """
+    Generates the request and response classes and the sdk methods of an operation.
+
+    :param pattern: URL path
+    :param operation: APISpecPathOperation object
+    :param registry: ComponentRegistry object, its components aren't generated again
+    :param options: GeneratorOptions object, decides on the sync and async methods
+    :return: Ast nodes of the schema classes and the function definitions
+    """
+    if options is None:
+        options = GeneratorOptions()
+    schema_class_defs: list[ast.ClassDef | ast.AnnAssign | ast.Assign] = []
+    contents = []
+    if operation.request_body is not None:
+        contents.extend(operation.request_body.contents)
+    for response in operation.responses:
+        contents.extend(response.contents)
+    for content in contents:
+        if content.schema and content.schema.get("$ref") not in registry.names:
+            class_defs = schema_to_ast(
+                f"{sdk_name}_{content.get_id()}",
+                content.schema,
+                registry.ref_names_for(),
+                registry.resolver,
+                model_base_name(sdk_name, options),
+                model_codecs(options),
+            )
+            if isinstance(class_defs, list):
+                schema_class_defs.extend(class_defs)
+            if isinstance(class_defs, ast.AnnAssign):
+                schema_class_defs.append(class_defs)
+
+    headers = operation_headers(operation, options)
+    if headers:
+        # computed once, the methods never change it
+        schema_class_defs.append(
+            ast.Assign(
+                targets=[
+                    ast.Name(id=operation_headers_name(operation), ctx=ast.Store())
+                ],
+                value=ast.parse(repr(headers), mode="eval").body,
+                lineno=1,
+            )
+        )
+
+    method_defs: list[ast.FunctionDef | ast.AsyncFunctionDef] = []
+    # operations that respond with an array also get an iter_ method, and
+    # paginated ones a paginate_ method
+    streams = [False]
+    if array_response_content(operation, registry) is not None:
+        streams.append(True)
+    pagination = operation_pagination(operation, registry)
+    for is_async in (False, True):
+        if not (options.has_async_client if is_async else options.has_sync_client):
+            continue
+        for stream in streams:
+            method_defs.append(
+                ast_generate_class_method(
+                    pattern, operation, sdk_name, registry, options, is_async, stream
+                )
+            )
+        if pagination is not None:
+            method_defs.append(
+                ast_generate_paginate_method(
+                    operation.operation_id,
+                    pagination,
+                    method_defs[-len(streams)].returns,
+                    is_async,
+                )
+            )
+        if is_async and options.batch:
+            method_defs.append(ast_generate_map_method(operation.operation_id))
+
+    return schema_class_defs, method_defs
+
+
+def model_base_name(sdk_name: str, options: GeneratorOptions | None) -> str | None:
+    """
+    Name of the base class of the models, None when they are dict subclasses.
+    """
+    if options is None or options.model_style != "slots":
+        return None
+    return case_snake_to_pascal(f"{sdk_name}_model_base")
+
+
+def model_codecs(options: GeneratorOptions | None) -> bool:
+    """
+    Whether the models get from_json and to_json methods, slotted models
+    build their nested models with them in from_dict.
+    """
+    return options is not None and (
+        options.typed_responses or options.model_style == "slots"
+    )
+
+
+def ast_generate_model_base(sdk_name: str):
+    name = model_base_name(sdk_name, GeneratorOptions(model_style="slots"))
     return ast.parse(
         source=f"""
-class {case_snake_to_pascal(sdk_name)}:
+class {name}:
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls.from_json(data)
+
+    def to_dict(self) -> dict:
+        return {{name: {name}._dump(getattr(self, name)) for name in self.__slots__}}
+
+    @staticmethod
+    def _dump(value):
+        if isinstance(value, {name}):
+            return value.to_dict()
+        if isinstance(value, list):
+            return [{name}._dump(x) for x in value]
+        return value
+
+    def __eq__(self, other):
+        return type(other) is type(self) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        fields = ", ".join(f"{{x}}={{getattr(self, x)!r}}" for x in self.__slots__)
+        return f"{{type(self).__name__}}({{fields}})"
+"""
+    )
+
+
+def ast_generate_json_backend(backend: str):
+    """
+    Generates the json functions of the sdk, they encode to and decode from
+    bytes. The auto backend picks orjson or msgspec when they are installed and
+    falls back to the json module.
+
+    :param backend: One of the json backends of GeneratorOptions except httpx
+    :return: Ast module that defines _json_dumps and _json_loads
+    """
+    backends = {
+        "orjson": """
+import orjson
+
+_json_dumps = orjson.dumps
+_json_loads = orjson.loads
+""",
+        "msgspec": """
+import msgspec
+
+_json_dumps = msgspec.json.encode
+_json_loads = msgspec.json.decode
+""",
+        "json": """
+import json
+
+def _json_dumps(value) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode()
+
+_json_loads = json.loads
+""",
+    }
+    if backend != "auto":
+        return ast.parse(backends[backend])
+    return ast.parse(
+        f"""
+try:
+{textwrap.indent(backends["orjson"], "    ")}
+except ImportError:
+    try:
+{textwrap.indent(backends["msgspec"], "        ")}
+    except ImportError:
+{textwrap.indent(backends["json"], "        ")}
+"""
+    )
+
+
+def ast_generate_json_array_parser():
+    """
+    Generates the parser the iter_ methods parse the arrays in the responses
+    with. It's fed the response as it arrives and returns the items completed
+    so far, the part of the array that isn't parsed yet is all it keeps.
+    """
+    return ast.parse(
+        source="""
+import json as _json
+
+
+class _JSONArrayParser:
     def __init__(self):
-        self.client = httpx.Client(
-            base_url="{base_url}",
+        self._decoder = _json.JSONDecoder()
+        self._buffer = ""
+        # start, first, item, separator or end
+        self._state = "start"
+
+    def feed(self, text: str) -> list:
+        buffer = self._buffer + text
+        position = 0
+        items = []
+        while True:
+            while position < len(buffer) and buffer[position] in " \\t\\n\\r":
+                position += 1
+            if position == len(buffer):
+                break
+            char = buffer[position]
+            if self._state == "start" and char == "[":
+                self._state = "first"
+                position += 1
+            elif self._state in ("first", "separator") and char == "]":
+                self._state = "end"
+                position += 1
+            elif self._state == "separator" and char == ",":
+                self._state = "item"
+                position += 1
+            elif self._state in ("first", "item"):
+                try:
+                    item, end = self._decoder.raw_decode(buffer, position)
+                except _json.JSONDecodeError:
+                    break
+                if end == len(buffer) or buffer[end] not in " \\t\\n\\r,]":
+                    # a number might continue in the next chunk
+                    break
+                items.append(item)
+                self._state = "separator"
+                position = end
+            else:
+                raise ValueError(f"unexpected {char!r} in the json array.")
+        self._buffer = buffer[position:]
+        return items
+
+    def close(self):
+        if self._state != "end":
+            raise ValueError("the json array is incomplete.")
+"""
+    )
+
+
+def sdk_class_name(sdk_name: str, is_async: bool = False) -> str:
+    return case_snake_to_pascal(f"async_{sdk_name}" if is_async else sdk_name)
+
+
+def sdk_instance_name(sdk_name: str, is_async: bool = False) -> str:
+    return f"async_{sdk_name}" if is_async else sdk_name
+
+
+def ast_generate_sdk_class(
+    sdk_name: str,
+    base_url: str,
+    is_async: bool = False,
+    options: GeneratorOptions | None = None,
+    has_streams: bool = False,
+    has_paginations: bool = False,
+):
+    # the async class is the same class on httpx.AsyncClient, awaiting its calls
+    async_, await_ = ("async ", "await ") if is_async else ("", "")
+    class_def = ast.parse(
+        source=f"""
+class {sdk_class_name(sdk_name, is_async)}:
+    def __init__(
+        self,
+        base_url: str = "{base_url}",
+        timeout: float | httpx.Timeout | None = 10,
+        max_connections: int | None = 100,
+        max_keepalive_connections: int | None = 20,
+        keepalive_expiry: float | None = 5.0,
+        http2: bool = False,
+        transport: httpx.{"AsyncBaseTransport" if is_async else "BaseTransport"} | None = None,
+    ):
+        self.max_connections = max_connections
+        self.client = httpx.{"AsyncClient" if is_async else "Client"}(
+            base_url=base_url,
             headers={{'user-agent': '{sdk_name}', 'accept': 'application/json'}},
-            timeout=10,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            http2=http2,
+            transport=transport,
     )
 
     def auth(self, scheme: str, value: str):
@@ -88,43 +682,129 @@ class {case_snake_to_pascal(sdk_name)}:
     def deauth(self):
         self.client.headers.pop('authorization', None)
 
-    def _cleanup(self):
+    {async_}def _cleanup(self):
         if not self.client.is_closed:
-            self.client.close()
+            {await_}self.client.{"aclose" if is_async else "close"}()
 
-    def _send_request(self, request: httpx.Request) -> httpx.Response:
+    {async_}def _send_request(self, request: httpx.Request) -> httpx.Response:
         try:
-            response = self.client.send(request)
+            response = {await_}self.client.send(request)
             return response
         except httpx.HTTPError as e:
             message = f"An unexpected error occurred while handling request to {{e.request.url}}. {{e}}"
             return httpx.Response(status_code=500, json={{'error': {{'code': 'unexpected', 'message': message}}}})
 """
     )
+    sdk_class_def = next(x for x in class_def.body if isinstance(x, ast.ClassDef))
+    # connections are opened concurrently and kept open until all of them are,
+    # so that none of them is reused, then they go back into the pool. more
+    # than max_connections would wait for the pool timeout
+    warmup_def = (
+        """
+async def warmup(self, n: int = 1, path: str = "/") -> int:
+    import asyncio
+
+    if self.max_connections is not None:
+        n = min(n, self.max_connections)
+    if n <= 0:
+        return 0
+
+    async def open_connection():
+        try:
+            return await self.client.send(self.client.build_request("HEAD", path), stream=True)
+        except httpx.HTTPError:
+            return None
+
+    responses = await asyncio.gather(*(open_connection() for _ in range(n)))
+    responses = [x for x in responses if x is not None]
+    # reading the empty bodies puts the connections back into the pool
+    for response in responses:
+        await response.aread()
+    return len(responses)
+"""
+        if is_async
+        else """
+def warmup(self, n: int = 1, path: str = "/") -> int:
+    from concurrent.futures import ThreadPoolExecutor
+
+    if self.max_connections is not None:
+        n = min(n, self.max_connections)
+    if n <= 0:
+        return 0
+
+    def open_connection(_):
+        try:
+            return self.client.send(self.client.build_request("HEAD", path), stream=True)
+        except httpx.HTTPError:
+            return None
+
+    with ThreadPoolExecutor(n) as executor:
+        responses = [x for x in executor.map(open_connection, range(n)) if x is not None]
+    # reading the empty bodies puts the connections back into the pool
+    for response in responses:
+        response.read()
+    return len(responses)
+"""
+    )
+    sdk_class_def.body.insert(3, ast.parse(warmup_def).body[0])
+    if options is not None and options.json_backend != "httpx":
+        # class attributes, so that they can be replaced on the class or an instance
+        sdk_class_def.body[0:0] = ast.parse(
+            """
+json_dumps = staticmethod(_json_dumps)
+json_loads = staticmethod(_json_loads)
+"""
+        ).body
+    if has_streams:
+        sdk_class_def.body.insert(
+            0, ast.parse("_json_array_parser = _JSONArrayParser").body[0]
+        )
+    if has_paginations:
+        ast_add_pagination(sdk_class_def, is_async)
+    if options is not None:
+        ast_add_features(sdk_class_def, options, is_async)
+    return class_def
 
 
 def ast_generate_class_method(
-    pattern: str, operation: APISpecPathOperation, sdk_name: str, spec: APISpec
+    pattern: str,
+    operation: APISpecPathOperation,
+    sdk_name: str,
+    registry: ComponentRegistry,
+    options: GeneratorOptions | None = None,
+    is_async: bool = False,
+    stream: bool = False,
 ):
     """
     Generates fully-typed function definitions to add to the generated sdk class.
 
     :param pattern: URL parh
     :param operation: APISpecPathOperation object
+    :param options: GeneratorOptions object, decides on the request and
+        response conversions
+    :param is_async: Generates a coroutine for the async sdk class when True
+    :param stream: Generates the iter_ method of an operation that responds
+        with an array, it yields the items as they are parsed
     :return: Ast node of a function definition
     """
 
+    if options is None:
+        options = GeneratorOptions()
+    model_base = model_base_name(sdk_name, options)
+    # bodies and responses go through the json functions of the sdk class
+    has_json_backend = options.json_backend != "httpx"
+
     # function name is the snake cased operation_id
     function_name = operation.operation_id
+    if stream:
+        function_name = f"iter_{function_name}"
 
     # function should return either combination of pascal cased content ids or str
     function_return_types: list[str] = []
     for response in operation.responses:
         for content in response.contents:
             if "json" in content.media_type:
-                function_return_types.append(
-                    case_snake_to_pascal(f"{sdk_name}_{content.get_id()}")
-                )
+                function_return_types.append(content_py_type(content, registry))
             elif "text/plain" in content.media_type:
                 function_return_types.append("str")
     does_function_return_str = True if "str" in function_return_types else False
@@ -136,18 +816,14 @@ def ast_generate_class_method(
     if operation.request_body:
         for content in operation.request_body.contents:
             if "json" in content.media_type:
-                py_type = case_snake_to_pascal(f"{sdk_name}_{content.get_id()}")
+                py_type = registry.content_class_name(content)
                 function_arguments.append(
                     ast.arg(arg="json", annotation=ast.Name(id=py_type, ctx=ast.Load()))
                 )
     # path and query parameters from parameters
     for parameter in operation.parameters:
         if parameter.kind == "path" or parameter.kind == "query":
-            combined_schema = {
-                **parameter.schema,
-                **{"components": spec.schema_dict["components"]},
-            }
-            py_types = collect_py_types_from_schema(combined_schema)
+            py_types = collect_py_types_from_schema(parameter.schema, registry.resolver)
             function_arguments.append(
                 ast.arg(arg=parameter.name, annotation=ast_create_annotation(py_types))
             )
@@ -168,22 +844,25 @@ def ast_generate_class_method(
 
     # create function body
     function_body = []
-    if does_function_return_str:
-        # set accept header to plain text for text kind responses
-        function_body.append(ast.parse("self.client.headers['accept'] = 'text/plain'"))
-    # apply endpoint specific headers if specified
-    function_body.append(
-        ast.parse(
-            "headers_combined = self.client.headers if headers is None else {**self.client.headers, **headers}"
-        )
-    )
     # build request call
     build_request_keywords = []
     if operation.request_body:
         for content in operation.request_body.contents:
             if "json" in content.media_type:
+                json_value = "json"
+                if model_base is not None:
+                    # slotted models aren't dicts, they are converted before encoding
+                    to_json = "to_json" if options.typed_responses else "to_dict"
+                    json_value = (
+                        f"json.{to_json}() if isinstance(json, {model_base}) else json"
+                    )
+                if has_json_backend:
+                    json_value = f"self.json_dumps({json_value})"
                 build_request_keywords.append(
-                    ast.keyword(arg="json", value=ast.Name(id="json", ctx=ast.Load()))
+                    ast.keyword(
+                        arg="content" if has_json_backend else "json",
+                        value=ast.parse(json_value, mode="eval").body,
+                    )
                 )
     query_params = [x.name for x in operation.parameters if x.kind == "query"]
     if len(query_params) > 0:
@@ -198,17 +877,21 @@ def ast_generate_class_method(
                 ),
             )
         )
+    # the client merges its own headers with the headers of the operation and
+    # the call, shared state is only read so the sdk can be used from many threads
+    headers_value = "headers"
+    if operation_headers(operation, options):
+        name = operation_headers_name(operation)
+        headers_value = f"{name} if headers is None else {{**{name}, **headers}}"
     build_request_keywords.append(
-        ast.keyword(
-            arg="headers", value=ast.Name(id="headers_combined", ctx=ast.Load())
-        )
+        ast.keyword(arg="headers", value=ast.parse(headers_value, mode="eval").body)
     )
     build_request_arguments = [
         # request method
         ast.Constant(value=operation.method),
         # either simply a url path or parameterized path pattern
         (
-            ast.parse('f"' + pattern + '"')
+            ast.parse('f"' + pattern + '"', mode="eval").body
             if len(re.findall(r"\{([^}]+)\}", pattern)) > 0
             else ast.Constant(value=pattern)
         ),
@@ -220,20 +903,26 @@ def ast_generate_class_method(
         attr="build_request",
         ctx=ast.Load(),
     )
+    request_call = ast.Call(
+        func=build_request_call,
+        args=build_request_arguments,
+        keywords=build_request_keywords,
+    )
     request_var = ast.Assign(
         targets=[ast.Name(id="request", ctx=ast.Store())],
-        value=ast.Call(
-            func=build_request_call,
-            args=build_request_arguments,
-            keywords=build_request_keywords,
-        ),
+        value=request_call,
         lineno=1,
     )
-    function_body.append(request_var)
-    # send request call
-    response_var = ast.Assign(
-        targets=[ast.Name(id="response", ctx=ast.Store())],
-        value=ast.Call(
+    if stream:
+        function_body.append(
+            ast_generate_stream_statement(
+                request_call, operation, registry, options, is_async
+            )
+        )
+    else:
+        function_body.append(request_var)
+        # send request call
+        send_request_call = ast.Call(
             func=ast.Attribute(
                 value=ast.Name(id="self", ctx=ast.Load()),
                 attr="_send_request",
@@ -241,33 +930,83 @@ def ast_generate_class_method(
             ),
             args=[ast.Name(id="request", ctx=ast.Load())],
             keywords=[],
-        ),
-        lineno=1,
-    )
-    function_body.append(response_var)
-    if does_function_return_str:
-        function_return_statement = ast.Return(
-            value=ast.Attribute(
-                value=ast.Name(id="response", ctx=ast.Load()),
-                attr="text",
-                ctx=ast.Load(),
+        )
+        if options.hedging and operation.method in ("get", "head"):
+            send_request_call.keywords.append(
+                ast.keyword(arg="hedge", value=ast.Constant(value=True))
+            )
+        if options.is_coalesced(operation.operation_id, operation.method):
+            send_request_call.keywords.append(
+                ast.keyword(arg="coalesce", value=ast.Constant(value=True))
             )
+        if options.instrumentation:
+            send_request_call.keywords.append(
+                ast.keyword(
+                    arg="operation_id", value=ast.Constant(value=operation.operation_id)
+                )
+            )
+        response_var = ast.Assign(
+            targets=[ast.Name(id="response", ctx=ast.Store())],
+            value=ast.Await(value=send_request_call) if is_async else send_request_call,
+            lineno=1,
         )
-    else:
-        function_return_statement = ast.Return(
-            value=ast.Call(
-                func=ast.Attribute(
+        function_body.append(response_var)
+        response_json = (
+            "self.json_loads(response.content)"
+            if has_json_backend
+            else "response.json()"
+        )
+        if does_function_return_str:
+            function_return_statement = ast.Return(
+                value=ast.Attribute(
                     value=ast.Name(id="response", ctx=ast.Load()),
-                    attr="json",
+                    attr="text",
                     ctx=ast.Load(),
-                ),
-                args=[],
-                keywords=[],
+                )
             )
-        )
-    function_body.append(function_return_statement)
+        elif options.typed_responses:
+            # the json of each response is decoded into its model by status code
+            function_body.append(ast.parse(f"data = {response_json}").body[0])
+            for response in operation.responses:
+                for content in response.contents:
+                    decoder = content_decode_expression(content, registry, "data")
+                    if "json" in content.media_type and decoder is not None:
+                        function_body.extend(
+                            ast.parse(
+                                f"""
+if response.status_code == {int(response.status_code)}:
+    return {decoder}
+"""
+                            ).body
+                        )
+                        break
+            function_return_statement = ast.Return(
+                value=ast.Name(id="data", ctx=ast.Load())
+            )
+        else:
+            function_return_statement = ast.Return(
+                value=ast.parse(response_json, mode="eval").body
+            )
+        function_body.append(function_return_statement)
+        if options.instrumentation:
+            # decoding the response is timed as a part of the call
+            index = function_body.index(response_var) + 1
+            function_body[index:] = [
+                ast.With(
+                    items=[
+                        ast.withitem(
+                            context_expr=ast.parse(
+                                "self._observe(response)", mode="eval"
+                            ).body
+                        )
+                    ],
+                    body=function_body[index:],
+                    lineno=1,
+                )
+            ]
 
-    return ast.FunctionDef(
+    function_def_class = ast.AsyncFunctionDef if is_async else ast.FunctionDef
+    return function_def_class(
         name=function_name,
         args=ast.arguments(
             args=function_arguments,
@@ -277,18 +1016,351 @@ def ast_generate_class_method(
         ),
         body=function_body,
         decorator_list=[],
-        returns=ast_create_annotation(function_return_types),
+        returns=None if stream else ast_create_annotation(function_return_types),
         lineno=1,
     )
 
 
-def collect_py_types_from_schema(schema: dict[str, Any]):
+def operation_headers(
+    operation: APISpecPathOperation, options: GeneratorOptions
+) -> dict[str, str]:
+    """
+    Headers every request of an operation is sent with, on top of the headers
+    of the client.
+
+    :param operation: APISpecPathOperation object
+    :param options: GeneratorOptions object
+    :return: Header values by their names
+    """
+    headers = {}
+    for response in operation.responses:
+        for content in response.contents:
+            if "text/plain" in content.media_type:
+                headers["accept"] = "text/plain"
+    if options.json_backend != "httpx" and operation.request_body:
+        # bodies encoded by the json backend are sent as content
+        if any("json" in x.media_type for x in operation.request_body.contents):
+            headers["content-type"] = "application/json"
+    return headers
+
+
+def operation_headers_name(operation: APISpecPathOperation) -> str:
+    return f"_{operation.operation_id}_headers"
+
+
+def ast_generate_stream_statement(
+    request_call: ast.Call,
+    operation: APISpecPathOperation,
+    registry: ComponentRegistry,
+    options: GeneratorOptions,
+    is_async: bool = False,
+) -> ast.stmt:
+    """
+    Generates the body of an iter_ method. The request is sent with
+    client.stream and the items of the array in the response are yielded as
+    its chunks are parsed, only the unparsed part of the response is kept.
+
+    :param request_call: Ast node of the build_request call of the method
+    :param operation: APISpecPathOperation object that responds with an array
+    :param registry: ComponentRegistry object
+    :param options: GeneratorOptions object
+    :param is_async: Generates the body of an async generator when True
+    :return: Ast node of the with statement
+    """
+    stream_call = ast.Call(
+        func=ast.parse("self.client.stream", mode="eval").body,
+        args=request_call.args,
+        keywords=request_call.keywords,
+    )
+    item = "item"
+    content = array_response_content(operation, registry)
+    if options.typed_responses and content is not None:
+        decoder = content_items_decode_expression(content, registry, "item")
+        item = decoder or item
+    async_ = "async " if is_async else ""
+    return ast.parse(
+        f"""
+{async_}with {ast.unparse(stream_call)} as response:
+    if response.is_error:
+        {"await response.aread()" if is_async else "response.read()"}
+        response.raise_for_status()
+    parser = self._json_array_parser()
+    {async_}for chunk in response.{"aiter_text" if is_async else "iter_text"}():
+        for item in parser.feed(chunk):
+            yield {item}
+    parser.close()
+"""
+    ).body[0]
+
+
+def operation_derived(
+    operation: APISpecPathOperation, registry: ComponentRegistry
+) -> dict[str, Any]:
+    """
+    What the methods of an operation depend on in the component schemas of its
+    responses, which aren't part of the hash of the operation.
+
+    :param operation: APISpecPathOperation object
+    :param registry: ComponentRegistry object, its resolver resolves the refs
+    :return: Json serializable values to add to the cache key of the operation
+    """
+    return {
+        "stream": array_response_content(operation, registry) is not None,
+        "pagination": operation_pagination(operation, registry),
+    }
+
+
+def array_response_content(
+    operation: APISpecPathOperation, registry: ComponentRegistry
+) -> APISpecPathOperationContent | None:
+    """
+    The json content of the first successful response of an operation, when
+    its schema is an array.
+
+    :param operation: APISpecPathOperation object
+    :param registry: ComponentRegistry object, its resolver resolves the refs
+    :return: APISpecPathOperationContent object or None
+    """
+    for response in operation.responses:
+        if not str(response.status_code).startswith("2"):
+            continue
+        for content in response.contents:
+            if "json" not in content.media_type or not content.schema:
+                continue
+            schema = content.schema
+            if "$ref" in schema:
+                schema = registry.resolver.resolve(schema["$ref"])
+            return content if schema.get("type") == "array" else None
+    return None
+
+
+# query parameters and response fields of the common pagination styles
+PAGINATION_PARAMS = {
+    "cursor": (
+        "cursor",
+        "page_token",
+        "pageToken",
+        "next_token",
+        "nextToken",
+        "starting_after",
+        "continuation_token",
+        "continuationToken",
+    ),
+    "offset": ("offset", "skip"),
+    "page": ("page", "page_number", "pageNumber"),
+}
+PAGINATION_LIMIT_PARAMS = (
+    "limit",
+    "page_size",
+    "pageSize",
+    "per_page",
+    "perPage",
+    "size",
+    "max_results",
+    "maxResults",
+)
+PAGINATION_ITEMS_FIELDS = ("items", "data", "results", "records", "entries")
+PAGINATION_NEXT_FIELDS = (
+    "next_cursor",
+    "nextCursor",
+    "next_page_token",
+    "nextPageToken",
+    "next_token",
+    "nextToken",
+    "cursor",
+    "continuation_token",
+    "continuationToken",
+)
+
+
+def operation_pagination(
+    operation: APISpecPathOperation, registry: ComponentRegistry
+) -> dict[str, Any] | None:
+    """
+    How a get operation pages its results. It's detected from the names of its
+    query parameters and the fields of its successful response, fields of the
+    x-pagination extension of the operation take precedence:
+
+        x-pagination: {style: cursor | offset | page, param, items, next, limit}
+
+    The items are the response itself when it's an array, and the next cursor
+    is a field of the response. x-pagination: false turns the detection off.
+
+    :param operation: APISpecPathOperation object
+    :param registry: ComponentRegistry object, its resolver resolves the refs
+    :return: Keyword arguments of the _paginate method of the sdk class, None
+        when the operation isn't paginated
+    """
+    hint = operation.extensions.get("x-pagination", {})
+    if operation.method != "get" or not isinstance(hint, dict):
+        return None
+    query = {x.name: x for x in operation.parameters if x.kind == "query"}
+
+    style, param = hint.get("style"), hint.get("param")
+    if param is None:
+        style, param = next(
+            (
+                (name, x)
+                for name, params in PAGINATION_PARAMS.items()
+                if style in (None, name)
+                for x in params
+                if x in query
+            ),
+            (style, None),
+        )
+    elif style is None:
+        style = next(
+            (name for name, params in PAGINATION_PARAMS.items() if param in params),
+            None,
+        )
+    if style not in PAGINATION_PARAMS or param not in query:
+        return None
+
+    # fields of the successful response
+    content = next(
+        (
+            x
+            for response in operation.responses
+            if str(response.status_code).startswith("2")
+            for x in response.contents
+            if "json" in x.media_type and x.schema
+        ),
+        None,
+    )
+    schema = (content.schema if content is not None else None) or {}
+    if "$ref" in schema:
+        schema = registry.resolver.resolve(schema["$ref"])
+    properties = schema.get("properties", {})
+    arrays = [
+        name
+        for name, value in properties.items()
+        if (registry.resolver.resolve(value["$ref"]) if "$ref" in value else value).get(
+            "type"
+        )
+        == "array"
+    ]
+    items = hint.get("items")
+    if items is None and schema.get("type") != "array":
+        items = next((x for x in PAGINATION_ITEMS_FIELDS if x in arrays), None)
+        items = items or next(iter(arrays), None)
+    next_field = hint.get("next")
+    if style == "cursor" and next_field is None:
+        next_field = next((x for x in PAGINATION_NEXT_FIELDS if x in properties), None)
+        if next_field is None:
+            return None
+    limit = hint.get("limit")
+    if limit is None:
+        limit = next((x for x in PAGINATION_LIMIT_PARAMS if x in query), None)
+
+    pagination = {"style": style, "param": param}
+    if style != "cursor":
+        default = 0 if style == "offset" else 1
+        pagination["start"] = query[param].schema.get("default", default)
+    if items is not None:
+        pagination["items_field"] = items
+    if next_field is not None:
+        pagination["next_field"] = next_field
+    if limit in query:
+        pagination["limit"] = limit
+        if "default" in query[limit].schema:
+            pagination["limit_default"] = query[limit].schema["default"]
+    return pagination
+
+
+def content_py_type(
+    content: APISpecPathOperationContent, registry: ComponentRegistry
+) -> str:
+    """
+    Python type of the json of a content. Only object schemas have a class
+    named after the content, arrays are lists of their items.
+
+    :param content: APISpecPathOperationContent object
+    :param registry: ComponentRegistry object
+    :return: Python type name
+    """
+    schema = content.schema or {}
+    if schema.get("$ref") in registry.names:
+        return registry.names[schema["$ref"]]
+    if "$ref" in schema:
+        schema = registry.resolver.resolve(schema["$ref"])
+    if schema.get("type") == "object" and "properties" in schema:
+        return registry.content_class_name(content)
+    if schema.get("type") == "array" and "items" in schema:
+        items = schema["items"]
+        if items.get("$ref") in registry.names:
+            return f"list[{registry.names[items['$ref']]}]"
+        if "$ref" in items:
+            items = registry.resolver.resolve(items["$ref"])
+        if items.get("type") == "object" and "properties" in items:
+            # items of a root array are named after the content
+            return f"list[{registry.content_class_name(content)}]"
+        if items.get("type") in ("string", "integer", "number", "boolean"):
+            return f"list[{schema_type_to_py_type(items['type'])}]"
+        return "list"
+    if schema.get("type") in ("string", "integer", "number", "boolean"):
+        return schema_type_to_py_type(schema["type"])
+    return "dict"
+
+
+def content_decode_expression(
+    content: APISpecPathOperationContent, registry: ComponentRegistry, value: str
+) -> str | None:
+    """
+    Python expression that decodes the json of a content into its model.
+
+    :param content: APISpecPathOperationContent object
+    :param registry: ComponentRegistry object
+    :param value: Python expression of the json value
+    :return: Python expression, None when the content has no model
+    """
+    schema = content.schema
+    if not schema:
+        return None
+    if schema.get("$ref") in registry.names:
+        return f"{registry.names[schema['$ref']]}.from_json({value})"
+    if "$ref" in schema:
+        schema = registry.resolver.resolve(schema["$ref"])
+    if schema.get("type") == "object" and "properties" in schema:
+        return f"{registry.content_class_name(content)}.from_json({value})"
+    item_decoder = content_items_decode_expression(content, registry, "x")
+    if item_decoder is not None:
+        return f"[{item_decoder} for x in {value}]"
+    return None
+
+
+def content_items_decode_expression(
+    content: APISpecPathOperationContent, registry: ComponentRegistry, value: str
+) -> str | None:
+    """
+    Python expression that decodes an item of a content whose schema is an
+    array into its model.
+
+    :param content: APISpecPathOperationContent object
+    :param registry: ComponentRegistry object
+    :param value: Python expression of the json value of the item
+    :return: Python expression, None when the items have no model
+    """
+    schema = content.schema or {}
+    if "$ref" in schema:
+        schema = registry.resolver.resolve(schema["$ref"])
+    if schema.get("type") != "array" or "items" not in schema:
+        return None
+    items = schema["items"]
+    if items.get("$ref") in registry.names:
+        return f"{registry.names[items['$ref']]}.from_json({value})"
+    if "$ref" in items:
+        items = registry.resolver.resolve(items["$ref"])
+    if items.get("type") == "object" and "properties" in items:
+        # items of a root array are named after the content
+        return f"{registry.content_class_name(content)}.from_json({value})"
+    return None
+
+
+def collect_py_types_from_schema(schema: dict[str, Any], resolver: RefResolver):
     result: list[str] = []
 
     if "$ref" in schema:
-        schema, _trace = schema_resolve_ref(schema, schema["$ref"])
-        if schema is None:
-            raise ValueError(f"failed to resolve ref. {_trace}")
+        schema = resolver.resolve(schema["$ref"])
 
     if "type" not in schema:
         return result
@@ -297,11 +1369,13 @@ def collect_py_types_from_schema(schema: dict[str, Any]):
 
     if "anyOf" in schema:
         for child_schema in schema["anyOf"]:
-            result.extend(collect_py_types_from_schema(child_schema))
+            result.extend(collect_py_types_from_schema(child_schema, resolver))
     elif t in ["string", "integer", "boolean", "null"]:
         return result.append(schema_type_to_py_type(t))
     elif t == "array" and "items" in schema:
-        result.append(f"list[{collect_py_types_from_schema(schema["items"])}]")
+        result.append(
+            f"list[{collect_py_types_from_schema(schema["items"], resolver)}]"
+        )
     elif t == "object":
         result.append("dict")
     else:
@@ -1,15 +1,84 @@
 import ast
-from typing import Any
-
-
-ref_cache: dict[str, dict] = {}
-ref_name_cache: dict[str, str] = {}
-
-
-def to_ast(root_name: str, root_schema: dict[str, Any]):
-    ref_cache = []
-    ref_name_cache = {}
+from typing import Any, Container, Mapping
+
+
+class RefResolver:
+    """
+    Index of the refs used in a document, resolved against that document.
+
+    A single pass over the document collects every ref in it, their targets
+    and generated names are computed right after. Refs that aren't seen in
+    the document are resolved on first use and remembered as well.
+    """
+
+    def __init__(self, document: dict[str, Any]):
+        self.document = document
+        self.targets: dict[str, tuple[Any, list[str]]] = {}
+        self.names: dict[str, str] = {}
+
+        refs: dict[str, None] = {}
+        stack: list[Any] = [document]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+            elif isinstance(node, dict):
+                ref = node.get("$ref")
+                if isinstance(ref, str) and ref.startswith("#/"):
+                    refs[ref] = None
+                stack.extend(node.values())
+
+        for ref in refs:
+            self.targets[ref] = schema_resolve_ref(document, ref)
+            if self.targets[ref][0] is not None:
+                self.names[ref] = schema_generate_name_by_ref(document, ref)
+
+    def resolve(self, ref: str) -> dict[str, Any]:
+        if ref not in self.targets:
+            self.targets[ref] = schema_resolve_ref(self.document, ref)
+        target, _trace = self.targets[ref]
+        if target is None:
+            raise ValueError(f"failed to resolve ref. {_trace}")
+        return target
+
+    def name(self, ref: str) -> str:
+        if ref not in self.names:
+            self.names[ref] = schema_generate_name_by_ref(self.document, ref)
+        return self.names[ref]
+
+
+def to_ast(
+    root_name: str,
+    root_schema: dict[str, Any],
+    ref_names: Mapping[str, str] | None = None,
+    resolver: RefResolver | None = None,
+    model_base: str | None = None,
+    codecs: bool = False,
+):
+    """
+    Generates python classes and annotations out of a json schema.
+
+    :param root_name: Snake cased name of the root schema
+    :param root_schema: The schema to generate classes for
+    :param ref_names: Class names of the refs that are generated elsewhere, they
+        are annotated by name instead of being expanded
+    :param resolver: Resolves the refs in the schema, the root schema is the
+        document by default
+    :param model_base: Name of the base class of slotted classes, classes are
+        dict subclasses when it's None
+    :param codecs: Adds from_json and to_json methods to the classes, they
+        convert nested objects to their classes and back in a single pass
+    :return: A list of class definitions or an annotated assignment
+    """
+    ref_names = ref_names or {}
+    resolver = resolver or RefResolver(root_schema)
     class_defs: list[ast.ClassDef] = []
+    # object schemas by their identity, a schema that is reached again while
+    # its class is being built is a recursive one and gets a forward reference
+    building: dict[int, str] = {}
+    built: dict[int, str] = {}
+    # fields of the classes being built, for their from_json and to_json
+    fields: dict[int, list[tuple]] = {}
 
     def process_ref(input_schema: dict[str, Any]):
         is_ref = False
@@ -18,51 +87,109 @@ def to_ast(root_name: str, root_schema: dict[str, Any]):
         if "$ref" in input_schema:
             is_ref = True
             is_ref_on_path = input_schema["$ref"].startswith("#/properties")
-            ref_name = schema_generate_name_by_ref(root_schema, input_schema["$ref"])
-            input_schema, _trace = schema_resolve_ref(root_schema, input_schema["$ref"])
-            if input_schema is None:
-                raise ValueError(f"failed to resolve ref. {_trace}")
+            ref_name = resolver.name(input_schema["$ref"])
+            input_schema = resolver.resolve(input_schema["$ref"])
         return input_schema, is_ref, ref_name, is_ref_on_path
 
-    def to_ast_recursive(
-        name_chain: tuple[str],
+    def find_class_name(schema: dict[str, Any]) -> str | None:
+        if id(schema) in building:
+            return f'"{building[id(schema)]}"'
+        return built.get(id(schema))
+
+    def build_class(chain_name: str, schema: dict[str, Any], class_name: str):
+        new_class = ast_create_class(class_name)
+        building[id(schema)] = class_name
+        fields[id(new_class)] = []
+        required_props = schema["required"] if "required" in schema else []
+        for child_prop_name, child_schema in schema["properties"].items():
+            _is_required = True if child_prop_name in required_props else False
+            yield (
+                child_prop_name,
+                chain_name + case_snake_to_pascal_part(child_prop_name),
+                child_schema,
+                new_class,
+                _is_required,
+            )
+        del building[id(schema)]
+        built[id(schema)] = class_name
+        if model_base is not None:
+            ast_class_to_slots(new_class, model_base)
+        class_fields = fields.pop(id(new_class))
+        if codecs:
+            ast_class_add_codecs(new_class, class_fields)
+        class_defs.append(new_class)
+
+    def add_field(
+        ast_class: ast.ClassDef,
+        prop_name: str,
+        types: list[str],
+        is_required: bool,
+        default_value: Any = None,
+        required_keys: dict[str, list[str]] | None = None,
+    ):
+        has_default_value = False if is_required is True else True
+        ast_class_add_init_argument(
+            ast_class,
+            prop_name,
+            ast_create_annotation(types),
+            has_default_value,
+            default_value,
+        )
+        fields[id(ast_class)].append(
+            (prop_name, types, is_required, default_value, required_keys or {})
+        )
+
+    def compile_schema(
+        prop_name: str,
+        chain_name: str,
         schema: dict[str, Any],
-        ast_class: ast.ClassDef = None,
+        ast_class: ast.ClassDef | None = None,
         is_required=False,
     ):
-        prop_name = name_chain[-1]
+        """
+        Compiles a single schema. Nested schemas are yielded back to the
+        compiler loop instead of being compiled through recursion.
+
+        :param prop_name: Name of the property or the root
+        :param chain_name: Pascal cased names of the properties leading here
+        """
+        class_name: str | None
+
+        if schema.get("$ref") in ref_names:
+            class_name = ref_names[schema["$ref"]]
+            if ast_class is None:
+                return ast_create_assignment(prop_name, class_name)
+            else:
+                return add_field(ast_class, prop_name, [class_name], is_required)
 
         schema, is_ref, ref_name, is_ref_on_path = process_ref(schema)
 
         if "anyOf" in schema:
             all_types = []
+            # required properties of the member classes, to tell them apart
+            required_keys = {}
             object_count = 0
             for child_schema in schema["anyOf"]:
+                if child_schema.get("$ref") in ref_names:
+                    all_types.append(ref_names[child_schema["$ref"]])
+                    required_keys[all_types[-1]] = resolver.resolve(
+                        child_schema["$ref"]
+                    ).get("required", [])
+                    continue
                 child_schema, is_ref, ref_name, is_ref_on_path = process_ref(
                     child_schema
                 )
-                if "type" in child_schema and child_schema["type"] == "object":
-                    class_name = case_snake_to_pascal("_".join(name_chain)) + (
+                class_name = find_class_name(child_schema) if is_ref else None
+                if class_name is not None:
+                    all_types.append(class_name)
+                    required_keys[class_name] = child_schema.get("required", [])
+                elif "type" in child_schema and child_schema["type"] == "object":
+                    class_name = chain_name + (
                         str(object_count + 1) if object_count > 0 else ""
                     )
-                    new_class = ast_create_class(class_name)
-                    required_props = (
-                        child_schema["required"] if "required" in child_schema else []
-                    )
-                    for child_prop_name, any_child_schema in child_schema[
-                        "properties"
-                    ].items():
-                        _is_required = (
-                            True if child_prop_name in required_props else False
-                        )
-                        to_ast_recursive(
-                            name_chain + (child_prop_name,),
-                            any_child_schema,
-                            new_class,
-                            _is_required,
-                        )
-                    class_defs.append(new_class)
+                    yield from build_class(chain_name, child_schema, class_name)
                     all_types.append(class_name)
+                    required_keys[class_name] = child_schema.get("required", [])
                     object_count += 1
                 elif "type" in child_schema:
                     all_types.append(schema_type_to_py_type(child_schema["type"]))
@@ -70,10 +197,14 @@ def to_ast(root_name: str, root_schema: dict[str, Any]):
             if ast_class is None:
                 return ast_create_assignment(prop_name, ann)
             else:
-                has_default_value = False if is_required is True else True
                 default_value = find_default_value_from_types(types=all_types)
-                return ast_class_add_init_argument(
-                    ast_class, prop_name, ann, has_default_value, default_value
+                return add_field(
+                    ast_class,
+                    prop_name,
+                    all_types,
+                    is_required,
+                    default_value,
+                    required_keys,
                 )
 
         elif (
@@ -85,48 +216,31 @@ def to_ast(root_name: str, root_schema: dict[str, Any]):
             if ast_class is None:
                 return ast_create_assignment(prop_name, item_type)
             else:
-                has_default_value = False if is_required is True else True
                 default_value = find_default_value_from_types(types=[item_type])
-                return ast_class_add_init_argument(
-                    ast_class, prop_name, item_type, has_default_value, default_value
+                return add_field(
+                    ast_class, prop_name, [item_type], is_required, default_value
                 )
 
         elif schema["type"] == "array":
-            if "items" in schema:
-                if "$ref" in schema["items"]:
-                    schema["items"], _trace = schema_resolve_ref(
-                        root_schema, schema["items"]["$ref"]
-                    )
-                    if schema["items"] is None:
-                        raise ValueError(f"failed to resolve ref. {_trace}")
-                if "type" not in schema["items"]:
-                    raise Exception(
-                        f"there is not type in the schema items. it's either broken or contains functionality this module doesn't support yet."
-                    )
-                if schema["items"]["type"] == "object":
-                    class_name = case_snake_to_pascal("_".join(name_chain))
-                    new_class = ast_create_class(class_name)
-                    required_props = (
-                        schema["items"]["required"]
-                        if "required" in schema["items"]
-                        else []
-                    )
-                    for child_prop_name, child_schema in schema["items"][
-                        "properties"
-                    ].items():
-                        _is_required = (
-                            True if child_prop_name in required_props else False
-                        )
-                        to_ast_recursive(
-                            name_chain + (child_prop_name,),
-                            child_schema,
-                            new_class,
-                            _is_required,
+            if "items" in schema and schema["items"].get("$ref") in ref_names:
+                items_type = f"list[{ref_names[schema['items']['$ref']]}]"
+            elif "items" in schema:
+                items = schema["items"]
+                item_type = None
+                if "$ref" in items:
+                    items = resolver.resolve(items["$ref"])
+                    item_type = find_class_name(items)
+                if item_type is None:
+                    if "type" not in items:
+                        raise Exception(
+                            f"there is not type in the schema items. it's either broken or contains functionality this module doesn't support yet."
                         )
-                    class_defs.append(new_class)
-                    item_type = class_name
-                else:
-                    item_type = schema_type_to_py_type(schema["items"]["type"])
+                    if items["type"] == "object":
+                        class_name = chain_name
+                        yield from build_class(chain_name, items, class_name)
+                        item_type = class_name
+                    else:
+                        item_type = schema_type_to_py_type(items["type"])
                 items_type = f"list[{item_type}]"
             else:
                 raise Exception(
@@ -135,63 +249,56 @@ def to_ast(root_name: str, root_schema: dict[str, Any]):
             if ast_class is None:
                 return ast_create_assignment(prop_name, items_type)
             else:
-                has_default_value = False if is_required is True else True
                 default_value = find_default_value_from_types(types=[items_type])
-                return ast_class_add_init_argument(
-                    ast_class, prop_name, items_type, has_default_value, default_value
+                return add_field(
+                    ast_class, prop_name, [items_type], is_required, default_value
                 )
 
         elif schema["type"] == "object":
-            if is_ref is False or (
-                is_ref is True and (ast_class is None or is_ref_on_path is False)
-            ):
-                class_name = case_snake_to_pascal(
-                    "_".join(name_chain)
-                    if is_ref is False or (is_ref is True and ast_class is None)
-                    else f"{root_name}_{ref_name}"
-                )
-                new_class = ast_create_class(class_name)
-                required_props = schema["required"] if "required" in schema else []
-                for child_prop_name, child_schema in schema["properties"].items():
-                    _is_required = True if child_prop_name in required_props else False
-                    to_ast_recursive(
-                        name_chain + (child_prop_name,),
-                        child_schema,
-                        new_class,
-                        is_required=_is_required,
-                    )
-                if is_ref is False and ast_class is not None:
-                    has_default_value = False if is_required is True else True
-                    ast_class_add_init_argument(
-                        ast_class, prop_name, class_name, has_default_value, None
-                    )
-                class_defs.append(new_class)
-
             if is_ref is True and ast_class is not None:
-                has_default_value = False if is_required is True else True
-                ast_class_add_init_argument(
-                    ast_class,
-                    prop_name,
-                    case_snake_to_pascal(f"{root_name}_{ref_name}"),
-                    has_default_value,
-                    None,
-                )
+                # refs to a class that is already built or being built
+                class_name = find_class_name(schema)
+                if class_name is None and is_ref_on_path is True:
+                    # the class is built later on, when its path is reached
+                    class_name = f'"{case_snake_to_pascal(f"{root_name}_{ref_name}")}"'
+                if class_name is None:
+                    class_name = case_snake_to_pascal(f"{root_name}_{ref_name}")
+                    yield from build_class(chain_name, schema, class_name)
+                add_field(ast_class, prop_name, [class_name], is_required)
+            else:
+                class_name = chain_name
+                yield from build_class(chain_name, schema, class_name)
+                if is_ref is False and ast_class is not None:
+                    add_field(ast_class, prop_name, [class_name], is_required)
 
             return class_defs
 
         else:
             raise Exception("invalid schema.")
 
-    return to_ast_recursive((root_name,), root_schema, None)
+    # the compiler loop, schemas nested thousands of levels deep are compiled
+    # with an explicit stack instead of the call stack
+    stack = [
+        compile_schema(root_name, case_snake_to_pascal(root_name), root_schema, None)
+    ]
+    result = None
+    while stack:
+        try:
+            task = stack[-1].send(result)
+        except StopIteration as e:
+            stack.pop()
+            result = e.value
+        else:
+            stack.append(compile_schema(*task))
+            result = None
+
+    return result
 
 
 def schema_generate_name_by_ref(schema: dict[str, Any], ref: str):
     if not ref.startswith("#/"):
         raise ValueError("ref must start with '#/'")
 
-    if ref in ref_name_cache:
-        return ref_name_cache[ref]
-
     # remove the '#/' prefix and split by '/'
     path_parts = ref[2:].split("/") if len(ref) > 2 else []
 
@@ -223,7 +330,6 @@ def schema_generate_name_by_ref(schema: dict[str, Any], ref: str):
             or schema_type == "integer"
             or schema_type == "boolean"
         ):
-            ref_name_cache[ref] = "_".join(name_chain)
             return "_".join(name_chain)
 
         elif schema_type == "array":
@@ -249,8 +355,6 @@ def schema_generate_name_by_ref(schema: dict[str, Any], ref: str):
             # NOTE: we only handle object types here
             name_chain.append(part)
 
-    ref_name_cache[ref] = "_".join(name_chain)
-
     return "_".join(name_chain)
 
 
@@ -260,9 +364,6 @@ def schema_resolve_ref(
     if not ref.startswith("#/"):
         raise ValueError("ref must start with '#/'")
 
-    if ref in ref_cache:
-        return ref_cache[ref], []
-
     # remove the '#/' prefix and split by '/'
     path_parts = ref[2:].split("/") if len(ref) > 2 else []
 
@@ -286,11 +387,66 @@ def schema_resolve_ref(
         current = current[part]
         trace.append(part)
 
-    ref_cache[ref] = current
-
     return current, trace
 
 
+def schema_collect_refs(
+    resolver: RefResolver, *schemas: Any, skip: Container[str] = ()
+) -> dict[str, Any]:
+    """
+    Collects the transitive closure of the refs used by the given schemas.
+
+    :param resolver: Resolves the refs against their document
+    :param schemas: Schemas to start the search from
+    :param skip: Refs that are collected but not resolved and followed
+    :return: A mapping of every ref reached to its resolved schema
+    """
+    refs: dict[str, Any] = {}
+    stack = list(schemas)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            ref = node.get("$ref")
+            if isinstance(ref, str) and ref in skip:
+                refs[ref] = None
+            elif isinstance(ref, str) and ref not in refs:
+                refs[ref] = resolver.resolve(ref)
+                stack.append(refs[ref])
+            stack.extend(node.values())
+    return refs
+
+
+def schema_union_required(
+    resolver: RefResolver, *schemas: Any, refs: Container[str] = ()
+) -> dict[str, list[str]]:
+    """
+    Collects the required properties of the refs that are members of an
+    anyOf in the given schemas, the decoders of the union tell them apart by
+    those properties. Refs aren't followed.
+
+    :param resolver: Resolves the refs against their document
+    :param schemas: Schemas to search
+    :param refs: Refs whose required properties are collected
+    :return: A mapping of every member ref found to its required properties
+    """
+    required: dict[str, list[str]] = {}
+    stack = list(schemas)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            members = node.get("anyOf")
+            for member in members if isinstance(members, list) else []:
+                ref = member.get("$ref") if isinstance(member, dict) else None
+                if isinstance(ref, str) and ref in refs:
+                    required[ref] = resolver.resolve(ref).get("required", [])
+            stack.extend(node.values())
+    return required
+
+
 def schema_type_to_py_type(key: str):
     mapping: dict[str, str] = {
         "string": "str",
@@ -347,6 +503,157 @@ def ast_create_class(id: str):
     )
 
 
+def ast_class_to_slots(current_class: ast.ClassDef, base: str):
+    """
+    Turns a class created by ast_create_class into a slotted class. Its fields
+    are only kept in the slots instead of both in the dict and the attributes.
+
+    :param current_class: Class definition with all of its init arguments
+    :param base: Name of the base class, that defines to_dict and from_dict
+    """
+    init_def = next(x for x in current_class.body if isinstance(x, ast.FunctionDef))
+    # the super().__init__(...) call that fills the dict
+    init_def.body.pop(0)
+    if not init_def.body:
+        init_def.body.append(ast.Pass())
+    names = [
+        x.target.attr
+        for x in init_def.body
+        if isinstance(x, ast.AnnAssign) and isinstance(x.target, ast.Attribute)
+    ]
+    current_class.bases = [ast.Name(id=base, ctx=ast.Load())]
+    current_class.body.insert(
+        0,
+        ast.Assign(
+            targets=[ast.Name(id="__slots__", ctx=ast.Store())],
+            value=ast.Tuple(
+                elts=[ast.Constant(value=x) for x in names], ctx=ast.Load()
+            ),
+            lineno=1,
+        ),
+    )
+
+
+def ast_class_add_codecs(current_class: ast.ClassDef, fields: list[tuple]):
+    """
+    Adds from_json and to_json methods to a class. They are straight-line
+    code generated from the field types, nested objects are converted to their
+    classes and back without inspecting the classes at runtime.
+
+    :param current_class: Class definition with all of its init arguments
+    :param fields: Name, types, whether it's required, default value and the
+        required properties of the member classes of each field
+    """
+    decoders = []
+    encoders = []
+    for name, types, is_required, default_value, required_keys in fields:
+        value = (
+            f"data[{name!r}]"
+            if is_required
+            else f"data.get({name!r}, {default_value!r})"
+        )
+        nullable = "None" in types or not is_required
+        decoders.append(
+            f"{name}={codec_decode_expression(types, value, nullable, required_keys)}"
+        )
+        encoders.append(
+            f"{name!r}: {codec_encode_expression(types, f'self.{name}', nullable)}"
+        )
+    current_class.body.extend(
+        ast.parse(
+            f"""
+@classmethod
+def from_json(cls, data: dict):
+    return cls({", ".join(decoders)})
+
+def to_json(self) -> dict:
+    return {{{", ".join(encoders)}}}
+"""
+        ).body
+    )
+
+
+def codec_is_model(type_name: str) -> bool:
+    primitives = ("str", "int", "float", "bool", "None", "dict")
+    return type_name not in primitives and not type_name.startswith("list")
+
+
+def codec_decode_expression(
+    types: list[str],
+    value: str,
+    nullable: bool = False,
+    required_keys: dict[str, list[str]] | None = None,
+) -> str:
+    """
+    Python expression that converts a json value of the given types.
+
+    Models are decoded with their from_json methods and lists of models item by
+    item. Members of a union are told apart by the json type of the value, and
+    models in the same union by their required properties.
+
+    :param types: Types in the annotation of the value, models may be quoted
+    :param value: Python expression of the json value
+    :param nullable: Whether the value can be None
+    :param required_keys: Required properties of the models in the union
+    :return: Python expression
+    """
+    required_keys = required_keys or {}
+    models = [x for x in types if codec_is_model(x)]
+    members = []
+    for type_name in types:
+        name = type_name.replace('"', "")
+        if name.startswith("list[") and codec_is_model(name[5:-1]):
+            members.append(
+                (
+                    f"isinstance({value}, list)",
+                    f"[{name[5:-1]}.from_json(x) for x in {value}]",
+                )
+            )
+        elif codec_is_model(name):
+            # any dict is decoded as the last model, the others need their keys
+            keys = required_keys.get(type_name, []) if type_name != models[-1] else []
+            condition = " and ".join(
+                [f"isinstance({value}, dict)", *(f"{x!r} in {value}" for x in keys)]
+            )
+            members.append((condition, f"{name}.from_json({value})"))
+    if not members:
+        return value
+    if len([x for x in types if x != "None"]) == 1:
+        _, expression = members[0]
+        if nullable:
+            return f"{expression} if {value} is not None else None"
+        return expression
+    return "".join(f"{x} if {condition} else " for condition, x in members) + value
+
+
+def codec_encode_expression(types: list[str], value: str, nullable: bool = False):
+    """
+    Python expression that converts a value of the given types to json.
+
+    :param types: Types in the annotation of the value, models may be quoted
+    :param value: Python expression of the value
+    :param nullable: Whether the value can be None
+    :return: Python expression
+    """
+    members = []
+    for type_name in types:
+        name = type_name.replace('"', "")
+        if name.startswith("list[") and codec_is_model(name[5:-1]):
+            members.append(
+                (f"isinstance({value}, list)", f"[x.to_json() for x in {value}]")
+            )
+        elif codec_is_model(name):
+            members.append((f"isinstance({value}, {name})", f"{value}.to_json()"))
+    if not members:
+        return value
+    if len([x for x in types if x != "None"]) == 1:
+        _, expression = members[0]
+        if nullable:
+            return f"{expression} if {value} is not None else None"
+        return expression
+    return "".join(f"{x} if {condition} else " for condition, x in members) + value
+
+
 def ast_class_add_init_argument(
     current_class: ast.ClassDef,
     name: str,
@@ -416,6 +723,11 @@ def ast_create_annotation(types: list[str]) -> ast.expr | None:
     if not types:
         return None
 
+    # quoted names are forward references to classes that aren't defined yet,
+    # the whole annotation becomes a string so that it's never evaluated early
+    if any('"' in type_name for type_name in types):
+        return ast.Constant(value=" | ".join(x.replace('"', "") for x in types))
+
     if len(types) == 1:
         type_name = types[0]
         if type_name == "None":
@@ -464,6 +776,12 @@ def find_default_value_from_types(types: list[str]):
     return None
 
 
+def case_snake_to_pascal_part(text: str) -> str:
+    # same as case_snake_to_pascal but returns an empty string instead of the
+    # text itself, so that the parts of a name can be converted one by one
+    return "".join(word[0].upper() + word[1:] for word in text.split("_") if word)
+
+
 def case_snake_to_pascal(text: str) -> str:
     components = [comp for comp in text.split("_") if comp]
     if not components:
@@ -0,0 +1,103 @@
+import io
+import json
+from typing import Any, BinaryIO
+
+
+class JSONStreamReader:
+    """
+    Reads a json document piece by piece.
+
+    Values are decoded one at a time with the json module's decoder while the
+    document is read in chunks, so only the value being decoded and a small
+    buffer are held in memory. Objects can be walked member by member with
+    `members`, which leaves it to the caller to read or skip each value.
+    """
+
+    whitespace = " \t\n\r"
+
+    def __init__(self, f: BinaryIO, chunk_size: int = 1 << 16):
+        self.byte_offset = f.tell()
+        self.f = io.TextIOWrapper(f, encoding="utf-8", newline="")
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        # drop the consumed part of the buffer, keep track of its size in bytes
+        if self.pos > 0:
+            self.byte_offset += len(self.buffer[: self.pos].encode("utf-8"))
+            self.buffer = self.buffer[self.pos :]
+            self.pos = 0
+        # large values are read in growing chunks so that they're decoded only a
+        # few times before the whole value is in the buffer
+        chunk = self.f.read(max(self.chunk_size, len(self.buffer)))
+        if not chunk:
+            return False
+        self.buffer += chunk
+        return True
+
+    def tell(self) -> int:
+        """
+        Byte offset of the next token in the file.
+        """
+        self.peek()
+        return self.byte_offset + len(self.buffer[: self.pos].encode("utf-8"))
+
+    def peek(self) -> str:
+        while True:
+            while (
+                self.pos < len(self.buffer) and self.buffer[self.pos] in self.whitespace
+            ):
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError("unexpected end of the json document.")
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(
+                f"expected '{char}' but found '{found}' in the json document."
+            )
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # a number at the end of the buffer might go on in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def members(self):
+        """
+        Yields the keys of the object at the current position. The value of
+        each key must be read before the next key is requested.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise ValueError("object keys must be strings in the json document.")
+            self.expect(":")
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError(
+                    f"expected ',' but found '{char}' in the json document."
+                )
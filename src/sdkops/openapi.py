@@ -1,5 +1,6 @@
 import os
 import re
+from sdkops.json_stream import JSONStreamReader
 from typing import Any, Union
 from dataclasses import dataclass, asdict
 
@@ -57,9 +58,23 @@ class APISpecPathOperation:
     def __init__(self):
         self.method: str = ""
         self.operation_id: str = ""
+        self.tags: list[str] = []
         self.parameters: list[APISpecPathOperationParameter] = []
         self.request_body: APISpecPathOperationRequestBody | None = None
         self.responses: list[APISpecPathOperationResponse] = []
+        self.extensions: dict[str, Any] = {}
+
+    def schemas(self) -> list[dict[str, Any] | None]:
+        """
+        Schemas of the parameters, request body and responses of the operation,
+        None for contents without a schema.
+        """
+        result: list[dict[str, Any] | None] = [x.schema for x in self.parameters]
+        if self.request_body is not None:
+            result.extend(x.schema for x in self.request_body.contents)
+        for response in self.responses:
+            result.extend(x.schema for x in response.contents)
+        return result
 
 
 class APISpecPathItem:
@@ -68,6 +83,30 @@ class APISpecPathItem:
         self.operations: list[APISpecPathOperation] = []
 
 
+class APISpecPaths:
+    """
+    Path items of a schema file, parsed on demand.
+
+    The paths object is read from the file one path item at a time on every
+    iteration, so only a single path item is held in memory at once.
+    """
+
+    def __init__(self, file: str, offset: int, count: int):
+        self.file = file
+        self.offset = offset
+        self.count = count
+
+    def __iter__(self):
+        with open(self.file, "rb") as f:
+            f.seek(self.offset)
+            reader = JSONStreamReader(f)
+            for pattern in reader.members():
+                yield parse_path_item(pattern, reader.value())
+
+    def __len__(self):
+        return self.count
+
+
 @dataclass
 class APISpecApplicationInfo:
     def __init__(self):
@@ -80,7 +119,7 @@ class APISpec:
         self.version_openapi: str = ""
         self.version: str = ""
         self.info: APISpecApplicationInfo = APISpecApplicationInfo()
-        self.paths: list[APISpecPathItem] = []
+        self.paths: list[APISpecPathItem] | APISpecPaths = []
         self.components: list[APISpecComponentSchema] = []
         self.servers: list[APISpecServer] = []
         self.schema_dict: dict[str, Any] = {}
@@ -133,81 +172,122 @@ def parse(schema_dict: dict[str, Any]):
             spec.servers.append(APISpecServer(server["url"], server["description"]))
 
     if "paths" in schema_dict:
-        for pattern, operations_dict in schema_dict["paths"].items():
-            path_item = APISpecPathItem()
-            path_item.pattern = pattern
-            for method, operation_dict in operations_dict.items():
-                path_op = APISpecPathOperation()
-                path_op.method = method
-
-                if "operationId" in operation_dict:
-                    path_op.operation_id = operation_dict["operationId"]
-                else:
-                    path_op.operation_id = f"{path_pattern_to_snake_case(path_item.pattern)}_{path_op.method}"
-
-                if "parameters" in operation_dict:
-                    for parameter in operation_dict["parameters"]:
-                        parameter_ins = APISpecPathOperationParameter()
-                        parameter_ins.name = parameter["name"]
-                        parameter_ins.kind = parameter["in"]
-                        parameter_ins.required = (
-                            parameter["required"]
-                            if "required" in parameter or parameter["in"] == "path"
-                            else False
-                        )
-                        parameter_ins.schema = parameter["schema"]
-                        path_op.parameters.append(parameter_ins)
-
-                if "requestBody" in operation_dict:
-                    path_op.request_body = APISpecPathOperationRequestBody()
-
-                    if "required" in operation_dict["requestBody"]:
-                        path_op.request_body.required = operation_dict["requestBody"][
-                            "required"
-                        ]
-
-                    if "description" in operation_dict["requestBody"]:
-                        path_op.request_body.description = operation_dict[
-                            "requestBody"
-                        ]["description"]
-
-                    if "content" in operation_dict["requestBody"]:
-                        contents = parse_content(
-                            operation_dict["requestBody"]["content"],
-                            f"{path_op.operation_id}_request_body",
-                        )
-                        path_op.request_body.contents.extend(contents)
-
-                if "responses" in operation_dict:
-                    responses_dict = operation_dict["responses"]
-                    for status_code, response_dict in responses_dict.items():
-                        status_code_num = int(status_code)
-                        op_id_snake_case = (
-                            f"{path_op.operation_id}_response_{status_code}"
-                        )
-                        response = APISpecPathOperationResponse()
-                        response.status_code = status_code
-                        response.description = response_dict["description"]
-
-                        if "content" in response_dict:
-                            contents = parse_content(
-                                response_dict["content"], op_id_snake_case
-                            )
-                            response.contents.extend(contents)
-
-                        if status_code_num in range(301, 309):
-                            empty = {"text/plain": {"schema": {"type": "string"}}}
-                            response.contents.extend(
-                                parse_content(empty, op_id_snake_case)
-                            )
-
-                        path_op.responses.append(response)
-                path_item.operations.append(path_op)
-            spec.paths.append(path_item)
+        spec.paths = [
+            parse_path_item(pattern, operations_dict)
+            for pattern, operations_dict in schema_dict["paths"].items()
+        ]
 
     return True, spec
 
 
+def parse_file(file: str):
+    """
+    Parses a json schema file without loading its paths into memory.
+
+    Every top level member except paths is decoded as usual. Path items are
+    only skipped over here, their location in the file is saved and they are
+    parsed lazily while iterating `spec.paths`.
+
+    :param file: Path of the json schema file
+    :return: Same as `parse`
+    """
+    schema_dict = {}
+    paths = None
+    with open(file, "rb") as f:
+        reader = JSONStreamReader(f)
+        for key in reader.members():
+            if key != "paths":
+                schema_dict[key] = reader.value()
+                continue
+            offset = reader.tell()
+            count = 0
+            for _pattern in reader.members():
+                reader.value()
+                count += 1
+            paths = APISpecPaths(file, offset, count)
+
+    success, spec = parse(schema_dict)
+    if success and paths is not None:
+        spec.paths = paths
+    return success, spec
+
+
+def parse_path_item(pattern: str, operations_dict: dict[str, Any]) -> APISpecPathItem:
+    path_item = APISpecPathItem()
+    path_item.pattern = pattern
+    for method, operation_dict in operations_dict.items():
+        path_op = APISpecPathOperation()
+        path_op.method = method
+
+        if "operationId" in operation_dict:
+            path_op.operation_id = operation_dict["operationId"]
+        else:
+            path_op.operation_id = (
+                f"{path_pattern_to_snake_case(path_item.pattern)}_{path_op.method}"
+            )
+
+        if "tags" in operation_dict:
+            path_op.tags = operation_dict["tags"]
+
+        path_op.extensions = {
+            k: v for k, v in operation_dict.items() if k.startswith("x-")
+        }
+
+        if "parameters" in operation_dict:
+            for parameter in operation_dict["parameters"]:
+                parameter_ins = APISpecPathOperationParameter()
+                parameter_ins.name = parameter["name"]
+                parameter_ins.kind = parameter["in"]
+                parameter_ins.required = (
+                    parameter["required"]
+                    if "required" in parameter or parameter["in"] == "path"
+                    else False
+                )
+                parameter_ins.schema = parameter["schema"]
+                path_op.parameters.append(parameter_ins)
+
+        if "requestBody" in operation_dict:
+            path_op.request_body = APISpecPathOperationRequestBody()
+
+            if "required" in operation_dict["requestBody"]:
+                path_op.request_body.required = operation_dict["requestBody"][
+                    "required"
+                ]
+
+            if "description" in operation_dict["requestBody"]:
+                path_op.request_body.description = operation_dict["requestBody"][
+                    "description"
+                ]
+
+            if "content" in operation_dict["requestBody"]:
+                contents = parse_content(
+                    operation_dict["requestBody"]["content"],
+                    f"{path_op.operation_id}_request_body",
+                )
+                path_op.request_body.contents.extend(contents)
+
+        if "responses" in operation_dict:
+            responses_dict = operation_dict["responses"]
+            for status_code, response_dict in responses_dict.items():
+                status_code_num = int(status_code)
+                op_id_snake_case = f"{path_op.operation_id}_response_{status_code}"
+                response = APISpecPathOperationResponse()
+                response.status_code = status_code
+                response.description = response_dict["description"]
+
+                if "content" in response_dict:
+                    contents = parse_content(response_dict["content"], op_id_snake_case)
+                    response.contents.extend(contents)
+
+                if status_code_num in range(301, 309):
+                    empty = {"text/plain": {"schema": {"type": "string"}}}
+                    response.contents.extend(parse_content(empty, op_id_snake_case))
+
+                path_op.responses.append(response)
+        path_item.operations.append(path_op)
+    return path_item
+
+
 def parse_content(
     contents_dict: dict[str, Any], op_id: str
 ) -> list[APISpecPathOperationContent]:
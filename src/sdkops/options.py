@@ -0,0 +1,63 @@
+class GeneratorOptions:
+    """
+    Options that change the generated code.
+
+    They are part of the cache keys, every option that affects the output of a
+    component or an operation must be an attribute of this class.
+    """
+
+    clients = ("sync", "async", "both")
+    model_styles = ("dict", "slots")
+    json_backends = ("httpx", "auto", "orjson", "msgspec", "json")
+
+    def __init__(
+        self,
+        client: str = "sync",
+        model_style: str = "dict",
+        typed_responses: bool = False,
+        json_backend: str = "httpx",
+        hedging: bool = False,
+        response_cache: bool = False,
+        coalesce: tuple[str, ...] = (),
+        batch: bool = False,
+        instrumentation: bool = False,
+    ):
+        if client not in self.clients:
+            raise ValueError(f"client must be one of {', '.join(self.clients)}.")
+        if model_style not in self.model_styles:
+            raise ValueError(
+                f"model_style must be one of {', '.join(self.model_styles)}."
+            )
+        if json_backend not in self.json_backends:
+            raise ValueError(
+                f"json_backend must be one of {', '.join(self.json_backends)}."
+            )
+        self.client = client
+        self.model_style = model_style
+        # models get from_json and to_json, methods return models instead of dicts
+        self.typed_responses = typed_responses
+        self.json_backend = json_backend
+        # get and head requests can be sent again when they are slow
+        self.hedging = hedging
+        # get responses can be kept in memory by their cache headers
+        self.response_cache = response_cache
+        # operation ids of the get and head methods that merge identical
+        # concurrent requests into one, "all" for all of them
+        self.coalesce = tuple(coalesce)
+        # the async sdk class gets batch and a map_ method per operation
+        self.batch = batch
+        # sdk classes take hooks and keep latency histograms per operation
+        self.instrumentation = instrumentation
+
+    @property
+    def has_sync_client(self) -> bool:
+        return self.client in ("sync", "both")
+
+    @property
+    def has_async_client(self) -> bool:
+        return self.client in ("async", "both")
+
+    def is_coalesced(self, operation_id: str, method: str) -> bool:
+        if method not in ("get", "head"):
+            return False
+        return "all" in self.coalesce or operation_id in self.coalesce
@@ -0,0 +1,280 @@
+import ast
+import keyword
+import re
+from sdkops.openapi import APISpec, APISpecPathOperation
+from sdkops.cache import GenerationCache
+from sdkops.components import ComponentRegistry
+from sdkops.options import GeneratorOptions
+from sdkops.profiler import Profiler
+from sdkops.features import ast_generate_features
+from sdkops.json_schema import case_snake_to_pascal, schema_collect_refs, RefResolver
+from sdkops.generator import (
+    create_executor,
+    generate_components,
+    generate_operations,
+    ast_generate_sdk_class,
+    ast_generate_model_base,
+    ast_generate_json_backend,
+    ast_generate_json_array_parser,
+    array_response_content,
+    operation_pagination,
+    sdk_class_name,
+    sdk_instance_name,
+)
+
+MODELS_MODULE = "models"
+
+# module names that would shadow the names the __init__ module depends on
+RESERVED_MODULE_NAMES = {
+    MODELS_MODULE,
+    "httpx",
+    "importlib",
+    "json",
+    "orjson",
+    "msgspec",
+}
+
+
+def to_package_ast(
+    spec: APISpec,
+    sdk_name: str,
+    base_url: str | None,
+    cache: GenerationCache | None = None,
+    registry: ComponentRegistry | None = None,
+    resolver: RefResolver | None = None,
+    jobs: int = 1,
+    options: GeneratorOptions | None = None,
+    profiler: Profiler | None = None,
+) -> dict[str, ast.Module]:
+    """
+    Generates the sdk as a package whose modules are imported lazily.
+
+    Operations are grouped into a module per tag, the classes of an operation
+    are placed next to its method. Components used by the operations of a
+    single module are placed into that module, the rest of the components go
+    into a shared models module. The __init__ module only has the sdk class and
+    loads the other modules the first time something in them is accessed.
+
+    :param spec: APISpec object
+    :param sdk_name: Name of the sdk package
+    :param base_url: Base url of the sdk endpoints
+    :return: Ast modules by their names in the package
+    """
+    if resolver is None:
+        resolver = registry.resolver if registry else RefResolver(spec.schema_dict)
+    if registry is None:
+        registry = ComponentRegistry(spec, sdk_name, resolver)
+    if options is None:
+        options = GeneratorOptions()
+
+    operation_class_defs: dict[str, list[ast.ClassDef | ast.AnnAssign]] = {}
+    method_defs: dict[str, list[ast.FunctionDef | ast.AsyncFunctionDef]] = {}
+    users: dict[str, set[str]] = {ref: set() for ref in registry.order}
+    has_streams = False
+    has_paginations = False
+    with create_executor(registry, options, jobs) as executor:
+        component_class_defs = dict(
+            generate_components(registry, options, cache, executor, jobs, profiler)
+        )
+        for (pattern, operation), (
+            class_defs,
+            operation_method_defs,
+        ) in generate_operations(
+            spec, registry, options, cache, executor, jobs, profiler
+        ):
+            module_name = module_name_for(pattern, operation, sdk_name)
+            operation_class_defs.setdefault(module_name, []).extend(class_defs)
+            for method_def in operation_method_defs:
+                # sync and async methods of an operation live in the same module
+                if isinstance(method_def, ast.AsyncFunctionDef):
+                    method_def.name = f"async_{method_def.name}"
+            method_defs.setdefault(module_name, []).extend(operation_method_defs)
+            if array_response_content(operation, registry) is not None:
+                has_streams = True
+            if operation_pagination(operation, registry) is not None:
+                has_paginations = True
+            refs = schema_collect_refs(
+                registry.resolver, *operation.schemas(), skip=registry.names
+            )
+            for ref in refs:
+                if ref in users:
+                    users[ref].add(module_name)
+
+    component_modules = group_components(registry, users)
+    bodies: dict[str, list[ast.stmt]] = {}
+    if options.model_style == "slots":
+        bodies[MODELS_MODULE] = ast_generate_model_base(sdk_name).body
+    for ref in registry.order:
+        bodies.setdefault(component_modules[ref], []).extend(component_class_defs[ref])
+    for module_name in method_defs:
+        bodies.setdefault(module_name, [])
+        bodies[module_name].extend(operation_class_defs[module_name])
+        bodies[module_name].extend(method_defs[module_name])
+
+    modules: dict[str, ast.Module] = {}
+    exports: dict[str, str] = {}
+    operations: dict[str, str] = {}
+    for module_name, body in bodies.items():
+        if module_name != MODELS_MODULE and MODELS_MODULE in bodies:
+            body.insert(0, ast.parse(f"from .{MODELS_MODULE} import *").body[0])
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                exports[node.name] = module_name
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                operations[node.name] = module_name
+        modules[module_name] = ast.Module(body=body, type_ignores=[])
+
+    modules["__init__"] = ast_generate_package_init(
+        sdk_name, base_url, exports, operations, options, has_streams, has_paginations
+    )
+    return modules
+
+
+def module_name_for(pattern: str, operation: APISpecPathOperation, sdk_name: str):
+    """
+    Name of the module an operation is placed into. It's based on the first tag
+    of the operation, or the first segment of its path when it has no tags.
+
+    :param pattern: URL path of the operation
+    :param operation: APISpecPathOperation object
+    :param sdk_name: Name of the sdk package, modules can't shadow it
+    :return: Module name in snake case
+    """
+    if operation.tags:
+        name = operation.tags[0]
+    else:
+        segments = [x for x in pattern.split("/") if x and not x.startswith("{")]
+        name = segments[0] if segments else "home"
+    name = re.sub(r"([a-z])([A-Z])", r"\1_\2", name)
+    name = re.sub(r"[^0-9a-zA-Z]+", "_", name).strip("_").lower()
+    if not name or name[0].isdigit():
+        name = f"tag_{name}"
+    if name in RESERVED_MODULE_NAMES or name == sdk_name or keyword.iskeyword(name):
+        name = f"{name}_api"
+    return name
+
+
+def group_components(
+    registry: ComponentRegistry, users: dict[str, set[str]]
+) -> dict[str, str]:
+    """
+    Finds out the module of each component.
+
+    A component goes into the module of its users when all of them are in the
+    same module, otherwise into the models module. Users of a component include
+    the users of the components that depend on it, so the models module never
+    depends on the other modules.
+
+    :param registry: ComponentRegistry object
+    :param users: Names of the modules whose operations refer to each component
+    :return: Module names by component refs
+    """
+    modules = {ref: set(users[ref]) for ref in registry.order}
+
+    def propagate(stack: list[str]):
+        while stack:
+            ref = stack.pop()
+            for dependency in registry.dependencies[ref]:
+                if not modules[ref] <= modules[dependency]:
+                    modules[dependency] |= modules[ref]
+                    stack.append(dependency)
+
+    propagate(list(registry.order))
+    # components that no operation uses end up in the models module
+    unused = [ref for ref in registry.order if not modules[ref]]
+    for ref in unused:
+        modules[ref].add(MODELS_MODULE)
+    propagate(unused)
+
+    return {
+        ref: next(iter(names)) if len(names) == 1 else MODELS_MODULE
+        for ref, names in modules.items()
+    }
+
+
+def ast_generate_package_init(
+    sdk_name: str,
+    base_url: str | None,
+    exports: dict[str, str],
+    operations: dict[str, str],
+    options: GeneratorOptions,
+    has_streams: bool = False,
+    has_paginations: bool = False,
+) -> ast.Module:
+    """
+    Generates the __init__ module of the package.
+
+    Classes of the package are loaded through the module level __getattr__ and
+    sdk methods through the __getattr__ of the sdk classes, each imports the
+    module it needs the first time it's accessed.
+
+    :param exports: Module names by class names
+    :param operations: Module names by function names, async ones are prefixed
+    :param options: GeneratorOptions object
+    :param has_streams: Whether any operation has an iter_ method
+    :param has_paginations: Whether any operation has a paginate_ method
+    :return: Ast module
+    """
+    body = ast.parse(
+        f"""
+import importlib
+import httpx
+
+_exports = {exports!r}
+_operations = {operations!r}
+"""
+    ).body
+    if options.json_backend != "httpx":
+        body[2:2] = ast_generate_json_backend(options.json_backend).body
+    if has_streams:
+        body.extend(ast_generate_json_array_parser().body)
+    body.extend(ast_generate_features(options, has_paginations))
+
+    sdk_assigns = []
+    for is_async in (False, True):
+        if not (options.has_async_client if is_async else options.has_sync_client):
+            continue
+        class_name = sdk_class_name(sdk_name, is_async)
+        prefix = "async_" if is_async else ""
+        sdk_class_def = ast_generate_sdk_class(
+            sdk_name, base_url, is_async, options, has_streams, has_paginations
+        )
+        sdk_class_def.body[0].body.append(
+            ast.parse(
+                f"""
+def __getattr__(self, name: str):
+    module_name = _operations.get(f"{prefix}{{name}}")
+    if module_name is None:
+        raise AttributeError(f"'{class_name}' object has no attribute '{{name}}'")
+    module = importlib.import_module(f".{{module_name}}", __name__)
+    setattr({class_name}, name, getattr(module, f"{prefix}{{name}}"))
+    return getattr(self, name)
+"""
+            ).body[0]
+        )
+        body.extend(sdk_class_def.body)
+        sdk_assigns.append(
+            ast.parse(f"{sdk_instance_name(sdk_name, is_async)} = {class_name}()").body[
+                0
+            ]
+        )
+
+    body.extend(
+        ast.parse(
+            """
+def __getattr__(name: str):
+    module_name = _exports.get(name)
+    if module_name is None:
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return [*globals(), *_exports]
+"""
+        ).body
+    )
+    body.extend(sdk_assigns)
+    return ast.Module(body=body, type_ignores=[])
@@ -0,0 +1,134 @@
+import cProfile
+import contextlib
+import json
+import os
+import time
+import tracemalloc
+from typing import Any
+
+TASK_KINDS = ("operations", "schemas")
+
+
+class Profiler:
+    """
+    Records the wall time, cpu time and peak memory of the phases of a
+    generation, and the time every operation and component schema took to
+    generate.
+
+    Cpu time includes the worker processes once they exit, which is at the end
+    of the phase that started them. Peak memory is the most memory python
+    allocated during the phase on top of what was allocated before it, traced
+    with tracemalloc, so the timings of a profiled run are slower than usual.
+    """
+
+    def __init__(self, top: int = 10, cprofile: bool = False):
+        """
+        :param top: Number of the slowest operations and schemas to report
+        :param cprofile: Whether to run cProfile during the phases too
+        """
+        self.top = top
+        self.phases: dict[str, dict[str, float]] = {}
+        self.tasks: dict[str, list[tuple[str, float]]] = {x: [] for x in TASK_KINDS}
+        self.cprofile = cProfile.Profile() if cprofile else None
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Measures the code in the with block as the phase of the name. A phase
+        that runs more than once adds up its times.
+        """
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), cpu_time()
+        if self.cprofile:
+            self.cprofile.enable()
+        try:
+            yield
+        finally:
+            if self.cprofile:
+                self.cprofile.disable()
+            result = self.phases.setdefault(
+                name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_bytes": 0}
+            )
+            result["wall_seconds"] += time.perf_counter() - wall
+            result["cpu_seconds"] += cpu_time() - cpu
+            result["peak_bytes"] = max(
+                result["peak_bytes"], tracemalloc.get_traced_memory()[1] - before
+            )
+            if not tracing:
+                tracemalloc.stop()
+
+    def add_task(self, kind: str, name: str, seconds: float):
+        """
+        :param kind: "operations" or "schemas"
+        :param name: Operation id or component ref
+        :param seconds: Time it took to generate the task
+        """
+        self.tasks[kind].append((name, seconds))
+
+    def slowest(self, kind: str) -> list[tuple[str, float]]:
+        return sorted(self.tasks[kind], key=lambda x: x[1], reverse=True)[: self.top]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "phases": self.phases,
+            **{
+                kind: [{"name": name, "seconds": s} for name, s in self.slowest(kind)]
+                for kind in TASK_KINDS
+            },
+        }
+
+    def report(self) -> list[str]:
+        """
+        :return: Lines of a table of the phases and the slowest tasks
+        """
+        lines = [f"{'phase':>10} {'wall ms':>9} {'cpu ms':>9} {'peak MB':>9}"]
+        for name, result in self.phases.items():
+            lines.append(
+                f"{name:>10} {result['wall_seconds'] * 1000:9.1f} {result['cpu_seconds'] * 1000:9.1f} {result['peak_bytes'] / 1024 / 1024:9.1f}"
+            )
+        for kind in TASK_KINDS:
+            slowest = self.slowest(kind)
+            if not slowest:
+                continue
+            lines.append(f"slowest {len(slowest)} of {len(self.tasks[kind])} {kind}:")
+            for name, seconds in slowest:
+                lines.append(f"    {seconds * 1000:9.1f}ms {name}")
+        return lines
+
+    def dump(self, path: str):
+        """
+        Writes the results as json when the path ends with .json, otherwise
+        writes the cProfile stats, which can be read with pstats.
+
+        :param path: File path to write into
+        """
+        if os.path.splitext(path)[1] == ".json":
+            with open(path, "w") as f:
+                json.dump(self.to_dict(), f, indent=2)
+                f.write("\n")
+            return
+        if self.cprofile is None:
+            raise ValueError("the profiler was created without cprofile.")
+        self.cprofile.dump_stats(path)
+
+
+def phase(profiler: Profiler | None, name: str):
+    """
+    The phase of the profiler, or a context that measures nothing when there
+    is no profiler.
+    """
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.phase(name)
+
+
+def cpu_time() -> float:
+    """
+    Cpu time of the process and of its children that have exited.
+    """
+    times = os.times()
+    return time.process_time() + times.children_user + times.children_system
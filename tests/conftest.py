@@ -0,0 +1,25 @@
+import os
+import json
+import pytest
+from sdkops.openapi import parse
+
+
+@pytest.fixture
+def sample_path() -> str:
+    return os.path.join(os.path.dirname(__file__), "schema_sample1.json")
+
+
+@pytest.fixture
+def load_spec(sample_path):
+    """
+    Parses the sample schema, into a new spec every time it's called since
+    tests change the specs they get.
+    """
+
+    def load():
+        with open(sample_path) as f:
+            success, spec = parse(json.load(f))
+        assert success
+        return spec
+
+    return load
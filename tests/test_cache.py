@@ -0,0 +1,179 @@
+import ast
+from sdkops.openapi import parse
+from sdkops.generator import to_ast
+from sdkops.cache import GenerationCache
+from sdkops.options import GeneratorOptions
+
+
+def test_cache_reuses_unchanged_operations(tmp_path, load_spec):
+    expected = ast.unparse(to_ast(load_spec(), "stela_sdk", "http://localhost:8000"))
+
+    cache = GenerationCache(str(tmp_path))
+    code = ast.unparse(to_ast(load_spec(), "stela_sdk", "http://localhost", cache))
+    # 10 component models and 6 operations
+    assert cache.hits == 0
+    assert cache.misses == 16
+
+    cache = GenerationCache(str(tmp_path))
+    code_cached = ast.unparse(
+        to_ast(load_spec(), "stela_sdk", "http://localhost", cache)
+    )
+    assert cache.hits == 16
+    assert cache.misses == 0
+    assert code_cached == code
+    assert code.replace("http://localhost", "http://localhost:8000") == expected
+
+
+def test_cache_invalidates_operations_by_refs(tmp_path, load_spec):
+    to_ast(load_spec(), "stela_sdk", "http://localhost", GenerationCache(str(tmp_path)))
+
+    # operations refer to the component by name, only the component changes
+    spec = load_spec()
+    status_schema = spec.schema_dict["components"]["schemas"]["UserStatusResponseBody"]
+    status_schema["properties"]["role"] = {"type": "string"}
+    cache = GenerationCache(str(tmp_path))
+    code = ast.unparse(to_ast(spec, "stela_sdk", "http://localhost", cache))
+    assert cache.misses == 1
+    assert cache.hits == 15
+    assert "self.role: str = role" in code
+
+
+def test_cache_invalidates_operations_by_component_fields(tmp_path):
+    def page_spec(next_field: str):
+        success, spec = parse(
+            {
+                "paths": {
+                    "/events": {
+                        "get": {
+                            "operationId": "list_events",
+                            "parameters": [
+                                {
+                                    "name": "cursor",
+                                    "in": "query",
+                                    "schema": {"type": "string", "default": ""},
+                                }
+                            ],
+                            "responses": {
+                                "200": {
+                                    "description": "",
+                                    "content": {
+                                        "application/json": {
+                                            "schema": {
+                                                "$ref": "#/components/schemas/Page"
+                                            }
+                                        }
+                                    },
+                                }
+                            },
+                        }
+                    }
+                },
+                "components": {
+                    "schemas": {
+                        "Page": {
+                            "type": "object",
+                            "properties": {
+                                "items": {
+                                    "type": "array",
+                                    "items": {"type": "integer"},
+                                },
+                                next_field: {"type": "string"},
+                            },
+                        }
+                    }
+                },
+            }
+        )
+        assert success
+        return spec
+
+    code = ast.unparse(
+        to_ast(
+            page_spec("next_cursor"), "sdk", "http://x", GenerationCache(str(tmp_path))
+        )
+    )
+    assert "def paginate_list_events(" in code
+
+    # the pagination is read from the fields of the component
+    expected = ast.unparse(to_ast(page_spec("other"), "sdk", "http://x"))
+    assert "def paginate_list_events(" not in expected
+    code = ast.unparse(
+        to_ast(page_spec("other"), "sdk", "http://x", GenerationCache(str(tmp_path)))
+    )
+    assert code == expected
+
+
+def test_cache_invalidates_unions_by_component_required(tmp_path):
+    def pet_spec(dog_required: list[str]):
+        pet = {
+            "anyOf": [
+                {"$ref": "#/components/schemas/Dog"},
+                {"$ref": "#/components/schemas/Cat"},
+            ]
+        }
+        success, spec = parse(
+            {
+                "paths": {
+                    "/pets": {
+                        "get": {
+                            "operationId": "get_pet",
+                            "responses": {
+                                "200": {
+                                    "description": "",
+                                    "content": {
+                                        "application/json": {
+                                            "schema": {
+                                                "type": "object",
+                                                "properties": {"pet": pet},
+                                            }
+                                        }
+                                    },
+                                }
+                            },
+                        }
+                    }
+                },
+                "components": {
+                    "schemas": {
+                        "Dog": {
+                            "type": "object",
+                            "properties": {
+                                "barks": {"type": "boolean"},
+                                "x": {"type": "integer"},
+                            },
+                            "required": dog_required,
+                        },
+                        "Cat": {
+                            "type": "object",
+                            "properties": {"meows": {"type": "boolean"}},
+                        },
+                        "Owner": {
+                            "type": "object",
+                            "properties": {"pet": pet},
+                        },
+                    }
+                },
+            }
+        )
+        assert success
+        return spec
+
+    options = GeneratorOptions(typed_responses=True)
+    to_ast(
+        pet_spec(["barks"]),
+        "sdk",
+        "http://x",
+        GenerationCache(str(tmp_path)),
+        options=options,
+    )
+
+    # the decoders of the unions tell the members apart by their required fields
+    expected = ast.unparse(to_ast(pet_spec(["x"]), "sdk", "http://x", options=options))
+    assert "'x' in data.get('pet', None)" in expected
+    cache = GenerationCache(str(tmp_path))
+    code = ast.unparse(
+        to_ast(pet_spec(["x"]), "sdk", "http://x", cache, options=options)
+    )
+    # Dog itself, and the operation and the Owner that decode the union
+    assert cache.misses == 3
+    assert code == expected
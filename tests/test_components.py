@@ -0,0 +1,129 @@
+import ast
+import black
+from sdkops.openapi import parse
+from sdkops.generator import to_ast
+from sdkops.components import ComponentRegistry
+
+
+def make_spec(components: dict, paths: dict):
+    success, spec = parse(
+        {
+            "openapi": "3.1.0",
+            "paths": paths,
+            "components": {"schemas": components},
+        }
+    )
+    assert success
+    return spec
+
+
+def json_response(ref: str):
+    return {
+        "description": "",
+        "content": {"application/json": {"schema": {"$ref": ref}}},
+    }
+
+
+def test_components_are_generated_once():
+    components = {
+        "User": {
+            "type": "object",
+            "properties": {"name": {"type": "string"}},
+            "required": ["name"],
+        },
+        "Users": {
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "items": {"$ref": "#/components/schemas/User"},
+                }
+            },
+            "required": ["items"],
+        },
+    }
+    paths = {
+        f"/user/{i}": {
+            "get": {
+                "operationId": f"user_{i}",
+                "responses": {"200": json_response("#/components/schemas/User")},
+            }
+        }
+        for i in range(3)
+    }
+    paths["/users"] = {
+        "get": {
+            "operationId": "users",
+            "responses": {"200": json_response("#/components/schemas/Users")},
+        }
+    }
+    spec = make_spec(components, paths)
+    registry = ComponentRegistry(spec, "sdk")
+    code = ast.unparse(to_ast(spec, "sdk", "http://localhost", registry=registry))
+
+    assert registry.reference_count == 5
+    assert registry.dedup_ratio == 2.5
+    assert code.count("class SdkUser(dict)") == 1
+    assert "def users(self, headers: dict[str, str]=None) -> SdkUsers" in code
+    assert "def user_0(self, headers: dict[str, str]=None) -> SdkUser" in code
+    assert "self.items: list[SdkUser] = items" in code
+
+
+def test_recursive_components():
+    components = {
+        "Comment": {
+            "type": "object",
+            "properties": {
+                "text": {"type": "string"},
+                "replies": {
+                    "type": "array",
+                    "items": {"$ref": "#/components/schemas/Comment"},
+                },
+                "thread": {"$ref": "#/components/schemas/Thread"},
+            },
+            "required": ["text", "replies"],
+        },
+        "Thread": {
+            "type": "object",
+            "properties": {
+                "first": {
+                    "anyOf": [
+                        {"$ref": "#/components/schemas/Comment"},
+                        {"type": "null"},
+                    ]
+                }
+            },
+        },
+    }
+    spec = make_spec(components, {})
+    registry = ComponentRegistry(spec, "sdk")
+    assert registry.order == [
+        "#/components/schemas/Thread",
+        "#/components/schemas/Comment",
+    ]
+
+    code = black.format_str(
+        ast.unparse(to_ast(spec, "sdk", "http://localhost", registry=registry)),
+        mode=black.FileMode(line_length=160),
+    )
+    assert (
+        """\
+class SdkThread(dict):
+
+    def __init__(self, first: "SdkComment | None" = None):
+        super().__init__(first=first)
+        self.first: "SdkComment | None" = first
+
+
+class SdkComment(dict):
+
+    def __init__(self, replies: "list[SdkComment]", text: str, thread: SdkThread = None):
+        super().__init__(text=text, replies=replies, thread=thread)
+        self.text: str = text
+        self.replies: "list[SdkComment]" = replies
+        self.thread: SdkThread = thread
+"""
+        in code
+    )
+    # forward references must not be evaluated while the module is imported
+    exec(compile(code, "sdk.py", "exec"), {})
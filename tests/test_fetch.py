@@ -0,0 +1,202 @@
+import os
+import json
+import hashlib
+import http.server
+import threading
+import contextlib
+import httpx
+import pytest
+from click.testing import CliRunner
+from sdkops.cache import GenerationCache
+from sdkops.fetch import fetch_schema
+from sdkops.cli import generate
+
+sample_path = os.path.join(os.path.dirname(__file__), "schema_sample1.json")
+
+
+@contextlib.contextmanager
+def schema_server(body: bytes, etag: bool = True, last_modified: bool = True):
+    """
+    Serves the body at /openapi.json with validators, and answers conditional
+    requests whose validators match with 304.
+
+    :return: Context of the server, its url and the statuses it answered with
+    """
+    server_state = {"body": body, "statuses": []}
+    validator_date = "Mon, 05 Oct 2026 10:00:00 GMT"
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path != "/openapi.json":
+                self.send_response(404)
+                self.send_header("content-length", "0")
+                self.end_headers()
+                return
+            body = server_state["body"]
+            tag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+            headers = {}
+            if etag:
+                headers["etag"] = tag
+            if last_modified:
+                headers["last-modified"] = validator_date
+            if (etag and self.headers.get("if-none-match") == tag) or (
+                not etag
+                and last_modified
+                and self.headers.get("if-modified-since") == validator_date
+            ):
+                status, body = 304, b""
+            else:
+                status = 200
+            server_state["statuses"].append(status)
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/openapi.json", server_state
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def sample_body() -> bytes:
+    with open(sample_path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("etag", [True, False])
+def test_fetch_schema_revalidates_the_cached_schema(tmp_path, etag):
+    body = sample_body()
+    with schema_server(body, etag=etag) as (url, server_state):
+        remote = fetch_schema(url)
+        assert remote.schema_dict == json.loads(body)
+        assert remote.file is None
+        assert remote.sha256 == hashlib.sha256(body).hexdigest()
+
+        cache = GenerationCache(str(tmp_path))
+        remote = fetch_schema(url, cache)
+        assert not remote.not_modified
+        assert remote.schema_dict == json.loads(body)
+        # it isn't cached until it's committed
+        remote.discard()
+        remote = fetch_schema(url, cache)
+        remote.commit()
+        with open(remote.file, "rb") as f:
+            assert f.read() == body
+
+        remote = fetch_schema(url, cache)
+        assert remote.not_modified
+        assert remote.schema_dict is None
+        assert remote.sha256 == hashlib.sha256(body).hexdigest()
+        with open(remote.file, "rb") as f:
+            assert f.read() == body
+        assert server_state["statuses"] == [200, 200, 200, 304]
+
+        if etag:
+            server_state["body"] = body.replace(b"Stela", b"Stela 2")
+            remote = fetch_schema(url, cache, stream=True)
+            assert not remote.not_modified
+            assert remote.schema_dict is None
+            assert remote.sha256 == hashlib.sha256(server_state["body"]).hexdigest()
+            remote.commit()
+            with open(remote.file, "rb") as f:
+                assert f.read() == server_state["body"]
+            assert server_state["statuses"][-1] == 200
+
+
+def test_fetch_schema_errors(tmp_path):
+    with schema_server(b"not json") as (url, _server_state):
+        with pytest.raises(Exception, match="is not a json"):
+            fetch_schema(url, GenerationCache(str(tmp_path)))
+        # neither a partial body nor an entry is left in the cache
+        assert [x for _, _, files in os.walk(tmp_path) for x in files] == []
+        remote = fetch_schema(url, stream=True)
+        assert remote.temporary
+        remote.discard()
+        assert not os.path.exists(remote.file)
+        with pytest.raises(Exception, match="status code 404"):
+            fetch_schema(url.replace("openapi.json", "missing.json"))
+
+
+def test_fetch_schema_interrupted(tmp_path):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            # the connection is closed before the whole body is sent
+            self.send_response(200)
+            self.send_header("content-length", "100000")
+            self.end_headers()
+            self.wfile.write(b'{"openapi": "3.1.0", ')
+            self.wfile.flush()
+            self.close_connection = True
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/openapi.json"
+        for stream in (False, True):
+            with pytest.raises(httpx.HTTPError):
+                fetch_schema(url, GenerationCache(str(tmp_path)), stream=stream)
+            assert [x for _, _, files in os.walk(tmp_path) for x in files] == []
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_generate_doesnt_cache_invalid_streamed_schema(tmp_path):
+    args = ["-n", "stela_sdk", "-d", str(tmp_path), "-u", "http://localhost"]
+    args += ["--cache-dir", str(tmp_path / "cache"), "--stream"]
+    runner = CliRunner()
+    with schema_server(b'{"paths": {"/a": not json}}') as (url, server_state):
+        result = runner.invoke(generate, [*args, url])
+        assert result.exit_code != 0
+        assert [x for _, _, files in os.walk(tmp_path / "cache") for x in files] == []
+        # the next run fetches it again instead of revalidating it
+        runner.invoke(generate, [*args, url])
+        assert server_state["statuses"] == [200, 200]
+
+
+def test_generate_skips_unchanged_remote_schema(tmp_path):
+    dest = tmp_path / "dest"
+    dest.mkdir()
+    args = ["-n", "stela_sdk", "-d", str(dest), "-u", "http://localhost"]
+    args += ["--cache-dir", str(tmp_path / "cache")]
+    runner = CliRunner()
+    with schema_server(sample_body()) as (url, server_state):
+        result = runner.invoke(generate, [*args, url])
+        assert result.exit_code == 0, result.output
+        assert "skipping generation" not in result.output
+        with open(dest / "stela_sdk.py") as f:
+            code = f.read()
+
+        result = runner.invoke(generate, [*args, url])
+        assert result.exit_code == 0, result.output
+        assert "the schema hasn't changed since it was cached." in result.output
+        assert "skipping generation" in result.output
+        assert "parsing schema..." not in result.output
+        assert server_state["statuses"] == [200, 304]
+
+        # other options, or an sdk that was changed since, are generated again
+        result = runner.invoke(generate, [*args, "--model-style", "slots", url])
+        assert "skipping generation" not in result.output
+        result = runner.invoke(generate, [*args, url])
+        assert "skipping generation" not in result.output
+        with open(dest / "stela_sdk.py") as f:
+            assert f.read() == code
+        result = runner.invoke(generate, [*args, "--stream", url])
+        assert "skipping generation" in result.output
+        assert server_state["statuses"] == [200, 304, 304, 304, 304]
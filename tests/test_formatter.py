@@ -0,0 +1,46 @@
+import ast
+import json
+import os
+import black
+from sdkops.openapi import parse
+from sdkops.generator import to_ast
+from sdkops.package import to_package_ast
+from sdkops.options import GeneratorOptions
+from sdkops.cache import GenerationCache
+from sdkops.formatter import format_modules
+
+sample_file = os.path.join(os.path.dirname(__file__), "schema_sample1.json")
+
+
+def load_modules():
+    with open(sample_file) as f:
+        schema_dict = json.load(f)
+    options = GeneratorOptions(client="both")
+    modules = {"sdk": to_ast(parse(schema_dict)[1], "sdk", "http://x", options=options)}
+    modules.update(
+        to_package_ast(parse(schema_dict)[1], "sdk", "http://x", options=options)
+    )
+    return modules
+
+
+def test_chunks_are_formatted_like_the_whole_module(tmp_path):
+    modules = load_modules()
+    expected = {
+        name: black.format_str(ast.unparse(module), mode=black.FileMode())
+        for name, module in modules.items()
+    }
+    assert format_modules(modules) == expected
+    assert format_modules(modules, jobs=2) == expected
+
+    cache = GenerationCache(str(tmp_path))
+    assert format_modules(modules, cache=cache) == expected
+    assert cache.hits == 0
+    cache = GenerationCache(str(tmp_path))
+    assert format_modules(load_modules(), cache=cache) == expected
+    assert cache.misses == 0
+
+
+def test_format_none():
+    modules = load_modules()
+    codes = format_modules(modules, formatter="none")
+    assert codes["sdk"] == ast.unparse(modules["sdk"]) + "\n"
@@ -0,0 +1,1046 @@
+import ast
+import asyncio
+import concurrent.futures
+import http.server
+import json
+import threading
+import time
+import httpx
+import pytest
+from sdkops.openapi import parse
+from sdkops.generator import to_ast, generate_cached, WINDOW_TASKS_PER_JOB
+from sdkops.cache import GenerationCache
+from sdkops.options import GeneratorOptions
+
+
+def test_parallel_generation_is_deterministic(tmp_path, load_spec):
+    serial = ast.unparse(to_ast(load_spec(), "sdk", "http://localhost"))
+    parallel = ast.unparse(to_ast(load_spec(), "sdk", "http://localhost", jobs=3))
+    assert parallel == serial
+
+    # entries generated by the workers are cached like the serial ones
+    cache = GenerationCache(str(tmp_path))
+    to_ast(load_spec(), "sdk", "http://localhost", cache=cache, jobs=3)
+    assert cache.hits == 0
+    cache = GenerationCache(str(tmp_path))
+    cached = ast.unparse(to_ast(load_spec(), "sdk", "http://localhost", cache=cache))
+    assert cache.misses == 0
+    assert cached == serial
+
+
+def test_parallel_generation_reads_tasks_in_windows():
+    read = []
+
+    def tasks():
+        for i in range(1000):
+            read.append(i)
+            yield None, i
+
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        results = generate_cached(
+            tasks(),
+            lambda task, registry, options: task,
+            lambda nodes: {"value": nodes},
+            lambda entry: entry["value"],
+            None,
+            None,
+            executor=executor,
+            jobs=2,
+        )
+        assert next(results) == (0, 0)
+        # the first window and the next one, instead of every task
+        assert len(read) == 2 * 2 * WINDOW_TASKS_PER_JOB
+        assert list(results) == [(i, i) for i in range(1, 1000)]
+
+
+def test_async_client(load_spec):
+    code = ast.unparse(
+        to_ast(
+            load_spec(),
+            "sdk",
+            "http://localhost",
+            options=GeneratorOptions(client="both"),
+        )
+    )
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+    assert "sdk" in namespace and "async_sdk" in namespace
+
+    in_flight, max_in_flight = 0, 0
+
+    async def handler(request: httpx.Request):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(in_flight, max_in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, json={"email": "", "authenticated": True})
+
+    async def main():
+        sdk = namespace["AsyncSdk"]()
+        sdk.client = httpx.AsyncClient(
+            base_url="http://localhost", transport=httpx.MockTransport(handler)
+        )
+        results = await asyncio.gather(*(sdk.user_status() for _ in range(20)))
+        await sdk._cleanup()
+        return results
+
+    results = asyncio.run(main())
+    assert results == [{"email": "", "authenticated": True}] * 20
+    assert max_in_flight == 20
+
+
+def test_slotted_models(load_spec):
+    code = ast.unparse(
+        to_ast(
+            load_spec(),
+            "sdk",
+            "http://localhost",
+            options=GeneratorOptions(model_style="slots"),
+        )
+    )
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+    project_class = namespace["SdkProject"]
+    data = {
+        "rid": "r",
+        "name": "n",
+        "git_repo_url": "g",
+        "created_at": "c",
+        "updated_at": "u",
+        "removed_at": "",
+    }
+    project = project_class.from_dict(data)
+    assert not hasattr(project, "__dict__")
+    assert project.name == "n"
+    assert project.to_dict() == data
+
+    response = namespace["SdkProjectListResponseBody"](projects=[project])
+    assert response.to_dict() == {"projects": [data]}
+    assert response == namespace["SdkProjectListResponseBody"](projects=[project])
+    assert namespace["SdkProjectListResponseBody"].from_dict(response.to_dict()) == (
+        response
+    )
+
+
+def test_slotted_models_from_nested_dicts():
+    success, spec = parse(
+        {
+            "paths": {},
+            "components": {
+                "schemas": {
+                    "Pet": {
+                        "type": "object",
+                        "properties": {
+                            "owner": {
+                                "type": "object",
+                                "properties": {"name": {"type": "string"}},
+                            },
+                            "friends": {
+                                "type": "array",
+                                "items": {"$ref": "#/components/schemas/Pet"},
+                            },
+                        },
+                    }
+                }
+            },
+        }
+    )
+    assert success
+    code = ast.unparse(
+        to_ast(spec, "sdk", "http://x", options=GeneratorOptions(model_style="slots"))
+    )
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+    data = {
+        "owner": {"name": "a"},
+        "friends": [{"owner": {"name": "b"}, "friends": []}],
+    }
+    pet = namespace["SdkPet"].from_dict(data)
+    assert pet.owner.name == "a"
+    assert pet.friends[0].owner.name == "b"
+    assert pet.to_dict() == data
+    assert namespace["SdkPet"].from_dict(pet.to_dict()) == pet
+
+
+@pytest.mark.parametrize("model_style", GeneratorOptions.model_styles)
+def test_typed_responses(model_style, load_spec):
+    code = ast.unparse(
+        to_ast(
+            load_spec(),
+            "sdk",
+            "http://localhost",
+            options=GeneratorOptions(model_style=model_style, typed_responses=True),
+        )
+    )
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+    project = {
+        "rid": "r",
+        "name": "n",
+        "git_repo_url": "g",
+        "created_at": "c",
+        "updated_at": "u",
+        "removed_at": "",
+    }
+    requests = []
+
+    def handler(request: httpx.Request):
+        if request.url.path == "/project/list":
+            return httpx.Response(200, json={"projects": [project]})
+        if request.url.path == "/project/missing":
+            return httpx.Response(422, json={"error": {"code": "not_found"}})
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, json={"success": True})
+
+    sdk = namespace["Sdk"]()
+    sdk.client = httpx.Client(
+        base_url="http://localhost", transport=httpx.MockTransport(handler)
+    )
+    response = sdk.project_list(cwd_hash="h")
+    assert type(response) is namespace["SdkProjectListResponseBody"]
+    assert type(response.projects[0]) is namespace["SdkProject"]
+    assert response.to_json() == {"projects": [project]}
+
+    error = sdk.project_get("missing")
+    assert type(error) is namespace["SdkHTTPValidationError"]
+    assert error.error.code == "not_found"
+
+    body = namespace["SdkOtpEmailRequestBody"].from_json({"email": "e"})
+    assert sdk.otp_email(body).success is True
+    assert requests[-1] == {"email": "e"}
+
+
+@pytest.mark.parametrize("json_backend", ["auto", "orjson", "msgspec", "json"])
+def test_json_backend(json_backend, load_spec):
+    if json_backend in ("orjson", "msgspec"):
+        pytest.importorskip(json_backend)
+    code = ast.unparse(
+        to_ast(
+            load_spec(),
+            "sdk",
+            "http://localhost",
+            options=GeneratorOptions(json_backend=json_backend),
+        )
+    )
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        return httpx.Response(200, content=b'{"success":true}')
+
+    sdk = namespace["Sdk"]()
+    sdk.client = httpx.Client(
+        base_url="http://localhost", transport=httpx.MockTransport(handler)
+    )
+    assert sdk.otp_email({"email": "é"}) == {"success": True}
+    assert requests[0].headers["content-type"] == "application/json"
+    assert json.loads(requests[0].content) == {"email": "é"}
+
+    # the json functions can be replaced on an instance
+    sdk.json_loads = lambda content: "replaced"
+    assert sdk.otp_email({"email": "e"}) == "replaced"
+
+
+def array_spec():
+    _, spec = parse(
+        {
+            "paths": {
+                "/items": {
+                    "get": {
+                        "operationId": "list_items",
+                        "responses": {
+                            "200": {
+                                "description": "",
+                                "content": {
+                                    "application/json": {
+                                        "schema": {
+                                            "type": "array",
+                                            "items": {
+                                                "$ref": "#/components/schemas/Item"
+                                            },
+                                        }
+                                    }
+                                },
+                            }
+                        },
+                    }
+                }
+            },
+            "components": {
+                "schemas": {
+                    "Item": {
+                        "type": "object",
+                        "properties": {"name": {"type": "string"}},
+                        "required": ["name"],
+                    }
+                }
+            },
+        }
+    )
+    return spec
+
+
+@pytest.mark.parametrize("typed_responses", [False, True])
+def test_array_responses_are_streamed(typed_responses):
+    code = ast.unparse(
+        to_ast(
+            array_spec(),
+            "sdk",
+            "http://localhost",
+            options=GeneratorOptions(client="both", typed_responses=typed_responses),
+        )
+    )
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+    body = json.dumps([{"name": f"é {i}"} for i in range(1000)]).encode()
+    sent = 0
+
+    def chunks():
+        nonlocal sent
+        for i in range(0, len(body), 7):
+            sent = i + 7
+            yield body[i : i + 7]
+
+    async def async_chunks():
+        for chunk in chunks():
+            yield chunk
+
+    sdk = namespace["Sdk"]()
+    sdk.client = httpx.Client(
+        base_url="http://localhost",
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, content=chunks())
+        ),
+    )
+    items = sdk.iter_list_items()
+    first = next(items)
+    # the first item is yielded before the rest of the response arrives
+    assert sent < 100
+    rest = list(items)
+    names = [x.name if typed_responses else x["name"] for x in [first, *rest]]
+    assert names == [f"é {i}" for i in range(1000)]
+    if typed_responses:
+        assert type(first) is namespace["SdkItem"]
+
+    async def main():
+        sdk = namespace["AsyncSdk"]()
+        sdk.client = httpx.AsyncClient(
+            base_url="http://localhost",
+            transport=httpx.MockTransport(
+                lambda request: httpx.Response(200, content=async_chunks())
+            ),
+        )
+        return [x async for x in sdk.iter_list_items()]
+
+    assert len(asyncio.run(main())) == 1000
+
+    sdk.client = httpx.Client(
+        base_url="http://localhost",
+        transport=httpx.MockTransport(lambda request: httpx.Response(404, json={})),
+    )
+    with pytest.raises(httpx.HTTPStatusError):
+        list(sdk.iter_list_items())
+
+
+def test_json_array_parser():
+    code = ast.unparse(to_ast(array_spec(), "sdk", "http://localhost"))
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+    values = [1, -2.5e3, "a]b,c", {"x": [1, {"y": None}]}, [], True, None, 123456]
+    text = " [ " + " , ".join(json.dumps(x) for x in values) + " ] \n"
+
+    parser = namespace["_JSONArrayParser"]()
+    items = []
+    longest = 0
+    for char in text:
+        items.extend(parser.feed(char))
+        longest = max(longest, len(parser._buffer))
+    parser.close()
+    assert items == values
+    # only the item being parsed is kept
+    assert longest <= max(len(json.dumps(x)) for x in values)
+
+    parser = namespace["_JSONArrayParser"]()
+    assert parser.feed("[1, 2") == [1]
+    with pytest.raises(ValueError):
+        parser.close()
+    with pytest.raises(ValueError):
+        namespace["_JSONArrayParser"]().feed("{}")
+
+
+def test_client_options_and_warmup(load_spec):
+    code = ast.unparse(
+        to_ast(
+            load_spec(),
+            "sdk",
+            "http://localhost",
+            options=GeneratorOptions(client="both"),
+        )
+    )
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+
+    connections = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            connections.append(self.client_address)
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("content-length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            body = b'{"email": "", "authenticated": true}'
+            self.send_response(200)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        sdk = namespace["Sdk"](base_url=base_url, timeout=3)
+        assert sdk.client.timeout == httpx.Timeout(3)
+        assert sdk.warmup(3) == 3
+        assert len(connections) == 3
+        # requests reuse the connections opened ahead of time
+        assert sdk.user_status()["authenticated"] is True
+        assert len(connections) == 3
+        sdk._cleanup()
+
+        async def main():
+            sdk = namespace["AsyncSdk"](base_url=base_url)
+            opened = await sdk.warmup(4)
+            await sdk._cleanup()
+            return opened
+
+        assert asyncio.run(main()) == 4
+        assert len(connections) == 7
+
+        # no more connections than the pool allows are opened
+        sdk = namespace["Sdk"](base_url=base_url, max_connections=2)
+        assert sdk.warmup(0) == 0
+        assert sdk.warmup(5) == 2
+        sdk._cleanup()
+
+        async def main():
+            sdk = namespace["AsyncSdk"](base_url=base_url, max_connections=2)
+            opened = await sdk.warmup(0), await sdk.warmup(5)
+            await sdk._cleanup()
+            return opened
+
+        assert asyncio.run(main()) == (0, 2)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json={}))
+    assert namespace["Sdk"](transport=transport).user_status() == {}
+
+
+def test_sdk_is_shared_by_threads(load_spec):
+    code = ast.unparse(to_ast(load_spec(), "sdk", "http://localhost"))
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+
+    def handler(request: httpx.Request):
+        call_id = request.headers.get("x-call-id", "")
+        if request.url.path == "/":
+            assert request.headers["accept"] == "text/plain"
+            return httpx.Response(200, text=call_id)
+        assert request.headers["accept"] == "application/json"
+        return httpx.Response(200, json={"email": call_id, "authenticated": True})
+
+    sdk = namespace["Sdk"](transport=httpx.MockTransport(handler))
+    client_headers = dict(sdk.client.headers)
+
+    def call(i: int):
+        headers = {"x-call-id": str(i)} if i % 3 else None
+        if i % 2:
+            return sdk.home(headers=headers)
+        return sdk.user_status(headers=headers)["email"]
+
+    with concurrent.futures.ThreadPoolExecutor(32) as executor:
+        results = list(executor.map(call, range(5000)))
+    assert results == [str(i) if i % 3 else "" for i in range(5000)]
+    assert dict(sdk.client.headers) == client_headers
+
+
+def test_hedged_requests(load_spec):
+    code = ast.unparse(
+        to_ast(
+            load_spec(),
+            "sdk",
+            "http://localhost",
+            options=GeneratorOptions(client="both", hedging=True),
+        )
+    )
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+
+    # the first request of every method is slow, the ones after it are fast
+    calls, lock = [], threading.Lock()
+
+    def handler(request: httpx.Request):
+        with lock:
+            calls.append(request.url.path)
+            slow = calls.count(request.url.path) == 1
+        if slow:
+            threading.Event().wait(0.5)
+        return httpx.Response(200, json={"email": "", "slow": slow})
+
+    sdk = namespace["Sdk"](transport=httpx.MockTransport(handler), hedge_delay=0.05)
+    assert sdk.user_status() == {"email": "", "slow": False}
+    assert calls == ["/user/status", "/user/status"]
+    # post requests aren't idempotent, they are never sent twice
+    assert sdk.otp_email({"email": ""}) == {"email": "", "slow": True}
+    assert calls.count("/otp/email") == 1
+    sdk._cleanup()
+
+    cancelled = []
+
+    async def async_handler(request: httpx.Request):
+        calls.append(request.url.path)
+        try:
+            if calls.count(request.url.path) == 1:
+                await asyncio.sleep(0.5)
+                return httpx.Response(200, json={"slow": True})
+            return httpx.Response(200, json={"slow": False})
+        except asyncio.CancelledError:
+            cancelled.append(request.url.path)
+            raise
+
+    async def main():
+        sdk = namespace["AsyncSdk"](
+            transport=httpx.MockTransport(async_handler), hedge_delay=0.05
+        )
+        result = await sdk.project_get("x")
+        await sdk._cleanup()
+        return result
+
+    assert asyncio.run(main()) == {"slow": False}
+    assert cancelled == ["/project/x"]
+
+    # without a fixed delay, requests are hedged once there are enough latencies
+    sdk = namespace["Sdk"](transport=httpx.MockTransport(handler))
+    assert sdk._hedge_policy.hedge_delay() is None
+    for _ in range(20):
+        sdk.home()
+    assert sdk._hedge_policy.hedge_delay() >= 0.5
+    sdk._cleanup()
+
+    # one sdk shared by many threads doesn't queue their requests for threads,
+    # and the time they'd queue isn't mistaken for a slow response
+    status_calls = []
+
+    def slow_handler(request: httpx.Request):
+        status_calls.append(request.url.path)
+        threading.Event().wait(0.2)
+        return httpx.Response(200, json={"email": ""})
+
+    sdk = namespace["Sdk"](
+        transport=httpx.MockTransport(slow_handler), hedge_delay=10, max_connections=32
+    )
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(64) as executor:
+        results = list(executor.map(lambda _: sdk.user_status(), range(64)))
+    assert time.perf_counter() - start < 1
+    assert results == [{"email": ""}] * 64
+    assert len(status_calls) == 64
+    sdk._cleanup()
+
+    # requests that wait for one of the 2 threads of the pool longer than the
+    # delay aren't hedged, they are fast once they start
+    fast_calls = []
+
+    def fast_handler(request: httpx.Request):
+        fast_calls.append(request.url.path)
+        threading.Event().wait(0.02)
+        return httpx.Response(200, json={"email": ""})
+
+    sdk = namespace["Sdk"](
+        transport=httpx.MockTransport(fast_handler), hedge_delay=0.2, max_connections=1
+    )
+    with concurrent.futures.ThreadPoolExecutor(32) as executor:
+        list(executor.map(lambda _: sdk.user_status(), range(32)))
+    assert len(fast_calls) == 32
+    sdk._cleanup()
+
+
+def test_response_cache(load_spec):
+    code = ast.unparse(
+        to_ast(
+            load_spec(),
+            "sdk",
+            "http://localhost",
+            options=GeneratorOptions(client="both", response_cache=True, hedging=True),
+        )
+    )
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+
+    # projects are fresh for a minute, the user status is revalidated every time
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append((request.url.path, request.headers.get("if-none-match")))
+        if request.url.path == "/user/status":
+            if request.headers.get("if-none-match") == '"v1"':
+                return httpx.Response(304, headers={"etag": '"v1"'})
+            return httpx.Response(
+                200,
+                json={"email": "a", "authenticated": True},
+                headers={"etag": '"v1"', "cache-control": "no-cache"},
+            )
+        if request.url.path == "/project/list":
+            return httpx.Response(200, json={"projects": []})
+        if request.url.path == "/project/i18n":
+            return httpx.Response(
+                200,
+                json={"language": request.headers.get("accept-language")},
+                headers={"cache-control": "max-age=60", "vary": "accept-language"},
+            )
+        return httpx.Response(
+            200,
+            json={"project": request.url.path},
+            headers={"cache-control": "max-age=60"},
+        )
+
+    sdk = namespace["Sdk"](
+        transport=httpx.MockTransport(handler), response_cache_size=2
+    )
+    cache = sdk.response_cache
+    for _ in range(3):
+        assert sdk.project_get("a") == {"project": "/project/a"}
+    assert requests == [("/project/a", None)]
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    for _ in range(2):
+        assert sdk.user_status() == {"email": "a", "authenticated": True}
+    assert requests[1:] == [("/user/status", None), ("/user/status", '"v1"')]
+    assert (cache.hits, cache.misses) == (3, 2)
+
+    # responses without cache headers, and post requests, aren't kept
+    sdk.project_list("x")
+    sdk.project_list("x")
+    sdk.otp_email({"email": "a"})
+    assert len(requests) == 6 and cache.misses == 4
+
+    # the least recently used response is dropped beyond the size
+    sdk.project_get("b")
+    assert len(cache) == 2
+    sdk.project_get("a")
+    assert len(requests) == 8
+
+    # requests with different headers don't share a response
+    for language in ("en", "fr", "en", "fr"):
+        response = sdk.project_get("i18n", headers={"accept-language": language})
+        assert response == {"language": language}
+    assert len(requests) == 10
+    sdk._cleanup()
+
+    async def main():
+        sdk = namespace["AsyncSdk"](
+            transport=httpx.MockTransport(handler), response_cache_ttl=0
+        )
+        results = [await sdk.user_status() for _ in range(2)]
+        # a ttl of 0 keeps the responses only for revalidation
+        results += [await sdk.project_get("a") for _ in range(2)]
+        await sdk._cleanup()
+        return results, sdk.response_cache.hits
+
+    requests.clear()
+    results, hits = asyncio.run(main())
+    assert results[1] == {"email": "a", "authenticated": True}
+    assert [x[1] for x in requests] == [None, '"v1"', None, None]
+    assert hits == 1
+
+
+def test_coalesced_requests(load_spec):
+    code = ast.unparse(
+        to_ast(
+            load_spec(),
+            "sdk",
+            "http://localhost",
+            options=GeneratorOptions(client="both", coalesce=("project_get",)),
+        )
+    )
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+
+    calls, lock = [], threading.Lock()
+
+    def handler(request: httpx.Request):
+        with lock:
+            calls.append(request.url.path)
+        threading.Event().wait(0.1)
+        return httpx.Response(200, json={"project": request.url.path})
+
+    sdk = namespace["Sdk"](transport=httpx.MockTransport(handler))
+    names = ["a"] * 10 + ["b"] * 10
+    with concurrent.futures.ThreadPoolExecutor(20) as executor:
+        results = list(executor.map(sdk.project_get, names))
+        # methods that aren't configured send every request
+        list(executor.map(lambda _: sdk.user_status(), range(5)))
+    assert results == [{"project": f"/project/{x}"} for x in names]
+    assert sorted(calls) == ["/project/a", "/project/b"] + ["/user/status"] * 5
+    assert sdk._in_flight == {}
+    # requests with different headers aren't merged
+    calls.clear()
+    with concurrent.futures.ThreadPoolExecutor(2) as executor:
+        list(executor.map(lambda x: sdk.project_get("a", headers=x), [{"x": "1"}, {}]))
+    assert calls == ["/project/a"] * 2
+
+    async def async_handler(request: httpx.Request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.1)
+        return httpx.Response(200, json={"project": request.url.path})
+
+    async def main():
+        sdk = namespace["AsyncSdk"](transport=httpx.MockTransport(async_handler))
+        first = asyncio.ensure_future(sdk.project_get("a"))
+        await asyncio.sleep(0)
+        results = asyncio.gather(*(sdk.project_get("a") for _ in range(10)))
+        # the request goes on when the caller that sent it is cancelled
+        first.cancel()
+        results = await results
+        await sdk._cleanup()
+        return results
+
+    calls.clear()
+    assert asyncio.run(main()) == [{"project": "/project/a"}] * 10
+    assert calls == ["/project/a"]
+
+
+def test_batch(load_spec):
+    code = ast.unparse(
+        to_ast(
+            load_spec(),
+            "sdk",
+            "http://localhost",
+            options=GeneratorOptions(client="async", batch=True),
+        )
+    )
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+
+    in_flight, max_in_flight = 0, 0
+
+    async def handler(request: httpx.Request):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(in_flight, max_in_flight)
+        # later items respond sooner
+        name = request.url.path.split("/")[-1]
+        await asyncio.sleep(0.02 / (1 + int(name) % 4))
+        in_flight -= 1
+        return httpx.Response(200, json={"project": name})
+
+    consumed = []
+
+    def names(n: int):
+        for i in range(n):
+            consumed.append(i)
+            yield str(i)
+
+    async def main():
+        sdk = namespace["AsyncSdk"](transport=httpx.MockTransport(handler))
+        ordered = [x async for x in sdk.map_project_get(names(50), concurrency=5)]
+        unordered = [
+            x
+            async for x in sdk.batch(
+                sdk.project_get, names(50), concurrency=5, ordered=False
+            )
+        ]
+        # a tuple is positional arguments, a dict keyword arguments
+        items = [("1",), {"name": "2"}, {"unknown": "3"}]
+        errors = [x async for x in sdk.map_project_get(items)]
+        consumed.clear()
+        async for result in sdk.map_project_get(names(1000), concurrency=5):
+            break
+        await sdk._cleanup()
+        return ordered, unordered, errors
+
+    ordered, unordered, errors = asyncio.run(main())
+    assert [x.index for x in ordered] == list(range(50))
+    assert [x.value for x in ordered] == [{"project": str(i)} for i in range(50)]
+    assert [x.index for x in unordered] != list(range(50))
+    assert sorted(x.index for x in unordered) == list(range(50))
+    assert max_in_flight == 5
+    assert [x.value for x in errors[:2]] == [{"project": "1"}, {"project": "2"}]
+    assert isinstance(errors[2].error, TypeError) and errors[2].value is None
+    # items are consumed as the calls complete, not all at once
+    assert len(consumed) < 20
+
+
+def test_batch_holds_back_at_most_concurrency_results(load_spec):
+    code = ast.unparse(
+        to_ast(
+            load_spec(),
+            "sdk",
+            "http://localhost",
+            options=GeneratorOptions(client="async", batch=True),
+        )
+    )
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+    started = []
+
+    async def handler(request: httpx.Request):
+        # the first call is slow, the others respond right away
+        name = request.url.path.split("/")[-1]
+        started.append(name)
+        if name == "0":
+            await asyncio.sleep(0.1)
+        return httpx.Response(200, json={"project": name})
+
+    async def main():
+        sdk = namespace["AsyncSdk"](transport=httpx.MockTransport(handler))
+        results = sdk.map_project_get((str(i) for i in range(1000)), concurrency=5)
+        first = await results.__anext__()
+        # the first call and the 4 results behind it
+        started_before_first = len(started)
+        rest = [x async for x in results]
+        await sdk._cleanup()
+        return first, started_before_first, rest
+
+    first, started_before_first, rest = asyncio.run(main())
+    assert first.index == 0
+    assert started_before_first == 5
+    assert [x.index for x in rest] == list(range(1, 1000))
+
+
+def paginated_spec():
+    def operation(operation_id: str, parameters: dict, schema: dict, **extensions):
+        return {
+            "operationId": operation_id,
+            "parameters": [
+                {"name": k, "in": "query", "schema": v} for k, v in parameters.items()
+            ],
+            "responses": {
+                "200": {
+                    "description": "",
+                    "content": {"application/json": {"schema": schema}},
+                }
+            },
+            **extensions,
+        }
+
+    numbers = {"type": "array", "items": {"type": "integer"}}
+    _, spec = parse(
+        {
+            "paths": {
+                "/events": {
+                    "get": operation(
+                        "list_events",
+                        {
+                            "cursor": {"type": "string", "default": ""},
+                            "limit": {"type": "integer", "default": 10},
+                        },
+                        {
+                            "type": "object",
+                            "properties": {
+                                "data": numbers,
+                                "next_cursor": {"type": "string"},
+                            },
+                        },
+                    )
+                },
+                "/items": {
+                    "get": operation(
+                        "list_items",
+                        {
+                            "offset": {"type": "integer", "default": 0},
+                            "limit": {"type": "integer", "default": 10},
+                        },
+                        numbers,
+                    )
+                },
+                "/pages": {
+                    "get": operation(
+                        "list_pages",
+                        {"p": {"type": "integer", "default": 1}},
+                        {"type": "object", "properties": {"results": numbers}},
+                        **{"x-pagination": {"style": "page", "param": "p"}},
+                    )
+                },
+                "/search": {
+                    "get": operation(
+                        "search",
+                        {"page": {"type": "integer", "default": 1}},
+                        {"type": "object", "properties": {"results": numbers}},
+                        **{"x-pagination": False},
+                    )
+                },
+            }
+        }
+    )
+    return spec
+
+
+def test_paginate():
+    code = ast.unparse(
+        to_ast(
+            paginated_spec(),
+            "sdk",
+            "http://localhost",
+            options=GeneratorOptions(client="both"),
+        )
+    )
+    assert "paginate_search" not in code
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+
+    calls = []
+
+    def handler(request: httpx.Request):
+        params = request.url.params
+        calls.append(dict(params))
+        numbers = list(range(25))
+        if request.url.path == "/events":
+            start = int(params["cursor"] or 0)
+            end = start + int(params["limit"])
+            next_cursor = str(end) if end < len(numbers) else None
+            return httpx.Response(
+                200, json={"data": numbers[start:end], "next_cursor": next_cursor}
+            )
+        if request.url.path == "/items":
+            start = int(params["offset"])
+            return httpx.Response(
+                200, json=numbers[start : start + int(params["limit"])]
+            )
+        start = (int(params["p"]) - 1) * 10
+        return httpx.Response(200, json={"results": numbers[start : start + 10]})
+
+    sdk = namespace["Sdk"](transport=httpx.MockTransport(handler))
+    pages = [x["data"] for x in sdk.paginate_list_events(limit=10)]
+    assert sum(pages, []) == list(range(25)) and len(pages) == 3
+    assert [x["cursor"] for x in calls] == ["", "10", "20"]
+    # pages shorter than the limit are the last page
+    calls.clear()
+    assert sum(sdk.paginate_list_items(limit=5, offset=5), []) == list(range(5, 25))
+    assert [x["offset"] for x in calls] == ["5", "10", "15", "20", "25"]
+    # without a limit, the last page is the empty one
+    calls.clear()
+    assert [len(x["results"]) for x in sdk.paginate_list_pages()] == [10, 10, 5]
+    assert [x["p"] for x in calls] == ["1", "2", "3", "4"]
+
+    async def main():
+        sdk = namespace["AsyncSdk"](transport=httpx.MockTransport(handler))
+        calls.clear()
+        pages = sdk.paginate_list_events(limit=10)
+        first = await anext(pages)
+        # the second page is requested while the first one is handled
+        await asyncio.sleep(0.01)
+        assert len(calls) == 2
+        pages = [first] + [x async for x in pages]
+        await sdk._cleanup()
+        return pages
+
+    pages = asyncio.run(main())
+    assert sum((x["data"] for x in pages), []) == list(range(25))
+
+
+def test_instrumentation(load_spec):
+    code = ast.unparse(
+        to_ast(
+            load_spec(),
+            "sdk",
+            "http://localhost",
+            options=GeneratorOptions(client="both", instrumentation=True),
+        )
+    )
+    namespace = {}
+    exec(compile(code, "sdk.py", "exec"), namespace)
+
+    def handler(request: httpx.Request):
+        if request.url.path == "/otp/email":
+            return httpx.Response(422, json={"detail": []})
+        if request.url.path == "/project/broken":
+            return httpx.Response(200, content=b"{")
+        return httpx.Response(200, json={"email": "", "authenticated": True})
+
+    events = {"before_send": [], "after_response": [], "on_error": []}
+    hooks = {name: calls.append for name, calls in events.items()}
+    sdk = namespace["Sdk"](
+        transport=httpx.MockTransport(handler), histograms=True, **hooks
+    )
+    assert sdk.user_status() == {"email": "", "authenticated": True}
+    sdk.otp_email({"email": "a"})
+    with pytest.raises(json.JSONDecodeError):
+        sdk.project_get("broken")
+
+    assert [x.operation_id for x in events["before_send"]] == [
+        "user_status",
+        "otp_email",
+        "project_get",
+    ]
+    assert events["after_response"] == events["before_send"]
+    assert [x.operation_id for x in events["on_error"]] == ["otp_email", "project_get"]
+    ok, error, broken = events["after_response"]
+    assert ok.response_bytes == len(ok.response.content) > 0
+    assert error.request_bytes == len(error.request.content) > 0
+    assert isinstance(broken.error, json.JSONDecodeError)
+    # custom transports don't send trace events, the call is all wait
+    assert ok.connect == ok.send == ok.receive == 0 and ok.wait > 0
+    assert ok.total >= ok.wait + ok.decode
+    histograms = json.loads(sdk.histograms_json())
+    assert {k: v["count"] for k, v in histograms.items()} == {
+        "user_status": 1,
+        "otp_email": 1,
+        "project_get": 1,
+    }
+    assert sum(histograms["user_status"]["buckets"].values()) == 1
+
+    # without hooks and histograms the response has no event
+    sdk = namespace["Sdk"](transport=httpx.MockTransport(handler))
+    sdk.user_status()
+    assert sdk.histograms is None and sdk.histograms_json() == "{}"
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body = b'{"email": "", "authenticated": true}'
+            self.send_response(200)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    async def main():
+        sdk = namespace["AsyncSdk"](base_url=base_url, after_response=events.append)
+        for _ in range(2):
+            await sdk.user_status()
+        await sdk._cleanup()
+
+    events = []
+    try:
+        asyncio.run(main())
+    finally:
+        server.shutdown()
+        server.server_close()
+    first, second = events
+    # the connection is opened once, then reused
+    assert first.connect > 0 and second.connect == 0
+    assert all(x.send > 0 and x.wait > 0 and x.receive > 0 for x in events)
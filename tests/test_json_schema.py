@@ -477,3 +477,150 @@ class Me(dict):
         self.point: MePoint | None | int = point
 """
     )
+
+
+def test_ref_resolver_is_per_document():
+    def document(prop_type: str):
+        return {
+            "type": "object",
+            "properties": {"address": {"$ref": "#/components/schemas/Address"}},
+            "required": ["address"],
+            "components": {
+                "schemas": {
+                    "Address": {
+                        "type": "object",
+                        "properties": {"city": {"type": prop_type}},
+                        "required": ["city"],
+                    }
+                }
+            },
+        }
+
+    resolver = json_schema.RefResolver(document("string"))
+    assert resolver.names == {"#/components/schemas/Address": "Address"}
+    assert resolver.resolve("#/components/schemas/Address")["properties"] == {
+        "city": {"type": "string"}
+    }
+
+    # the same ref in another document must not resolve to the first one
+    ast1 = json_schema.to_ast("doc", document("string"))
+    ast2 = json_schema.to_ast("doc", document("integer"))
+    assert "self.city: str = city" in ast.unparse(ast1[0])
+    assert "self.city: int = city" in ast.unparse(ast2[0])
+
+
+def test_recursive_schemas():
+    schema1 = {
+        "type": "object",
+        "properties": {"root": {"$ref": "#/definitions/node"}},
+        "required": ["root"],
+        "definitions": {
+            "node": {
+                "type": "object",
+                "properties": {
+                    "value": {"type": "string"},
+                    "children": {
+                        "type": "array",
+                        "items": {"$ref": "#/definitions/node"},
+                    },
+                    "parent": {
+                        "anyOf": [{"$ref": "#/definitions/node"}, {"type": "null"}]
+                    },
+                },
+                "required": ["value"],
+            }
+        },
+    }
+    ast1 = json_schema.to_ast("tree", schema1)
+    code = black.format_str(ast.unparse(ast1), mode=black.FileMode(line_length=160))
+    assert (
+        code
+        == """\
+class TreeNode(dict):
+
+    def __init__(self, value: str, children: "list[TreeNode]" = [], parent: "TreeNode | None" = None):
+        super().__init__(value=value, children=children, parent=parent)
+        self.value: str = value
+        self.children: "list[TreeNode]" = children
+        self.parent: "TreeNode | None" = parent
+
+
+class Tree(dict):
+
+    def __init__(self, root: TreeNode):
+        super().__init__(root=root)
+        self.root: TreeNode = root
+"""
+    )
+    exec(compile(code, "tree.py", "exec"), {})
+
+    # a ref reached again is annotated with the class built the first time
+    schema2 = {
+        "type": "object",
+        "properties": {
+            "billing": {"$ref": "#/definitions/address"},
+            "shipping": {"$ref": "#/definitions/address"},
+        },
+        "definitions": {
+            "address": {"type": "object", "properties": {"city": {"type": "string"}}}
+        },
+    }
+    ast2 = json_schema.to_ast("order", schema2)
+    assert [x.name for x in ast2] == ["OrderAddress", "Order"]
+
+
+def test_deeply_nested_schemas():
+    depth = 3000
+    schema = {"type": "object", "properties": {"leaf": {"type": "string"}}}
+    for _ in range(depth):
+        schema = {"type": "object", "properties": {"a": schema}}
+
+    class_defs = json_schema.to_ast("deep", schema)
+    assert len(class_defs) == depth + 1
+    assert class_defs[0].name == "Deep" + "A" * depth
+    assert class_defs[-1].name == "Deep"
+
+
+def test_codecs():
+    schema = {
+        "type": "object",
+        "properties": {
+            "pet": {
+                "anyOf": [
+                    {
+                        "type": "object",
+                        "properties": {"barks": {"type": "boolean"}},
+                        "required": ["barks"],
+                    },
+                    {
+                        "type": "object",
+                        "properties": {"meows": {"type": "boolean"}},
+                    },
+                    {"type": "string"},
+                ]
+            },
+            "owners": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"name": {"type": "string"}},
+                },
+            },
+        },
+        "required": ["pet", "owners"],
+    }
+    class_defs = json_schema.to_ast("house", schema, codecs=True)
+    namespace = {}
+    exec(ast.unparse(ast.Module(body=class_defs, type_ignores=[])), namespace)
+
+    data = {"pet": {"barks": True}, "owners": [{"name": "a"}]}
+    house = namespace["House"].from_json(data)
+    assert type(house.pet) is namespace["HousePet"]
+    assert type(house.owners[0]) is namespace["HouseOwners"]
+    assert house.to_json() == data
+
+    house = namespace["House"].from_json({"pet": {"meows": True}, "owners": []})
+    assert type(house.pet) is namespace["HousePet2"]
+    house = namespace["House"].from_json({"pet": "fish", "owners": []})
+    assert house.pet == "fish"
+    assert house.to_json() == {"pet": "fish", "owners": []}
@@ -0,0 +1,65 @@
+import ast
+import io
+import json
+import os
+from sdkops.openapi import parse, parse_file, APISpecPaths
+from sdkops.generator import to_ast
+from sdkops.json_stream import JSONStreamReader
+
+sample_file = os.path.join(os.path.dirname(__file__), "schema_sample1.json")
+
+
+def test_parse_file_matches_parse():
+    with open(sample_file) as f:
+        _, spec = parse(json.load(f))
+    _, spec_streamed = parse_file(sample_file)
+
+    assert isinstance(spec_streamed.paths, APISpecPaths)
+    assert "paths" not in spec_streamed.schema_dict
+    assert len(spec_streamed.paths) == len(spec.paths)
+    # path items are parsed again on every iteration
+    assert [x.pattern for x in spec_streamed.paths] == [x.pattern for x in spec.paths]
+    assert ast.unparse(to_ast(spec_streamed, "sdk", "http://localhost")) == ast.unparse(
+        to_ast(spec, "sdk", "http://localhost")
+    )
+
+
+def test_parse_file_offsets(tmp_path):
+    # multibyte characters and crlf line endings before the paths object
+    schema = {
+        "openapi": "3.1.0",
+        "info": {"title": "Çiçek ☕ api", "version": "1"},
+        "paths": {
+            f"/ürün/{i}": {
+                "get": {
+                    "operationId": f"get_{i}",
+                    "responses": {"200": {"description": "ok"}},
+                }
+            }
+            for i in range(3)
+        },
+        "components": {"schemas": {}},
+    }
+    file = tmp_path / "schema.json"
+    data = json.dumps(schema, indent=2, ensure_ascii=False).replace("\n", "\r\n")
+    file.write_bytes(data.encode("utf-8"))
+
+    _, spec = parse_file(str(file))
+    assert spec.schema_dict["info"]["title"] == "Çiçek ☕ api"
+    assert spec.schema_dict["components"] == {"schemas": {}}
+    assert [x.pattern for x in spec.paths] == [f"/ürün/{i}" for i in range(3)]
+    assert [x.operations[0].operation_id for x in spec.paths] == [
+        f"get_{i}" for i in range(3)
+    ]
+
+
+def test_json_stream_reader_small_chunks():
+    document = {"a": [1, 2.5, {"b": "x\\"}], "cc": 12345678, "d": {}, "e": "ş" * 20}
+    data = json.dumps(document, ensure_ascii=False).encode("utf-8")
+    reader = JSONStreamReader(io.BytesIO(data), chunk_size=3)
+    result = {}
+    for key in reader.members():
+        if key == "d":
+            assert data[reader.tell() : reader.tell() + 2] == b"{}"
+        result[key] = reader.value()
+    assert result == document
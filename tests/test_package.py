@@ -0,0 +1,58 @@
+import ast
+import importlib
+import inspect
+import os
+import sys
+from sdkops.openapi import parse
+from sdkops.package import to_package_ast, module_name_for
+from sdkops.options import GeneratorOptions
+
+
+def test_package_modules_are_imported_lazily(tmp_path, load_spec):
+    modules = to_package_ast(
+        load_spec(),
+        "pkg_sdk",
+        "http://localhost",
+        options=GeneratorOptions(client="both"),
+    )
+    assert set(modules) == {"__init__", "models", "otp", "project", "user", "home"}
+    os.makedirs(tmp_path / "pkg_sdk")
+    for module_name, module in modules.items():
+        with open(tmp_path / "pkg_sdk" / f"{module_name}.py", "w") as f:
+            f.write(ast.unparse(module))
+
+    sys.path.insert(0, str(tmp_path))
+    try:
+        package = importlib.import_module("pkg_sdk")
+        loaded = lambda: {x for x in sys.modules if x.startswith("pkg_sdk.")}
+        assert loaded() == set()
+
+        assert callable(package.pkg_sdk.user_status)
+        assert loaded() == {"pkg_sdk.user", "pkg_sdk.models"}
+
+        # components only used by the project operations live next to them
+        assert package.PkgSdkProject.__module__ == "pkg_sdk.project"
+        assert package.PkgSdkHTTPValidationError.__module__ == "pkg_sdk.models"
+        assert loaded() == {"pkg_sdk.user", "pkg_sdk.models", "pkg_sdk.project"}
+
+        method = package.async_pkg_sdk.project_get
+        assert inspect.iscoroutinefunction(method)
+        assert method.__name__ == "async_project_get"
+    finally:
+        sys.path.remove(str(tmp_path))
+        for x in [x for x in sys.modules if x.split(".")[0] == "pkg_sdk"]:
+            del sys.modules[x]
+
+
+def test_module_names():
+    _, spec = parse(
+        {
+            "paths": {
+                "/{id}/itemGroups/x": {"get": {"responses": {}}},
+                "/": {"get": {"tags": ["Models"], "responses": {}}},
+                "/a": {"get": {"tags": ["2fa"], "responses": {}}},
+            }
+        }
+    )
+    names = [module_name_for(x.pattern, x.operations[0], "sdk") for x in spec.paths]
+    assert names == ["item_groups", "models_api", "tag_2fa"]
@@ -0,0 +1,73 @@
+import json
+import pstats
+from click.testing import CliRunner
+from sdkops.generator import to_ast
+from sdkops.formatter import format_modules
+from sdkops.profiler import Profiler
+from sdkops.cli import generate
+
+
+def test_profiler_records_phases_and_tasks(load_spec):
+    profiler = Profiler(top=3)
+    for jobs in (1, 2):
+        with profiler.phase("to_ast"):
+            module = to_ast(
+                load_spec(),
+                "stela_sdk",
+                "http://localhost",
+                jobs=jobs,
+                profiler=profiler,
+            )
+    format_modules({"stela_sdk": module}, profiler=profiler)
+
+    assert list(profiler.phases) == ["to_ast", "unparse", "black"]
+    for result in profiler.phases.values():
+        assert result["wall_seconds"] > 0
+        assert result["peak_bytes"] > 0
+    # 10 component models and 6 operations, generated twice
+    assert len(profiler.tasks["schemas"]) == 20
+    assert len(profiler.tasks["operations"]) == 12
+    slowest = profiler.slowest("operations")
+    assert len(slowest) == 3
+    assert slowest[0][1] == max(x[1] for x in profiler.tasks["operations"])
+    assert profiler.report()[-3:] == [
+        f"    {seconds * 1000:9.1f}ms {name}"
+        for name, seconds in profiler.slowest("schemas")
+    ]
+
+
+def test_profile_option(tmp_path, sample_path):
+    runner = CliRunner()
+    for output in ("profile.json", "profile.pstats"):
+        result = runner.invoke(
+            generate,
+            [
+                "-n",
+                "stela_sdk",
+                "-d",
+                str(tmp_path),
+                "-u",
+                "http://localhost",
+                "--profile-output",
+                str(tmp_path / output),
+                sample_path,
+            ],
+        )
+        assert result.exit_code == 0, result.output
+        assert "profile:" in result.output
+        assert "slowest 6 of 6 operations:" in result.output
+
+    with open(tmp_path / "profile.json") as f:
+        profile = json.load(f)
+    assert list(profile["phases"]) == [
+        "parse",
+        "tree",
+        "to_ast",
+        "unparse",
+        "black",
+        "write",
+    ]
+    assert len(profile["operations"]) == 6
+    assert len(profile["schemas"]) == 10
+    stats = pstats.Stats(str(tmp_path / "profile.pstats"))
+    assert any(name == "to_ast" for _, _, name in stats.stats)